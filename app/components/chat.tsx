@@ -51,9 +51,17 @@ const TOOL_LABELS: Record<string, string> = {
   wait_for_selector: "Waiting for element...",
   get_current_page_text: "Reading page content...",
   get_current_page_url: "Checking current URL...",
+  discover_pages: "Reading the sitemaps...",
   fetch_page: "Fetching page...",
   get_page_metadata: "Reading page metadata...",
   get_page_speed: "Running performance audit...",
+  analyze_site_resources: "Analyzing page weight and caching...",
+  check_links: "Checking links...",
+  check_viewports: "Checking mobile, tablet and desktop layouts...",
+  audit_accessibility: "Auditing accessibility...",
+  repo_list_files: "Listing repository files...",
+  repo_read_files: "Reading repository files...",
+  repo_search: "Searching the repository...",
   submit_diagnostic: "Submitting diagnostic...",
 }
 
@@ -81,26 +89,20 @@ function Chat({ websiteEntryId, websiteUrl, onAiMessage }, ref) {
       .then(res => res.json())
       .then((msgs: any[]) => msgs.map(m => ({ ...m, isFixAction: m.is_fix_action, isAutomated: m.is_automated })))
       .then(setMessages)
+      .then(() => fetch(`${BACKEND_API_BASE}/runs/active?website_entry_id=${websiteEntryId}`, { credentials: "include" }))
+      .then(res => res.json())
+      .then(active => {
+        if (active.runId) resumeRun(active.runId, active.isFixAction)
+      })
   }, [websiteEntryId])
 
   useEffect(() => {
     bottomRef.current?.scrollIntoView({ behavior: "smooth" })
   }, [messages])
 
-  async function sendMessage(content: string, isFixAction = false) {
-    if (!content.trim() || loading) return
-    setMessages(prev => [...prev, { role: "human", content, isFixAction }])
-    setLoading(true)
-    setStatusText("")
-
-    const response = await fetch(`${BACKEND_API_BASE}/messages/send?website_entry_id=${websiteEntryId}&is_fix_action=${isFixAction}`, {
-      method: "POST",
-      credentials: "include",
-      headers: { "Content-Type": "application/json" },
-      body: JSON.stringify({ content }),
-    })
-
-    if (!response.body) { setLoading(false); return }
+  // Reads an SSE stream of run events. Returns the run id and last event id seen, and whether the run finished.
+  async function readRunEvents(response: Response, isFixAction: boolean, runId: string | null, lastEventId: number) {
+    if (!response.body) return { runId, lastEventId, finished: false }
 
     const reader = response.body.getReader()
     const decoder = new TextDecoder()
@@ -113,22 +115,77 @@ function Chat({ websiteEntryId, websiteUrl, onAiMessage }, ref) {
       const parts = buffer.split("\n\n")
       buffer = parts.pop() ?? ""
       for (const part of parts) {
-        const line = part.trim()
-        if (!line.startsWith("data: ")) continue
+        const lines = part.trim().split("\n")
+        const idLine = lines.find(l => l.startsWith("id: "))
+        const dataLine = lines.find(l => l.startsWith("data: "))
+        if (idLine) lastEventId = Number(idLine.slice(4)) || lastEventId
+        if (!dataLine) continue
         try {
-          const event = JSON.parse(line.slice(6))
-          if (event.type === "tool_start") {
+          const event = JSON.parse(dataLine.slice(6))
+          if (event.type === "run") {
+            runId = event.run_id
+          } else if (event.type === "queued") {
+            setStatusText(`Waiting for a free slot (position ${event.position})...`)
+          } else if (event.type === "tool_start") {
             setStatusText(toolLabel(event.tool))
           } else if (event.type === "done") {
             setMessages(prev => [...prev, { role: "ai", content: event.content, isFixAction }])
             setLoading(false)
             setStatusText("")
             onAiMessage()
+            return { runId, lastEventId, finished: true }
+          } else if (event.type === "error") {
+            return { runId, lastEventId, finished: true }
           }
         } catch { /* ignore malformed events */ }
       }
     }
 
+    return { runId, lastEventId, finished: false }
+  }
+
+  // Reconnects to a run that outlived its original connection (e.g. after a reload), resuming from lastEventId.
+  async function resumeRun(runId: string, isFixAction: boolean, lastEventId = 0) {
+    setLoading(true)
+    for (let attempt = 0; attempt < 3; attempt++) {
+      const response = await fetch(`${BACKEND_API_BASE}/runs/${runId}/events?last_event_id=${lastEventId}`, { credentials: "include" })
+      if (!response.ok) break
+      const result = await readRunEvents(response, isFixAction, runId, lastEventId)
+      if (result.finished) break
+      lastEventId = result.lastEventId
+    }
+    setLoading(false)
+    setStatusText("")
+  }
+
+  async function sendMessage(content: string, isFixAction = false) {
+    if (!content.trim() || loading) return
+    setMessages(prev => [...prev, { role: "human", content, isFixAction }])
+    setLoading(true)
+    setStatusText("")
+
+    const response = await fetch(`${BACKEND_API_BASE}/messages/send?website_entry_id=${websiteEntryId}&is_fix_action=${isFixAction}`, {
+      method: "POST",
+      credentials: "include",
+      headers: { "Content-Type": "application/json" },
+      body: JSON.stringify({ content }),
+    })
+
+    if (!response.ok) {
+      const data = await response.json().catch(() => ({}))
+      const retryAfter = response.headers.get("retry-after")
+      const detail = data.detail ?? "Something went wrong"
+      setMessages(prev => [...prev, { role: "ai", content: retryAfter ? `${detail}. Try again in ${retryAfter}s.` : detail }])
+      setLoading(false)
+      return
+    }
+
+    const result = await readRunEvents(response, isFixAction, response.headers.get("x-run-id"), 0)
+    if (!result.finished && result.runId) {
+      await resumeRun(result.runId, isFixAction, result.lastEventId)
+      return
+    }
+
     setLoading(false)
   }
 
@@ -17,6 +17,8 @@ type Settings = {
   webhookAuthHeaderValue: string
   webhookFormat: string
   triggerKeyword: string
+  scheduleIntervalMinutes: number
+  scheduleCron: string
 }
 
 const defaultSettings: Settings = {
@@ -29,6 +31,8 @@ const defaultSettings: Settings = {
   webhookAuthHeaderValue: "",
   webhookFormat: "json",
   triggerKeyword: "[webster]",
+  scheduleIntervalMinutes: 0,
+  scheduleCron: "",
 }
 
 function SettingRow({ label, description, children }: { label: string; description: string; children: ReactNode }) {
@@ -106,6 +110,29 @@ export default function VerificationSettings({ websiteEntryId }: { websiteEntryI
 
       <hr className="border-slate-100" />
 
+      <div className="flex flex-col gap-1.5">
+        <p className="text-sm font-medium text-slate-800">Schedule</p>
+        <p className="text-xs text-slate-500">Also re-verify periodically, skipped when the site hasn't changed. Use an interval in minutes or a cron expression (UTC); leave both empty to disable</p>
+        <div className="flex gap-2">
+          <Input
+            type="number"
+            min={0}
+            className="text-xs px-2 py-1.5 rounded"
+            value={settings.scheduleIntervalMinutes || ""}
+            onChange={e => setSettings(s => ({ ...s, scheduleIntervalMinutes: Number(e.target.value) || 0 }))}
+            placeholder="Interval (minutes)"
+          />
+          <Input
+            className="text-xs px-2 py-1.5 rounded font-mono"
+            value={settings.scheduleCron}
+            onChange={e => setSettings(s => ({ ...s, scheduleCron: e.target.value }))}
+            placeholder="0 6 * * *"
+          />
+        </div>
+      </div>
+
+      <hr className="border-slate-100" />
+
       <SettingRow label="Minimum severity to alert" description="Diagnostics at or above this level will trigger an alert">
         <select
           value={settings.minSeverity}
@@ -128,7 +155,7 @@ export default function VerificationSettings({ websiteEntryId }: { websiteEntryI
 
       <div className="flex flex-col gap-1.5">
         <p className="text-sm font-medium text-slate-800">Paths in scope</p>
-        <p className="text-xs text-slate-500">Leave empty to check all pages. Comma-separated (e.g. /checkout, /login)</p>
+        <p className="text-xs text-slate-500">Leave empty to check all pages. Comma-separated routes or file globs (e.g. /checkout, src/**/*.css). Pushes that change nothing in scope are skipped</p>
         <Input
           className="text-xs px-2 py-1.5 rounded"
           value={settings.pathsInScope}
@@ -0,0 +1,190 @@
+from collections import defaultdict
+from playwright.async_api import Page
+
+INTERACTIVE_ROLES = {
+    "button", "link", "textbox", "searchbox", "combobox", "checkbox", "radio", "switch", "slider",
+    "spinbutton", "menuitem", "menuitemcheckbox", "menuitemradio", "tab", "listbox", "option",
+}
+LANDMARK_ROLES = {"main", "navigation", "banner", "contentinfo", "complementary", "region", "search", "form"}
+SEVERITY_RANK = {"error": 0, "warning": 1, "info": 2}
+MAX_EXAMPLES = 3
+
+# Text elements with their computed colors, and focus problems the accessibility tree does not expose.
+DOM_SCRIPT = """
+() => {
+    const parseColor = c => {
+        const m = c.match(/rgba?\\(([^)]+)\\)/);
+        if (!m) return null;
+        const [r, g, b, a = 1] = m[1].split(/[ ,\\/]+/).filter(Boolean).map(Number);
+        return [r, g, b, a];
+    };
+    const background = el => {
+        for (; el; el = el.parentElement) {
+            const style = getComputedStyle(el);
+            if (style.backgroundImage !== 'none') return null;
+            const color = parseColor(style.backgroundColor);
+            if (color && color[3] > 0) return color;
+        }
+        return [255, 255, 255, 1];
+    };
+    const describe = el => el.tagName.toLowerCase() + (el.id ? '#' + el.id : '') + (el.className && typeof el.className === 'string' ? '.' + el.className.trim().split(/\\s+/)[0] : '');
+    const text = [];
+    for (const el of document.body ? document.body.querySelectorAll('*') : []) {
+        if (text.length >= 400) break;
+        const own = [...el.childNodes].filter(n => n.nodeType === 3).map(n => n.textContent.trim()).join(' ').trim();
+        if (!own || !el.checkVisibility?.()) continue;
+        const style = getComputedStyle(el);
+        text.push({
+            selector: describe(el),
+            text: own.slice(0, 60),
+            color: parseColor(style.color),
+            background: background(el),
+            size: parseFloat(style.fontSize),
+            bold: parseInt(style.fontWeight) >= 700,
+        });
+    }
+    const positiveTabindex = [...document.querySelectorAll('[tabindex]')].filter(el => el.tabIndex > 0).map(describe);
+    const clickableNotFocusable = [...document.querySelectorAll('[onclick]')]
+        .filter(el => el.tabIndex < 0 && !['a', 'button', 'input', 'select', 'textarea'].includes(el.tagName.toLowerCase()))
+        .map(describe);
+    const hiddenFocusable = [...document.querySelectorAll('[aria-hidden="true"] a[href], [aria-hidden="true"] button, [aria-hidden="true"] input, [aria-hidden="true"] [tabindex]:not([tabindex="-1"])')].map(describe);
+    return { text, positiveTabindex, clickableNotFocusable, hiddenFocusable, lang: document.documentElement.lang || '' };
+}
+"""
+
+
+def relative_luminance(color: list[float]) -> float:
+    channels = []
+    for c in color[:3]:
+        c = c / 255
+        channels.append(c / 12.92 if c <= 0.03928 else ((c + 0.055) / 1.055) ** 2.4)
+    return 0.2126 * channels[0] + 0.7152 * channels[1] + 0.0722 * channels[2]
+
+
+def blend(foreground: list[float], background: list[float]) -> list[float]:
+    alpha = foreground[3] if len(foreground) > 3 else 1
+    return [foreground[i] * alpha + background[i] * (1 - alpha) for i in range(3)]
+
+
+def contrast_ratio(foreground: list[float], background: list[float]) -> float:
+    lighter, darker = sorted((relative_luminance(blend(foreground, background)), relative_luminance(background)), reverse=True)
+    return (lighter + 0.05) / (darker + 0.05)
+
+
+def ax_value(node: dict, key: str) -> str:
+    return str((node.get(key) or {}).get("value") or "").strip()
+
+
+def ax_property(node: dict, name: str):
+    for prop in node.get("properties", []):
+        if prop["name"] == name:
+            return prop["value"].get("value")
+    return None
+
+
+def run_rules(ax_nodes: list[dict], dom: dict) -> list[tuple[str, str, list[str]]]:
+    """Run the rule engine. Returns (severity, rule, offending examples) tuples."""
+    nodes = {n["nodeId"]: n for n in ax_nodes if not n.get("ignored")}
+    parents = {child: n["nodeId"] for n in ax_nodes for child in n.get("childIds", [])}
+    findings: dict[tuple[str, str], list[str]] = defaultdict(list)
+
+    def add(severity: str, rule: str, example: str) -> None:
+        findings[(severity, rule)].append(example)
+
+    def context(node_id: str) -> str:
+        # Unnamed nodes are described by their nearest named ancestor, e.g. "button in navigation 'Main'".
+        while node_id in parents:
+            node_id = parents[node_id]
+            ancestor = nodes.get(node_id, {})
+            if (name := ax_value(ancestor, "name")) and ax_value(ancestor, "role") != "RootWebArea":
+                return f" in {ax_value(ancestor, 'role')} {name[:40]!r}"
+        return ""
+
+    def in_landmark(node_id: str) -> bool:
+        while node_id in parents:
+            node_id = parents[node_id]
+            if ax_value(nodes.get(node_id, {}), "role") in LANDMARK_ROLES:
+                return True
+        return False
+
+    headings = []
+    roles = set()
+    text_outside_landmarks = 0
+    for node in nodes.values():
+        role, name = ax_value(node, "role"), ax_value(node, "name")
+        roles.add(role)
+        if role in INTERACTIVE_ROLES and not name:
+            add("error", f"{role} without an accessible name", role + context(node["nodeId"]))
+        elif role in ("image", "img") and not name:
+            add("warning", "image without alt text", "image" + context(node["nodeId"]))
+        elif role == "heading":
+            headings.append((int(ax_property(node, "level") or 0), name))
+        elif role == "StaticText" and name and not in_landmark(node["nodeId"]):
+            text_outside_landmarks += 1
+
+    if not headings:
+        add("warning", "no headings", "page has no heading elements")
+    else:
+        h1s = [name for level, name in headings if level == 1]
+        if not h1s:
+            add("warning", "no level-1 heading", f"first heading is h{headings[0][0]}: {headings[0][1][:50]!r}")
+        elif len(h1s) > 1:
+            add("info", "multiple level-1 headings", ", ".join(repr(h[:40]) for h in h1s))
+        for (previous, _), (level, name) in zip(headings, headings[1:]):
+            if level > previous + 1:
+                add("warning", "skipped heading level", f"h{previous} -> h{level} {name[:50]!r}")
+        for level, name in headings:
+            if not name:
+                add("error", "empty heading", f"h{level}")
+
+    if "main" not in roles:
+        add("warning", "no main landmark", "page has no <main> or role=main")
+    if "navigation" not in roles:
+        add("info", "no navigation landmark", "page has no <nav> or role=navigation")
+    if text_outside_landmarks:
+        add("info", "text outside landmarks", f"{text_outside_landmarks} text nodes are not inside any landmark")
+
+    for sample in dom["text"]:
+        if not sample["color"] or not sample["background"]:
+            continue
+        ratio = contrast_ratio(sample["color"], sample["background"])
+        large = sample["size"] >= 24 or (sample["bold"] and sample["size"] >= 18.66)
+        required = 3.0 if large else 4.5
+        if ratio < required:
+            add("error" if ratio < required - 1.5 else "warning", "insufficient text contrast",
+                f"{sample['selector']} {sample['text'][:40]!r} ratio {ratio:.2f}:1 (needs {required}:1)")
+
+    for selector in dom["positiveTabindex"]:
+        add("warning", "positive tabindex disturbs focus order", selector)
+    for selector in dom["clickableNotFocusable"]:
+        add("error", "click handler on element that is not keyboard focusable", selector)
+    for selector in dom["hiddenFocusable"]:
+        add("error", "focusable element inside aria-hidden", selector)
+    if not dom["lang"]:
+        add("warning", "missing lang attribute on <html>", "<html>")
+
+    ranked = sorted(findings.items(), key=lambda item: (SEVERITY_RANK[item[0][0]], -len(item[1])))
+    return [(severity, rule, examples) for (severity, rule), examples in ranked]
+
+
+def format_findings(url: str, findings: list[tuple[str, str, list[str]]], node_count: int) -> str:
+    if not findings:
+        return f"Accessibility audit of {url}: no issues found across {node_count} accessibility nodes."
+    parts = [f"Accessibility audit of {url} ({node_count} accessibility nodes), most severe first:"]
+    for severity, rule, examples in findings:
+        shown = "; ".join(examples[:MAX_EXAMPLES])
+        more = f" (+{len(examples) - MAX_EXAMPLES} more)" if len(examples) > MAX_EXAMPLES else ""
+        parts.append(f"- [{severity}] {rule} x{len(examples)}: {shown}{more}")
+    return "\n".join(parts)
+
+
+async def audit_page(page: Page) -> str:
+    """Pull the full accessibility tree over CDP plus computed styles, and run the rule engine over them."""
+    cdp = await page.context.new_cdp_session(page)
+    try:
+        await cdp.send("Accessibility.enable")
+        tree = await cdp.send("Accessibility.getFullAXTree")
+    finally:
+        await cdp.detach()
+    dom = await page.evaluate(DOM_SCRIPT)
+    return format_findings(page.url, run_rules(tree["nodes"], dom), len(tree["nodes"]))
@@ -0,0 +1,107 @@
+from collections import deque
+from typing import AsyncIterator
+import asyncio
+import math
+import time
+
+from constants import (
+    ENTRY_RUN_BURST, ENTRY_RUNS_PER_MINUTE, MAX_CONCURRENT_AGENT_RUNS, USER_RUN_BURST, USER_RUNS_PER_MINUTE,
+)
+
+
+class TokenBucket:
+    def __init__(self, per_minute: float, burst: int):
+        self.rate = per_minute / 60
+        self.capacity = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def take(self) -> float:
+        """Take a token if available. Returns 0 on success, otherwise the seconds until one is."""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+        return (1 - self.tokens) / self.rate
+
+
+buckets: dict[tuple[str, int], TokenBucket] = {}
+
+
+def take_run_token(user_id: int, website_entry_id: int | None) -> int:
+    """
+    Charge a run to both the user's and the entry's bucket, or only the user's for a batch
+    (website_entry_id None). Returns a Retry-After in seconds, or 0 if admitted.
+    """
+    charged = [buckets.setdefault(("user", user_id), TokenBucket(USER_RUNS_PER_MINUTE, USER_RUN_BURST))]
+    if website_entry_id is not None:
+        charged.append(buckets.setdefault(("entry", website_entry_id), TokenBucket(ENTRY_RUNS_PER_MINUTE, ENTRY_RUN_BURST)))
+    waits = [bucket.take() for bucket in charged]
+    if max(waits) == 0:
+        return 0
+    # Refund the bucket that did admit, so a rejected request is not charged at all.
+    for bucket, wait in zip(charged, waits):
+        if wait == 0:
+            bucket.tokens += 1
+    return math.ceil(max(waits))
+
+
+class AgentSlots:
+    """
+    FIFO-fair global cap on concurrent agent runs (each holds a browser and an LLM loop).
+    acquire() is an async generator that yields the caller's queue position while it waits
+    and returns once the slot is held; release() must follow.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.active = 0
+        self.waiters: deque[asyncio.Queue] = deque()
+
+    def notify_positions(self) -> None:
+        for position, waiter in enumerate(self.waiters, start=1):
+            waiter.put_nowait(position)
+
+    async def acquire(self) -> AsyncIterator[int]:
+        if self.active < self.capacity and not self.waiters:
+            self.active += 1
+            return
+        waiter: asyncio.Queue = asyncio.Queue()
+        self.waiters.append(waiter)
+        waiter.put_nowait(len(self.waiters))
+        acquired = False
+        try:
+            while True:
+                position = await waiter.get()
+                if position == 0:
+                    acquired = True
+                    return
+                yield position
+        finally:
+            if not acquired:
+                if waiter in self.waiters:
+                    self.waiters.remove(waiter)
+                    self.notify_positions()
+                elif any(p == 0 for p in drain(waiter)):
+                    # The slot was handed over just as the waiter gave up.
+                    self.release()
+
+    def release(self) -> None:
+        if self.waiters:
+            # Hand the slot straight to the next waiter so late arrivals cannot jump the queue.
+            self.waiters.popleft().put_nowait(0)
+            self.notify_positions()
+        else:
+            self.active -= 1
+
+
+def drain(queue: asyncio.Queue) -> list:
+    items = []
+    while not queue.empty():
+        items.append(queue.get_nowait())
+    return items
+
+
+agent_slots = AgentSlots(MAX_CONCURRENT_AGENT_RUNS)
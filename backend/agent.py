@@ -1,23 +1,39 @@
 from typing import TypedDict, Annotated, Literal
 from langchain_openai import ChatOpenAI
-from langchain_core.messages import BaseMessage
+from langchain_core.messages import BaseMessage, SystemMessage, ToolMessage
 from langchain_community.tools import tool
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langgraph.graph import StateGraph, START, END, add_messages
 from langgraph.prebuilt import ToolNode
 from dotenv import load_dotenv
 from sqlalchemy import Engine
+import logging
 
+from admission import agent_slots
 from agent_tools import get_tools
+from agent_tracing import AgentTracingHandler
+from budget import RunBudget
+from cassettes import open_cassette
+from checkpointer import DatabaseCheckpointSaver
+from tracing import tracer
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+BUDGET_NUDGE = (
+    "This run's budget (time, tool calls, tokens or page loads) is nearly used up. "
+    "Submit any diagnostics you are confident about now and then stop calling tools."
+)
+
 class AgentState(TypedDict):
     messages: Annotated[list[BaseMessage], add_messages]
     website_url: str
     repo_name: str
     conclusion: str
     is_fix_action: bool
+    # RunBudget.usage() as of the last node, so a resumed run keeps counting from there.
+    usage: dict
 
 analyze_prompt = ChatPromptTemplate([
     (
@@ -41,7 +57,8 @@ analyze_prompt = ChatPromptTemplate([
         issue and the changes.
 
         For ALL GitHub write operations (creating branches, committing files, opening PRs) you MUST
-        use ONLY these tools: gh_create_branch, gh_create_or_update_file, gh_create_pull_request.
+        use ONLY these tools: gh_create_branch, gh_commit_files, gh_create_or_update_file, gh_create_pull_request.
+        Commit all files of a fix together with a single gh_commit_files call.
         Never use GitHub MCP tools for write operations — they are read-only and will always fail.
         You must always write to a new branch, you do not have permission to write to master or main.
         Create a new branch for all is_fix_action=true operations.
@@ -49,6 +66,10 @@ analyze_prompt = ChatPromptTemplate([
         Think in steps.
         You have browser interaction tools. For dynamic UIs, open a page, click elements, type into fields,
         wait for selectors, and then read the resulting page text/metadata before concluding.
+        Start an analysis with discover_pages to learn which pages exist from the sitemaps instead of guessing URLs.
+        To look for broken links or redirect chains, call check_links once with the pages to scan instead of
+        opening links one by one.
+        For responsive or mobile issues, use check_viewports rather than resizing the interactive page.
 
         Some of the many potential diagnostic topics that you could analyze:
             - SEO (search engine optimization)
@@ -61,8 +82,9 @@ analyze_prompt = ChatPromptTemplate([
         Website URL: {website_url}
         GitHub repository: {repo_name}
 
-        When accessing the GitHub repository, always list the directory structure first
-        before attempting to read specific files, so you know which paths exist.
+        To read the GitHub repository, prefer repo_list_files, repo_read_files and repo_search: they are
+        cached per commit, so list or search once to learn which paths exist, then read every file you need
+        in a single repo_read_files call instead of one file at a time.
 
         `is_fix_action`: {is_fix_action}
         """
@@ -92,61 +114,133 @@ conclude_prompt = ChatPromptTemplate([
     MessagesPlaceholder("messages")
 ])
 
-async def run_agent(messages: list[BaseMessage], website_url: str, repo_name: str, db_engine: Engine, website_entry_id: int, github_token: str, is_fix_action: bool):
-    tools, cleanup = await get_tools(db_engine, website_entry_id, github_token, is_fix_action, website_url)
-
-    llm_analyze = ChatOpenAI(model="gpt-5-mini").bind_tools(tools)
-    llm_conclude = ChatOpenAI(model="gpt-5.2")
+async def run_agent(messages: list[BaseMessage], website_url: str, repo_name: str, db_engine: Engine, website_entry_id: int, github_token: str, is_fix_action: bool, run_id: str | None = None, budget_limits: dict | None = None, is_automated: bool = False):
+    root = tracer.start_span("agent.run", website_entry_id=website_entry_id, is_fix_action=is_fix_action)
+    # Tool, LLM and DB spans started anywhere in the run, including in the graph's tasks and threads, nest under it.
+    root_token = tracer.activate(root)
+    queue_wait = tracer.start_span("agent.queue_wait", parent=root)
+    try:
+        # Chat, verification and fix runs share one global budget of browsers and LLM loops.
+        async for position in agent_slots.acquire():
+            yield {"type": "queued", "position": position}
+    except BaseException:
+        tracer.end_span(queue_wait, "error")
+        tracer.end_span(root, "error")
+        tracer.deactivate(root_token)
+        raise
+    tracer.end_span(queue_wait)
+
+    budget = RunBudget(**(budget_limits or {}))
+    cassette = open_cassette(website_entry_id)
+    setup = tracer.start_span("agent.setup", parent=root)
+    try:
+        tools, cleanup = await get_tools(db_engine, website_entry_id, github_token, is_fix_action, website_url, budget, cassette, is_automated)
+    except BaseException:
+        tracer.end_span(setup, "error")
+        tracer.end_span(root, "error")
+        tracer.deactivate(root_token)
+        agent_slots.release()
+        raise
+    tracer.end_span(setup)
+
+    llm_options = cassette.llm_options() if cassette else {}
+    llm_analyze = ChatOpenAI(model="gpt-5-mini", **llm_options).bind_tools(tools)
+    llm_conclude = ChatOpenAI(model="gpt-5.2", **llm_options)
+
+    def record_tokens(response) -> None:
+        if response.usage_metadata:
+            budget.tokens += response.usage_metadata.get("total_tokens", 0)
 
     def analyze(state: AgentState) -> AgentState:
+        messages = state["messages"]
+        if budget.nearly_exhausted():
+            messages = messages + [SystemMessage(BUDGET_NUDGE)]
         response = (analyze_prompt | llm_analyze).invoke({
-            "messages": state["messages"],
+            "messages": messages,
             "website_url": state["website_url"],
             "repo_name": state["repo_name"],
             "is_fix_action": state["is_fix_action"],
         })
-        return {"messages": response}
+        record_tokens(response)
+        return {"messages": response, "usage": budget.usage()}
+
+    def skip_tools(state: AgentState) -> AgentState:
+        # Every tool call needs a matching tool message before the conversation can continue.
+        return {"messages": [
+            ToolMessage(f"Skipped: the run budget is exhausted ({', '.join(budget.exhausted())}).", tool_call_id=call["id"])
+            for call in state["messages"][-1].tool_calls
+        ], "usage": budget.usage()}
 
     def conclude(state: AgentState) -> AgentState:
         response = (conclude_prompt | llm_conclude).invoke({
             "messages": state["messages"]
         })
-        return {"conclusion": response.content}
+        record_tokens(response)
+        return {"conclusion": response.content, "usage": budget.usage()}
 
-    def analyze_path(state: AgentState) -> Literal["tools", "conclude"]:
-        if state["messages"][-1].tool_calls:
-            return "tools"
-        else:
+    def analyze_path(state: AgentState) -> Literal["tools", "skip_tools", "conclude"]:
+        tool_calls = state["messages"][-1].tool_calls
+        if not tool_calls:
             return "conclude"
+        if budget.exhausted() or budget.charge("tool_calls", len(tool_calls)):
+            return "skip_tools"
+        return "tools"
+
+    def tools_path(state: AgentState) -> Literal["analyze", "conclude"]:
+        return "conclude" if budget.exhausted() else "analyze"
 
     graph = StateGraph(AgentState)
     graph.add_node("analyze", analyze)
-    graph.add_node("analyze_tools", ToolNode(tools, handle_tool_errors=True))
+    graph.add_node("analyze_tools", ToolNode(tools, handle_tool_errors=True, awrap_tool_call=cassette.wrap_tool_call if cassette else None))
+    graph.add_node("skip_tools", skip_tools)
     graph.add_node("conclude", conclude)
     graph.add_edge(START, "analyze")
-    graph.add_conditional_edges("analyze", analyze_path, {"tools": "analyze_tools", "conclude": "conclude"})
-    graph.add_edge("analyze_tools", "analyze")
+    graph.add_conditional_edges("analyze", analyze_path, {"tools": "analyze_tools", "skip_tools": "skip_tools", "conclude": "conclude"})
+    graph.add_conditional_edges("analyze_tools", tools_path, {"analyze": "analyze", "conclude": "conclude"})
+    graph.add_edge("skip_tools", "conclude")
     graph.add_edge("conclude", END)
 
-    agent = graph.compile()
+    # Durable runs checkpoint after every node, so a retried or recovered run resumes from
+    # the last completed node instead of redoing its browser and LLM work.
+    checkpointer = DatabaseCheckpointSaver(db_engine) if run_id else None
+    agent = graph.compile(checkpointer=checkpointer)
+    config = {"recursion_limit": 100, "callbacks": [AgentTracingHandler(root)]}
+    graph_input = {
+        "messages": messages,
+        "website_url": website_url,
+        "repo_name": repo_name,
+        "is_fix_action": is_fix_action
+    }
+    if checkpointer:
+        config["configurable"] = {"thread_id": run_id}
+        saved = await agent.aget_state(config)
+        if saved.values:
+            # Also covers a run that finished but was not cleaned up: it just returns its conclusion.
+            logger.info("Resuming agent run run_id=%s website_entry_id=%s next=%s", run_id, website_entry_id, saved.next)
+            root.attributes["resumed"] = True
+            budget.restore(saved.values.get("usage", {}))
+            graph_input = None
     conclusion = ""
+    status = "error"
     try:
-        async for event in agent.astream_events(
-            {
-                "messages": messages,
-                "website_url": website_url,
-                "repo_name": repo_name,
-                "is_fix_action": is_fix_action
-            },
-            config={"recursion_limit": 100},
-            version="v2",
-        ):
+        async for event in agent.astream_events(graph_input, config=config, version="v2"):
             kind = event["event"]
             if kind == "on_tool_start":
                 yield {"type": "tool_start", "tool": event["name"]}
             elif kind == "on_chain_end" and event.get("name") == "LangGraph":
                 output = event["data"].get("output", {})
                 conclusion = output.get("conclusion", "")
-        yield {"type": "done", "content": conclusion}
+        if checkpointer:
+            conclusion = conclusion or (await agent.aget_state(config)).values.get("conclusion", "")
+            await checkpointer.adelete_thread(run_id)
+        status = "ok"
+        yield {"type": "done", "content": conclusion, "usage": budget.usage()}
     finally:
         await cleanup()
+        agent_slots.release()
+        if cassette:
+            cassette.save()
+        root.attributes["budget"] = budget.usage()
+        logger.info("Agent run finished website_entry_id=%s status=%s budget=%s", website_entry_id, status, budget.usage())
+        tracer.end_span(root, status)
+        tracer.deactivate(root_token)
@@ -1,35 +1,93 @@
+import asyncio
 import base64
+import hashlib
 import logging
+import re
 import time
-import requests
-from typing import Callable
-from playwright.async_api import Page, async_playwright
+from typing import Any, Awaitable, Callable
+from playwright.async_api import Browser, BrowserContext, Page
 from langchain_mcp_adapters.client import MultiServerMCPClient
 from langchain_community.tools import BaseTool, tool
 from sqlalchemy import Engine
-from sqlmodel import Session
+from sqlmodel import Session, select
 
+from a11y import audit_page
+from artifacts import artifact_store, site_key
+from audit import format_audit, run_performance_audit
+from browsers import browser_pool
+from budget import RunBudget
+from cassettes import Cassette
+from diagnostics import record_diagnostic
+from constants import GITHUB_API_URL, GITHUB_MCP_URL, MCP_TOOLS_TTL_SECONDS, VISUAL_SNAPSHOTS_ENABLED
+from frontier import MAX_FRONTIER_URLS, FrontierResult, build_frontier, format_frontier
+from links import LINK_SCRIPT, LinkChecker, format_link_report, normalize_link
 from models import *
+from repo import commit_files, get_tree, github_http, list_files, read_blobs, search_files
+from site_resources import ResourceRecord, summarize_resources
+from snapshots import DOM_SIGNATURE_SCRIPT, content_hash, diff_snapshot, get_snapshot, save_snapshot, split_sections
+from viewports import DEVICES, check_viewport, format_viewport_report
+from visual import Capture, capture_page, describe_regions, diff_visual_snapshot, get_visual_snapshot, save_visual_snapshot, visual_finding
 
 logger = logging.getLogger(__name__)
 
-async def get_tools(db_engine: Engine, website_entry_id: int, github_token: str, is_fix_action: bool, website_url: str = "") -> tuple[list[BaseTool], Callable]:
-    logger.info("Initializing agent tools for website_entry_id=%s", website_entry_id)
+MAX_RESOURCE_PAGES = 10
+MAX_LISTED_FILES = 300
+MAX_READ_FILES = 20
+MAX_READ_CHARS = 30000
+MAX_LINK_PAGES = 20
+MAX_CHECKED_LINKS = 3000
+
+# GitHub MCP tool lists per token. The tools open their own MCP session for each call, so one list
+# serves every run of the same user, e.g. all the runs of a batch verification.
+github_tool_lists: dict[str, tuple[float, list[BaseTool]]] = {}
 
-    pw = await async_playwright().start()
-    browser = await pw.chromium.launch()
-    browser_context = await browser.new_context()
-    interactive_page: Page | None = None
 
+async def get_github_tools(github_token: str) -> list[BaseTool]:
+    key = hashlib.sha256(github_token.encode("utf-8")).hexdigest()
+    now = time.monotonic()
+    cached = github_tool_lists.get(key)
+    if cached and now - cached[0] < MCP_TOOLS_TTL_SECONDS:
+        return cached[1]
+    # Expired lists are dropped here, so users who stopped running the agent don't stay cached.
+    for stale in [k for k, (fetched_at, _) in github_tool_lists.items() if now - fetched_at >= MCP_TOOLS_TTL_SECONDS]:
+        del github_tool_lists[stale]
     mcp = MultiServerMCPClient({
         "github": {
-            "url": "https://api.githubcopilot.com/mcp/readonly",
+            "url": GITHUB_MCP_URL,
             "transport": "streamable_http",
             "headers": {"Authorization": f"Bearer {github_token}"},
         }
     })
+    tools = await mcp.get_tools()
+    github_tool_lists[key] = (time.monotonic(), tools)
+    return tools
+
+
+async def get_tools(db_engine: Engine, website_entry_id: int, github_token: str, is_fix_action: bool, website_url: str = "", budget: RunBudget | None = None, cassette: Cassette | None = None, is_automated: bool = False) -> tuple[list[BaseTool], Callable]:
+    logger.info("Initializing agent tools for website_entry_id=%s", website_entry_id)
+    budget = budget or RunBudget()
+    run_started = time.time()
 
-    github_tools = await mcp.get_tools()
+    browser: Browser | None = None
+    browser_context: BrowserContext | None = None
+    browser_lock = asyncio.Lock()
+    interactive_page: Page | None = None
+    session_private = False
+    audit_cache: dict[str, str] = {}
+    snapshot_urls_read: set[str] = set()
+    # Only automated verification runs diff pages against, and replace, the previous run's snapshots.
+    # Tool results aren't kept in the chat history, so a chat answering from a diff would have nothing to go on.
+    use_snapshots = is_automated and not is_fix_action
+    visual_captured: set[tuple[str, str]] = set()
+    link_checker: LinkChecker | None = None
+    frontier_build: asyncio.Task[FrontierResult] | None = None
+
+    if cassette and cassette.replaying:
+        github_tools = cassette.replay_tools("github")
+    else:
+        github_tools = await get_github_tools(github_token)
+        if cassette:
+            cassette.record_tools("github", github_tools)
     logger.info(
         "Agent tools initialized for website_entry_id=%s with %s github tools",
         website_entry_id,
@@ -49,13 +107,93 @@ async def get_tools(db_engine: Engine, website_entry_id: int, github_token: str,
         lines = [line for line in text.splitlines() if line.strip()]
         return "\n".join(lines)[:max_chars]
 
+    async def ensure_browser() -> BrowserContext:
+        # The shared browser is acquired by the first browser tool call, so runs that never browse don't hold it.
+        # Each run gets its own context in it, which keeps cookies and storage apart from other runs.
+        nonlocal browser, browser_context
+        async with browser_lock:
+            if browser_context is None:
+                start = time.time()
+                browser = browser or await browser_pool.acquire()
+                browser_context = await browser.new_context()
+                logger.info(
+                    "Browser context opened website_entry_id=%s elapsed_ms=%s",
+                    website_entry_id,
+                    int((time.time() - start) * 1000),
+                )
+        return browser_context
+
+    async def site_frontier() -> FrontierResult:
+        # Built once per run from robots.txt and the sitemaps, and shared by every tool that needs pages.
+        nonlocal frontier_build
+        if frontier_build is None:
+            frontier_build = asyncio.create_task(shared("frontier", website_url, lambda: build_frontier(website_url), fresh_context=True))
+        return await frontier_build
+
+    async def default_pages(limit: int) -> list[str]:
+        pages = [url for url, _ in (await site_frontier()).pages[:limit]]
+        return pages or [website_url]
+
     async def ensure_interactive_page() -> Page:
         nonlocal interactive_page
         if interactive_page is None or interactive_page.is_closed():
             logger.info("Creating new interactive page for website_entry_id=%s", website_entry_id)
-            interactive_page = await browser_context.new_page()
+            interactive_page = await (await ensure_browser()).new_page()
         return interactive_page
 
+    async def interact_with_page() -> Page:
+        # Clicking and typing can log in or change what the site shows this visitor, so from then on
+        # pages loaded in this run's browser context are no longer shared with other runs.
+        nonlocal session_private
+        session_private = True
+        return await ensure_interactive_page()
+
+    async def shared(kind: str, url: str, compute: Callable[[], Awaitable[Any]], fresh_context: bool = False) -> Any:
+        # Results are shared with overlapping runs on the same site (see artifacts.py) unless they came from
+        # this run's browser context after it interacted with the site. Fresh contexts and plain HTTP are anonymous.
+        if session_private and not fresh_context:
+            return await compute()
+        return await artifact_store.share(site_key(url), kind, url, compute, run_started)
+
+    async def try_capture(page: Page) -> Capture | None:
+        if not VISUAL_SNAPSHOTS_ENABLED:
+            return None
+        try:
+            return await capture_page(page)
+        except Exception:
+            logger.exception("Screenshot failed website_entry_id=%s url=%s", website_entry_id, page.url)
+            return None
+
+    def compare_screenshot(capture: Capture | None, url: str, device: str) -> tuple[str, str, list[str]] | None:
+        # Once per page and viewport per run, the page is compared with the previous run's screenshot,
+        # which it then replaces. Pages that look the same add nothing to the tool result. Like text
+        # snapshots, only verification runs compare and replace the baseline, so a chat or auto-fix run
+        # doesn't move it. Captures are still taken, since they may be shared with a verification run.
+        if capture is None or not use_snapshots or (url, device) in visual_captured:
+            return None
+        visual_captured.add((url, device))
+        start = time.time()
+        try:
+            with Session(db_engine) as session:
+                previous = get_visual_snapshot(session, website_entry_id, url, device)
+                regions, notes = diff_visual_snapshot(previous, capture) if previous else ([], [])
+                seen = previous.updated_at.strftime("%Y-%m-%d %H:%M UTC") if previous else ""
+                save_visual_snapshot(session, website_entry_id, url, device, capture)
+            examples = describe_regions(capture, regions)
+        except Exception:
+            logger.exception("Visual snapshot failed website_entry_id=%s url=%s device=%s", website_entry_id, url, device)
+            return None
+        logger.info(
+            "Visual snapshot compared website_entry_id=%s url=%s device=%s baseline=%s regions=%s elapsed_ms=%s",
+            website_entry_id,
+            url,
+            device,
+            bool(seen),
+            len(regions),
+            int((time.time() - start) * 1000),
+        )
+        return visual_finding(seen, regions, notes, examples) if regions or notes else None
+
     async def settle_page(page: Page, timeout_ms: int = 8000) -> None:
         try:
             await page.wait_for_load_state("networkidle", timeout=timeout_ms)
@@ -73,7 +211,7 @@ async def get_tools(db_engine: Engine, website_entry_id: int, github_token: str,
         Returns:
             The loaded URL and page title, or an error message.
         """
-        if err := _block_off_domain(url):
+        if err := _block_off_domain(url) or budget.charge("page_loads"):
             return err
         start = time.time()
         logger.info("Tool open_page start website_entry_id=%s url=%s", website_entry_id, url)
@@ -110,7 +248,7 @@ async def get_tools(db_engine: Engine, website_entry_id: int, github_token: str,
         """
         start = time.time()
         logger.info("Tool click_element start website_entry_id=%s selector=%s", website_entry_id, selector)
-        page = await ensure_interactive_page()
+        page = await interact_with_page()
         try:
             locator = page.locator(selector).first
             await locator.wait_for(state="visible", timeout=10000)
@@ -154,7 +292,7 @@ async def get_tools(db_engine: Engine, website_entry_id: int, github_token: str,
             clear_first,
             press_enter,
         )
-        page = await ensure_interactive_page()
+        page = await interact_with_page()
         try:
             locator = page.locator(selector).first
             await locator.wait_for(state="visible", timeout=10000)
@@ -193,7 +331,7 @@ async def get_tools(db_engine: Engine, website_entry_id: int, github_token: str,
         """
         start = time.time()
         logger.info("Tool press_key start website_entry_id=%s key=%s", website_entry_id, key)
-        page = await ensure_interactive_page()
+        page = await interact_with_page()
         try:
             await page.keyboard.press(key)
             await settle_page(page, timeout_ms=4000)
@@ -294,32 +432,66 @@ async def get_tools(db_engine: Engine, website_entry_id: int, github_token: str,
         return page.url or "No URL loaded yet."
 
     @tool
-    async def fetch_page(url: str) -> str:
+    async def fetch_page(url: str, full: bool = False) -> str:
         """
         Fetch the fully rendered content of a web page and return it as readable text.
         Uses a real browser, so JavaScript-rendered content is included.
         Use this to read the actual content of any page on the website.
+        In automated verification runs, pages read in an earlier run are compared with that snapshot:
+        unchanged pages return a short marker and changed pages return only the changed sections, plus
+        the regions that look different from the last run's screenshot.
         Parameters:
             url: The full URL to fetch (e.g. https://example.com/about)
+            full: Return the complete page text even if the page is unchanged since the last run.
         Returns:
-            The visible text content of the page, or an error message.
+            The visible text content of the page (or its changes since the last run), or an error message.
         """
-        if err := _block_off_domain(url):
+        if err := _block_off_domain(url) or budget.charge("page_loads"):
             return err
         start = time.time()
         logger.info("Tool fetch_page start website_entry_id=%s url=%s", website_entry_id, url)
-        page = await browser_context.new_page()
+
+        async def render() -> dict:
+            page = await (await ensure_browser()).new_page()
+            try:
+                await page.goto(url, wait_until="networkidle", timeout=30000)
+                return {
+                    "text": compact_visible_text(await page.inner_text("body")),
+                    "metadata": await page.evaluate("""({
+                        title: document.title,
+                        description: document.querySelector('meta[name="description"]')?.content ?? null,
+                        canonical: document.querySelector('link[rel="canonical"]')?.href ?? null,
+                    })"""),
+                    "dom_hash": content_hash(await page.evaluate(DOM_SIGNATURE_SCRIPT)),
+                    "capture": await try_capture(page),
+                }
+            finally:
+                await page.close()
+
         try:
-            await page.goto(url, wait_until="networkidle", timeout=30000)
-            text = await page.inner_text("body")
+            rendered = await shared("render", url, render)
+            text, metadata, dom_hash = rendered["text"], rendered["metadata"], rendered["dom_hash"]
+            result = text
+            if use_snapshots:
+                sections = split_sections(text)
+                with Session(db_engine) as session:
+                    previous = get_snapshot(session, website_entry_id, url)
+                    # Re-reads within the same run get the full text; the snapshot was already refreshed.
+                    if previous and not full and url not in snapshot_urls_read:
+                        result = diff_snapshot(session, previous, sections, metadata, dom_hash)
+                    save_snapshot(session, website_entry_id, url, sections, metadata, dom_hash)
+                snapshot_urls_read.add(url)
+            if visual := compare_screenshot(rendered["capture"], url, "default"):
+                result += f"\n{visual[1]}:\n" + "\n".join(f"- {e}" for e in visual[2])
             logger.info(
-                "Tool fetch_page success website_entry_id=%s url=%s text_len=%s elapsed_ms=%s",
+                "Tool fetch_page success website_entry_id=%s url=%s text_len=%s result_len=%s elapsed_ms=%s",
                 website_entry_id,
                 url,
                 len(text),
+                len(result),
                 int((time.time() - start) * 1000),
             )
-            return compact_visible_text(text)
+            return result
         except Exception as e:
             logger.exception(
                 "Tool fetch_page failed website_entry_id=%s url=%s elapsed_ms=%s",
@@ -328,8 +500,6 @@ async def get_tools(db_engine: Engine, website_entry_id: int, github_token: str,
                 int((time.time() - start) * 1000),
             )
             return f"Error fetching {url}: {e}"
-        finally:
-            await page.close()
 
     @tool
     async def get_page_metadata(url: str = "") -> str:
@@ -342,7 +512,7 @@ async def get_tools(db_engine: Engine, website_entry_id: int, github_token: str,
             A summary of the page's metadata, or an error message.
         """
         if url:
-            if err := _block_off_domain(url):
+            if err := _block_off_domain(url) or budget.charge("page_loads"):
                 return err
         start = time.time()
         logger.info("Tool get_page_metadata start website_entry_id=%s url=%s", website_entry_id, url or "<current>")
@@ -393,6 +563,109 @@ async def get_tools(db_engine: Engine, website_entry_id: int, github_token: str,
             )
             return f"Error fetching metadata for {target}: {e}"
 
+    @tool
+    async def audit_accessibility(url: str) -> str:
+        """
+        Run an accessibility audit of a page in one call, using the browser's accessibility tree and computed styles.
+        Checks missing accessible names and alt text, text contrast, heading order, landmark coverage,
+        keyboard focus problems and the document language. Use this instead of inspecting elements one by one.
+        Parameters:
+            url: Full URL of the page to audit.
+        Returns:
+            Findings ranked by severity with examples, or an error message.
+        """
+        if err := _block_off_domain(url) or budget.charge("page_loads"):
+            return err
+        start = time.time()
+        logger.info("Tool audit_accessibility start website_entry_id=%s url=%s", website_entry_id, url)
+
+        async def audit() -> str:
+            page = await (await ensure_browser()).new_page()
+            try:
+                await page.goto(url, wait_until="domcontentloaded", timeout=30000)
+                await settle_page(page)
+                return await audit_page(page)
+            finally:
+                await page.close()
+
+        try:
+            report = await shared("accessibility", url, audit)
+            logger.info(
+                "Tool audit_accessibility success website_entry_id=%s url=%s elapsed_ms=%s",
+                website_entry_id,
+                url,
+                int((time.time() - start) * 1000),
+            )
+            return report
+        except Exception as e:
+            logger.exception(
+                "Tool audit_accessibility failed website_entry_id=%s url=%s elapsed_ms=%s",
+                website_entry_id,
+                url,
+                int((time.time() - start) * 1000),
+            )
+            return f"Error auditing accessibility of {url}: {e}"
+
+    @tool
+    async def check_viewports(url: str, devices: list[str] | None = None) -> str:
+        """
+        Check a page for responsive and mobile issues in several emulated devices at once (mobile, tablet
+        and desktop, loaded in parallel): horizontal overflow and the elements causing it, tap targets that
+        are too small, text too small to read, the viewport meta tag, and regions that look different
+        from the last run's screenshot in that device.
+        Use this instead of resizing or reloading the interactive page for each screen size.
+        Parameters:
+            url: Full URL of the page to check.
+            devices: Which of "mobile", "tablet" and "desktop" to check. Defaults to all three.
+        Returns:
+            Findings per device, or an error message.
+        """
+        if err := _block_off_domain(url):
+            return err
+        names = [name for name in dict.fromkeys(devices or DEVICES) if name in DEVICES]
+        if not names:
+            return f"Error: devices must be among {', '.join(DEVICES)}."
+        start = time.time()
+        logger.info("Tool check_viewports start website_entry_id=%s url=%s devices=%s", website_entry_id, url, names)
+        await ensure_browser()
+
+        async def check(name: str) -> list | str:
+            if err := budget.charge("page_loads"):
+                return err
+            device = DEVICES[name]
+
+            async def load() -> dict:
+                context = await browser.new_context(**device.context_options())
+                try:
+                    page = await context.new_page()
+                    await page.goto(url, wait_until="domcontentloaded", timeout=30000)
+                    await settle_page(page)
+                    return {"findings": await check_viewport(page, device), "capture": await try_capture(page)}
+                finally:
+                    await context.close()
+
+            try:
+                loaded = await shared(f"viewport:{name}", url, load, fresh_context=True)
+            except Exception as e:
+                return str(e)
+            # A copy, since the loaded findings may be shared with other runs.
+            findings = list(loaded["findings"])
+            if visual := compare_screenshot(loaded["capture"], url, name):
+                findings.append(visual)
+            return findings
+
+        # Each device gets its own context in the shared browser, so the whole check takes about as long as the slowest one.
+        results = dict(zip(names, await asyncio.gather(*(check(name) for name in names))))
+        elapsed_ms = int((time.time() - start) * 1000)
+        logger.info(
+            "Tool check_viewports success website_entry_id=%s url=%s devices=%s elapsed_ms=%s",
+            website_entry_id,
+            url,
+            len(names),
+            elapsed_ms,
+        )
+        return format_viewport_report(url, results, elapsed_ms)
+
     @tool
     def submit_diagnostic(short_desc: str, full_desc: str, severity: str = "warning") -> str:
         """
@@ -414,15 +687,17 @@ async def get_tools(db_engine: Engine, website_entry_id: int, github_token: str,
         )
         try:
             with Session(db_engine) as session:
-                diagnostic = Diagnostic(
-                    website_entry_id=website_entry_id,
-                    short_desc=short_desc,
-                    full_desc=full_desc,
-                    severity=severity,
+                diagnostic, created = record_diagnostic(session, website_entry_id, short_desc, full_desc, severity)
+                diagnostic_id, occurrences = diagnostic.id, diagnostic.occurrence_count
+            if not created:
+                logger.info(
+                    "Tool submit_diagnostic deduplicated website_entry_id=%s diagnostic_id=%s occurrences=%s elapsed_ms=%s",
+                    website_entry_id,
+                    diagnostic_id,
+                    occurrences,
+                    int((time.time() - start) * 1000),
                 )
-                session.add(diagnostic)
-                session.commit()
-                diagnostic_id = diagnostic.id
+                return f"Diagnostic already exists with id={diagnostic_id} (seen {occurrences} times); recorded it there instead of creating a duplicate"
             logger.info(
                 "Tool submit_diagnostic success website_entry_id=%s diagnostic_id=%s elapsed_ms=%s",
                 website_entry_id,
@@ -442,9 +717,14 @@ async def get_tools(db_engine: Engine, website_entry_id: int, github_token: str,
         logger.info("Cleaning up agent tools for website_entry_id=%s", website_entry_id)
         if interactive_page is not None and not interactive_page.is_closed():
             await interactive_page.close()
-        await browser_context.close()
-        await browser.close()
-        await pw.stop()
+        if frontier_build is not None:
+            frontier_build.cancel()
+        if link_checker is not None:
+            await link_checker.close()
+        if browser_context is not None:
+            await browser_context.close()
+        if browser is not None:
+            await browser_pool.release()
         logger.info("Cleanup complete for website_entry_id=%s", website_entry_id)
 
     @tool
@@ -461,12 +741,12 @@ async def get_tools(db_engine: Engine, website_entry_id: int, github_token: str,
         logger.info("Tool gh_create_branch start repo=%s branch=%s base=%s", repo, branch, base_branch)
         try:
             headers = {"Authorization": f"Bearer {github_token}", "Accept": "application/vnd.github+json"}
-            ref_resp = requests.get(f"https://api.github.com/repos/{repo}/branches/{base_branch}", headers=headers, timeout=15)
+            ref_resp = github_http.get(f"{GITHUB_API_URL}/repos/{repo}/branches/{base_branch}", headers=headers, timeout=15)
             if not ref_resp.ok:
                 return f"Error getting base branch '{base_branch}' in {repo}: {ref_resp.status_code} {ref_resp.text}"
             sha = ref_resp.json()["commit"]["sha"]
-            create_resp = requests.post(
-                f"https://api.github.com/repos/{repo}/git/refs",
+            create_resp = github_http.post(
+                f"{GITHUB_API_URL}/repos/{repo}/git/refs",
                 headers=headers,
                 json={"ref": f"refs/heads/{branch}", "sha": sha},
                 timeout=15,
@@ -505,7 +785,7 @@ async def get_tools(db_engine: Engine, website_entry_id: int, github_token: str,
             }
             if sha:
                 body["sha"] = sha
-            resp = requests.put(f"https://api.github.com/repos/{repo}/contents/{path}", headers=headers, json=body, timeout=15)
+            resp = github_http.put(f"{GITHUB_API_URL}/repos/{repo}/contents/{path}", headers=headers, json=body, timeout=15)
             resp.raise_for_status()
             commit_sha = resp.json()["commit"]["sha"]
             logger.info("Tool gh_create_or_update_file success repo=%s path=%s commit=%s", repo, path, commit_sha)
@@ -514,6 +794,42 @@ async def get_tools(db_engine: Engine, website_entry_id: int, github_token: str,
             logger.exception("Tool gh_create_or_update_file failed repo=%s path=%s", repo, path)
             return f"Error committing file '{path}' in {repo}: {e}"
 
+    @tool
+    def gh_commit_files(repo: str, branch: str, message: str, files: dict[str, str], delete_paths: list[str] | None = None) -> str:
+        """
+        Commit changes to several files as one atomic commit on a branch. Prefer this over gh_create_or_update_file.
+        Existing file SHAs are looked up automatically and files whose content is unchanged are skipped.
+        Parameters:
+            repo: Repository in 'owner/repo' format.
+            branch: Branch to commit to (must already exist and must not be main or master).
+            message: Commit message.
+            files: Map of file path to its complete new content (plain text, not base64), e.g. {'index.html': '...'}.
+            delete_paths: Optional file paths to delete in the same commit.
+        Returns:
+            Confirmation message with the commit SHA, or an error.
+        """
+        if branch in ("main", "master"):
+            return "Error: committing directly to 'main' or 'master' is not allowed. Create a feature branch first."
+        delete_paths = delete_paths or []
+        logger.info("Tool gh_commit_files start repo=%s branch=%s files=%s deletions=%s", repo, branch, len(files), len(delete_paths))
+        start = time.time()
+        try:
+            commit_sha, changed = commit_files(repo, branch, message, files, delete_paths, github_token)
+            logger.info(
+                "Tool gh_commit_files success repo=%s branch=%s commit=%s changed=%s elapsed_ms=%s",
+                repo,
+                branch,
+                commit_sha,
+                len(changed),
+                int((time.time() - start) * 1000),
+            )
+            if not changed:
+                return f"No changes: every file already matches branch '{branch}' in {repo}. Nothing was committed."
+            return f"Committed {len(changed)} files to branch '{branch}' in {repo} ({', '.join(changed)}). Commit: {commit_sha}"
+        except Exception as e:
+            logger.exception("Tool gh_commit_files failed repo=%s branch=%s", repo, branch)
+            return f"Error committing files to '{branch}' in {repo}: {e}"
+
     @tool
     def gh_create_pull_request(repo: str, title: str, body: str, head: str, base: str = "main") -> str:
         """
@@ -530,8 +846,8 @@ async def get_tools(db_engine: Engine, website_entry_id: int, github_token: str,
         logger.info("Tool gh_create_pull_request start repo=%s head=%s base=%s", repo, head, base)
         try:
             headers = {"Authorization": f"Bearer {github_token}", "Accept": "application/vnd.github+json"}
-            resp = requests.post(
-                f"https://api.github.com/repos/{repo}/pulls",
+            resp = github_http.post(
+                f"{GITHUB_API_URL}/repos/{repo}/pulls",
                 headers=headers,
                 json={"title": title, "body": body, "head": head, "base": base},
                 timeout=15,
@@ -545,54 +861,123 @@ async def get_tools(db_engine: Engine, website_entry_id: int, github_token: str,
             return f"Error creating pull request in {repo}: {e}"
 
     @tool
-    def get_page_speed(url: str) -> str:
+    def repo_list_files(repo: str, path: str = "", pattern: str = "", ref: str = "") -> str:
+        """
+        List files in a GitHub repository from a cached recursive tree (one API call per commit, then free).
+        Parameters:
+            repo: Repository in 'owner/repo' format.
+            path: Optional directory to list (e.g. 'src/components'); lists the whole repository if omitted.
+            pattern: Optional glob to filter paths or file names (e.g. '*.html', 'src/**/*.tsx').
+            ref: Branch, tag or commit SHA (default: the default branch).
+        Returns:
+            Matching file paths with sizes, or an error message.
+        """
+        logger.info("Tool repo_list_files start repo=%s path=%s pattern=%s ref=%s", repo, path, pattern, ref)
+        try:
+            tree = get_tree(repo, ref, github_token)
+            entries = list_files(tree, path, pattern)
+            lines = [f"{e.path} ({e.size} B)" for e in entries[:MAX_LISTED_FILES]]
+            if len(entries) > MAX_LISTED_FILES:
+                lines.append(f"... {len(entries) - MAX_LISTED_FILES} more; narrow with path or pattern.")
+            if tree.truncated:
+                lines.append("Note: GitHub truncated this tree; some files are missing from the listing.")
+            logger.info("Tool repo_list_files success repo=%s commit=%s files=%s", repo, tree.commit_sha, len(entries))
+            return f"{len(entries)} files at commit {tree.commit_sha[:12]}:\n" + "\n".join(lines)
+        except Exception as e:
+            logger.exception("Tool repo_list_files failed repo=%s", repo)
+            return f"Error listing files in {repo}: {e}"
+
+    @tool
+    def repo_read_files(repo: str, paths: list[str], ref: str = "") -> str:
         """
-        Run a Lighthouse performance audit on a URL using Google PageSpeed Insights.
-        Returns a performance score, Core Web Vitals (LCP, FCP, CLS, TBT, TTI, Speed Index),
-        and a list of the top improvement opportunities.
+        Read several files from a GitHub repository in one call. Contents are cached by blob SHA.
+        Each file is returned with its blob SHA, which gh_create_or_update_file needs to update it.
+        Parameters:
+            repo: Repository in 'owner/repo' format.
+            paths: File paths to read (up to 20), e.g. ['index.html', 'src/styles.css'].
+            ref: Branch, tag or commit SHA (default: the default branch).
+        Returns:
+            The contents of each file, or an error message.
+        """
+        logger.info("Tool repo_read_files start repo=%s paths=%s ref=%s", repo, len(paths), ref)
+        try:
+            tree = get_tree(repo, ref, github_token)
+            entries = [tree.files[p.strip("/")] for p in paths[:MAX_READ_FILES] if p.strip("/") in tree.files]
+            missing = [p for p in paths[:MAX_READ_FILES] if p.strip("/") not in tree.files]
+            parts = []
+            for path, text in read_blobs(repo, entries, github_token).items():
+                sha = tree.files[path].sha
+                if text is None:
+                    parts.append(f"=== {path} (sha {sha}) ===\n[binary file, {tree.files[path].size} bytes]")
+                else:
+                    clipped = "\n[... truncated]" if len(text) > MAX_READ_CHARS else ""
+                    parts.append(f"=== {path} (sha {sha}) ===\n{text[:MAX_READ_CHARS]}{clipped}")
+            if missing:
+                parts.append("Not found: " + ", ".join(missing))
+            logger.info("Tool repo_read_files success repo=%s commit=%s read=%s missing=%s", repo, tree.commit_sha, len(entries), len(missing))
+            return "\n\n".join(parts)
+        except Exception as e:
+            logger.exception("Tool repo_read_files failed repo=%s", repo)
+            return f"Error reading files in {repo}: {e}"
+
+    @tool
+    def repo_search(repo: str, regex: str, pattern: str = "", ref: str = "") -> str:
+        """
+        Search the text files of a GitHub repository with a case-insensitive regular expression, like grep.
+        Parameters:
+            repo: Repository in 'owner/repo' format.
+            regex: Regular expression to search for (e.g. 'meta name="description"').
+            pattern: Optional glob to restrict which files are searched (e.g. '*.html').
+            ref: Branch, tag or commit SHA (default: the default branch).
+        Returns:
+            Matching lines as 'path:line: text', or an error message.
+        """
+        logger.info("Tool repo_search start repo=%s regex=%s pattern=%s ref=%s", repo, regex, pattern, ref)
+        try:
+            tree = get_tree(repo, ref, github_token)
+            matches, searched = search_files(repo, tree, regex, github_token, pattern)
+            logger.info("Tool repo_search success repo=%s commit=%s searched=%s matches=%s", repo, tree.commit_sha, searched, len(matches))
+            if not matches:
+                return f"No matches for {regex!r} in {searched} files."
+            return f"{len(matches)} matches in {searched} files searched:\n" + "\n".join(matches)
+        except re.error as e:
+            return f"Error: invalid regular expression {regex!r}: {e}"
+        except Exception as e:
+            logger.exception("Tool repo_search failed repo=%s", repo)
+            return f"Error searching {repo}: {e}"
+
+    @tool
+    async def get_page_speed(url: str) -> str:
+        """
+        Run a Lighthouse-style performance audit on a URL in a local throttled mobile browser.
+        Returns a performance score, Core Web Vitals (FCP, LCP, TBT, CLS, TTFB, TTI),
+        a page weight breakdown by resource type, and a list of the top improvement opportunities.
         Parameters:
             url: The full URL to audit
         Returns:
             A summary of performance metrics and opportunities, or an error message.
         """
+        if err := _block_off_domain(url):
+            return err
+        if url in audit_cache:
+            logger.info("Tool get_page_speed cache hit website_entry_id=%s url=%s", website_entry_id, url)
+            return audit_cache[url]
+        if err := budget.charge("pagespeed_calls"):
+            return err
         start = time.time()
         logger.info("Tool get_page_speed start website_entry_id=%s url=%s", website_entry_id, url)
         try:
-            response = requests.get(
-                "https://www.googleapis.com/pagespeedonline/v5/runPagespeed",
-                params={"url": url, "strategy": "mobile"},
-                timeout=60,
-            )
-            response.raise_for_status()
-            data = response.json()
-            audits = data["lighthouseResult"]["audits"]
-            score = data["lighthouseResult"]["categories"]["performance"]["score"] * 100
-            metrics = {
-                "FCP": audits["first-contentful-paint"]["displayValue"],
-                "LCP": audits["largest-contentful-paint"]["displayValue"],
-                "TBT": audits["total-blocking-time"]["displayValue"],
-                "CLS": audits["cumulative-layout-shift"]["displayValue"],
-                "SI":  audits["speed-index"]["displayValue"],
-                "TTI": audits["interactive"]["displayValue"],
-            }
-            opportunities = [
-                f"- {audits[k]['title']}: {audits[k].get('displayValue', '')}"
-                for k in audits
-                if audits[k].get("details", {}).get("type") == "opportunity"
-                and audits[k].get("score", 1) < 0.9
-            ]
-            parts = [f"Performance score (mobile): {score:.0f}/100"]
-            parts += [f"{k}: {v}" for k, v in metrics.items()]
-            if opportunities:
-                parts.append("Top opportunities:\n" + "\n".join(opportunities[:5]))
+            await ensure_browser()
+            summary = await shared("pagespeed", url, lambda: run_performance_audit(browser, url), fresh_context=True)
+            audit_cache[url] = format_audit(summary)
             logger.info(
                 "Tool get_page_speed success website_entry_id=%s url=%s score=%s elapsed_ms=%s",
                 website_entry_id,
                 url,
-                f"{score:.0f}",
+                summary["score"],
                 int((time.time() - start) * 1000),
             )
-            return "\n".join(parts)
+            return audit_cache[url]
         except Exception as e:
             logger.exception(
                 "Tool get_page_speed failed website_entry_id=%s url=%s elapsed_ms=%s",
@@ -600,9 +985,186 @@ async def get_tools(db_engine: Engine, website_entry_id: int, github_token: str,
                 url,
                 int((time.time() - start) * 1000),
             )
-            return f"Error running PageSpeed audit for {url}: {e}"
+            return f"Error running performance audit for {url}: {e}"
+
+    @tool
+    async def analyze_site_resources(urls: list[str] | None = None) -> str:
+        """
+        Load several pages of the website and analyze every network response in one call:
+        transfer size by type, heaviest assets, compression, Cache-Control/ETag headers on static assets,
+        render-blocking resources, duplicate downloads, third-party weight and failed requests.
+        Prefer this over auditing pages one at a time when looking at page weight or caching.
+        Parameters:
+            urls: Full URLs of the pages to analyze (up to 10), e.g. the homepage and key landing pages.
+                If omitted, the top pages from the website's sitemaps are used.
+        Returns:
+            A compact aggregated report, or an error message.
+        """
+        urls = list(dict.fromkeys(urls or await default_pages(MAX_RESOURCE_PAGES)))[:MAX_RESOURCE_PAGES]
+        for url in urls:
+            if err := _block_off_domain(url):
+                return err
+        start = time.time()
+        logger.info("Tool analyze_site_resources start website_entry_id=%s pages=%s", website_entry_id, len(urls))
+        # A fresh context starts with a cold cache, while sharing it across pages shows what repeat visits reuse.
+        await ensure_browser()
+        context = await browser.new_context()
+        semaphore = asyncio.Semaphore(3)
+
+        async def load(url: str) -> tuple[list[ResourceRecord], str | None]:
+            async with semaphore:
+                if err := budget.charge("page_loads"):
+                    return [], err
+                page = await context.new_page()
+                responses = []
+                page.on("response", responses.append)
+                try:
+                    await page.goto(url, wait_until="load", timeout=30000)
+                    await settle_page(page)
+                    blocking = set(await page.evaluate(
+                        "performance.getEntriesByType('resource').filter(r => r.renderBlockingStatus === 'blocking').map(r => r.name)"
+                    ))
+                    records = []
+                    for response in responses:
+                        try:
+                            sizes = await response.request.sizes()
+                            size = sizes["responseBodySize"] + sizes["responseHeadersSize"]
+                        except Exception:
+                            size = int(response.headers.get("content-length") or 0)
+                        records.append(ResourceRecord(
+                            page=url,
+                            url=response.url,
+                            resource_type=response.request.resource_type,
+                            status=response.status,
+                            size=size,
+                            headers=response.headers,
+                            render_blocking=response.url in blocking,
+                        ))
+                    return records, None
+                except Exception as e:
+                    return [], f"{url}: {e}"
+                finally:
+                    await page.close()
+
+        try:
+            results = await asyncio.gather(*(load(url) for url in urls))
+        finally:
+            await context.close()
+        records = [record for page_records, _ in results for record in page_records]
+        failures = [err for _, err in results if err]
+        loaded = [url for url, (_, err) in zip(urls, results) if not err]
+        logger.info(
+            "Tool analyze_site_resources success website_entry_id=%s pages=%s responses=%s elapsed_ms=%s",
+            website_entry_id,
+            len(loaded),
+            len(records),
+            int((time.time() - start) * 1000),
+        )
+        report = summarize_resources(records, loaded, website_host) if records else "No responses were recorded."
+        if failures:
+            report += "\nFailed to load:\n" + "\n".join(f"- {f}" for f in failures)
+        return report
+
+    @tool
+    async def discover_pages(path_prefix: str = "", limit: int = 50) -> str:
+        """
+        List the website's pages from its robots.txt and sitemaps (including nested and gzipped sitemap
+        indexes), most recently modified first. Call this early to pick which pages to analyze instead of
+        guessing URLs. Pages disallowed by robots.txt are left out.
+        Parameters:
+            path_prefix: Only list pages whose path starts with this, e.g. "/blog".
+            limit: Maximum number of pages to list (up to 500).
+        Returns:
+            The ranked pages with their last modification dates, or an error message.
+        """
+        start = time.time()
+        logger.info("Tool discover_pages start website_entry_id=%s path_prefix=%s", website_entry_id, path_prefix)
+        try:
+            result = await site_frontier()
+        except Exception as e:
+            logger.exception("Tool discover_pages failed website_entry_id=%s", website_entry_id)
+            return f"Error reading the sitemaps of {website_url}: {e}"
+        logger.info(
+            "Tool discover_pages success website_entry_id=%s sitemaps=%s pages=%s elapsed_ms=%s",
+            website_entry_id,
+            result.sitemaps_read,
+            len(result.pages),
+            int((time.time() - start) * 1000),
+        )
+        return format_frontier(result, max(1, min(limit, MAX_FRONTIER_URLS)), path_prefix)
+
+    @tool
+    async def check_links(urls: list[str] | None = None, include_external: bool = True) -> str:
+        """
+        Find broken links and redirect chains on several pages in one call. Every anchor and asset URL
+        (images, scripts, stylesheets, iframes...) on the pages is collected, deduplicated and checked
+        concurrently, reporting status codes, redirect chains and slow responses.
+        Prefer this over opening pages and links one by one.
+        Parameters:
+            urls: Full URLs of the pages whose links to check (up to 20).
+                If omitted, the top pages from the website's sitemaps are used.
+            include_external: Also check links to other websites.
+        Returns:
+            A report of broken links (with the pages that contain them), redirect chains and slow links, or an error message.
+        """
+        nonlocal link_checker
+        urls = list(dict.fromkeys(urls or await default_pages(MAX_LINK_PAGES)))[:MAX_LINK_PAGES]
+        for url in urls:
+            if err := _block_off_domain(url):
+                return err
+        start = time.time()
+        logger.info("Tool check_links start website_entry_id=%s pages=%s", website_entry_id, len(urls))
+        semaphore = asyncio.Semaphore(3)
+
+        async def collect(url: str) -> tuple[list[dict], str | None]:
+            async with semaphore:
+                if err := budget.charge("page_loads"):
+                    return [], err
+
+                async def extract() -> list[dict]:
+                    page = await (await ensure_browser()).new_page()
+                    try:
+                        await page.goto(url, wait_until="domcontentloaded", timeout=30000)
+                        await settle_page(page)
+                        return await page.evaluate(LINK_SCRIPT)
+                    finally:
+                        await page.close()
+
+                try:
+                    return await shared("links", url, extract), None
+                except Exception as e:
+                    return [], f"{url}: {e}"
+
+        results = await asyncio.gather(*(collect(url) for url in urls))
+        references: dict[str, set[str]] = {}
+        for url, (links, _) in zip(urls, results):
+            for link in links:
+                target = normalize_link(link["url"])
+                if target and (include_external or not _block_off_domain(target)):
+                    references.setdefault(target, set()).add(url)
+        failures = [err for _, err in results if err]
+        loaded = [url for url, (_, err) in zip(urls, results) if not err]
+        targets = list(references)[:MAX_CHECKED_LINKS]
+
+        link_checker = link_checker or LinkChecker(since=run_started)
+        checked = await link_checker.check(targets)
+        elapsed_ms = int((time.time() - start) * 1000)
+        logger.info(
+            "Tool check_links success website_entry_id=%s pages=%s links=%s broken=%s elapsed_ms=%s",
+            website_entry_id,
+            len(loaded),
+            len(checked),
+            sum(1 for r in checked.values() if r.broken),
+            elapsed_ms,
+        )
+        report = format_link_report(loaded, references, checked, website_host, elapsed_ms) if checked else "No links were found."
+        if len(references) > len(targets):
+            report += f"\nOnly the first {len(targets)} of {len(references)} unique URLs were checked."
+        if failures:
+            report += "\nFailed to load:\n" + "\n".join(f"- {f}" for f in failures)
+        return report
 
-    write_tools = [gh_create_branch, gh_create_or_update_file, gh_create_pull_request] if is_fix_action else []
+    write_tools = [gh_create_branch, gh_commit_files, gh_create_or_update_file, gh_create_pull_request] if is_fix_action else []
 
     if is_fix_action:
         browser_tools = [get_page_metadata]
@@ -615,11 +1177,17 @@ async def get_tools(db_engine: Engine, website_entry_id: int, github_token: str,
             wait_for_selector,
             get_current_page_text,
             get_current_page_url,
+            discover_pages,
             fetch_page,
             get_page_metadata,
             get_page_speed,
+            analyze_site_resources,
+            check_links,
+            check_viewports,
+            audit_accessibility,
         ]
 
     diagnostic_tools = [] if is_fix_action else [submit_diagnostic]
+    repo_tools = [repo_list_files, repo_read_files, repo_search]
 
-    return browser_tools + diagnostic_tools + github_tools + write_tools, cleanup
+    return browser_tools + diagnostic_tools + repo_tools + github_tools + write_tools, cleanup
@@ -0,0 +1,76 @@
+from uuid import UUID
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+
+from tracing import Span, tracer
+
+
+class AgentTracingHandler(BaseCallbackHandler):
+    """Turns LangChain callbacks into spans for LangGraph nodes, LLM calls and tool calls."""
+
+    run_inline = True
+
+    def __init__(self, root: Span):
+        self.root = root
+        self.spans: dict[UUID, Span] = {}
+        self.parents: dict[UUID, UUID | None] = {}
+
+    def _parent(self, parent_run_id: UUID | None) -> Span:
+        while parent_run_id is not None:
+            if parent_run_id in self.spans:
+                return self.spans[parent_run_id]
+            parent_run_id = self.parents.get(parent_run_id)
+        return self.root
+
+    def _start(self, run_id: UUID, parent_run_id: UUID | None, name: str, **attributes) -> None:
+        self.parents[run_id] = parent_run_id
+        self.spans[run_id] = tracer.start_span(name, parent=self._parent(parent_run_id), **attributes)
+
+    def _end(self, run_id: UUID, status: str = "ok") -> Span | None:
+        self.parents.pop(run_id, None)
+        span = self.spans.pop(run_id, None)
+        if span:
+            tracer.end_span(span, status)
+        return span
+
+    def on_chain_start(self, serialized, inputs, *, run_id, parent_run_id=None, tags=None, metadata=None, **kwargs):
+        node = (metadata or {}).get("langgraph_node")
+        if node and kwargs.get("name") == node:
+            self._start(run_id, parent_run_id, f"agent.node.{node}")
+        else:
+            self.parents[run_id] = parent_run_id
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        self._end(run_id)
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, "error")
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, parent_run_id=None, tags=None, metadata=None, **kwargs):
+        model = (metadata or {}).get("ls_model_name") or "unknown"
+        self._start(run_id, parent_run_id, f"llm.{model}", model=model)
+
+    def on_llm_end(self, response: LLMResult, *, run_id, **kwargs):
+        span = self.spans.get(run_id)
+        if span:
+            message = getattr(response.generations[0][0], "message", None) if response.generations else None
+            usage = getattr(message, "usage_metadata", None) or {}
+            span.attributes["input_tokens"] = usage.get("input_tokens", 0)
+            span.attributes["output_tokens"] = usage.get("output_tokens", 0)
+            span.attributes["cached_tokens"] = usage.get("input_token_details", {}).get("cache_read", 0)
+            for kind in ("input_tokens", "output_tokens", "cached_tokens"):
+                tracer.increment("webster_llm_tokens_total", kind, span.attributes[kind])
+        self._end(run_id)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, "error")
+
+    def on_tool_start(self, serialized, input_str, *, run_id, parent_run_id=None, tags=None, metadata=None, **kwargs):
+        name = kwargs.get("name") or (serialized or {}).get("name", "unknown")
+        self._start(run_id, parent_run_id, f"tool.{name}", tool=name)
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        self._end(run_id)
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, "error")
@@ -0,0 +1,116 @@
+"""
+Crawl and analysis artifacts (rendered pages, audits, link checks, sitemap crawls) shared by the
+runs in this process and keyed by website host. Several entries, from different users or for
+the same repo, can point at the same site: when their runs overlap, they await one computation
+in flight instead of each starting their own, and reuse its result afterwards.
+
+Only results that don't depend on the run itself may be shared, e.g. page loads in a fresh
+browser context or in a run that hasn't interacted with the site, and plain HTTP checks. A run
+only reuses artifacts whose computation started after the run did, so it never sees the site
+as it was before it started (e.g. before the deploy that triggered it). Shared values must be
+treated as read-only.
+"""
+
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, TypeVar
+from urllib.parse import urlparse
+import asyncio
+import logging
+import pickle
+import time
+
+from constants import ARTIFACT_CACHE_BYTES, RUN_MAX_SECONDS
+from tracing import Span, tracer
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+EXPIRY_INTERVAL_SECONDS = 10
+
+
+def site_key(url: str) -> str:
+    return (urlparse(url).hostname or "").lower()
+
+
+class ArtifactStore:
+    def __init__(self, max_bytes: int, retention_seconds: float):
+        self.max_bytes = max_bytes
+        # Runs only reuse artifacts started after they began, so nothing older than the longest run is useful.
+        self.retention_seconds = retention_seconds
+        # (host, kind, key) -> (started_at, size, value), least recently used first.
+        self.entries: OrderedDict[tuple[str, str, str], tuple[float, int, Any]] = OrderedDict()
+        self.flights: dict[tuple[str, str, str], tuple[float, asyncio.Task]] = {}
+        self.bytes = 0
+        self.expired_at = 0.0
+
+    async def share(self, host: str, kind: str, key: str, compute: Callable[[], Awaitable[T]], since: float) -> T:
+        """
+        The artifact for (host, kind, key) computed after `since`: stored, in flight in another run,
+        or computed now. Failures are not stored, and a run whose shared computation failed retries
+        with its own `compute` (the other run's browser may have closed under it).
+        """
+        item = (host, kind, key)
+        self.expire()
+        # The span's "cache" attribute is "hit", "joined" (awaited another run's computation) or "miss".
+        with tracer.span("artifact.share", host=host, kind=kind) as span:
+            cached = self.entries.get(item)
+            if cached and cached[0] >= since:
+                self.entries.move_to_end(item)
+                logger.debug("Artifact hit host=%s kind=%s key=%s age_ms=%s", host, kind, key, int((time.time() - cached[0]) * 1000))
+                return self.record(span, "hit", cached[2])
+            flight = self.flights.get(item)
+            # Worker processes run each job in a fresh event loop; a flight left over from an earlier loop can't be awaited.
+            if flight and flight[0] >= since and flight[1].get_loop() is asyncio.get_running_loop():
+                logger.debug("Artifact joined in-flight computation host=%s kind=%s key=%s", host, kind, key)
+                try:
+                    return self.record(span, "joined", await asyncio.shield(flight[1]))
+                except Exception:
+                    logger.info("Shared artifact computation failed, retrying host=%s kind=%s key=%s", host, kind, key)
+            # Shielded so a cancelled run doesn't cancel the computation other runs are waiting on.
+            return self.record(span, "miss", await asyncio.shield(self.start(item, compute)))
+
+    def record(self, span: Span, outcome: str, value: T) -> T:
+        span.attributes["cache"] = outcome
+        tracer.increment("webster_artifact_cache_total", outcome)
+        return value
+
+    def start(self, item: tuple[str, str, str], compute: Callable[[], Awaitable[T]]) -> asyncio.Task:
+        started_at = time.time()
+
+        async def run() -> T:
+            try:
+                value = await compute()
+            finally:
+                if self.flights.get(item, (0, None))[1] is task:
+                    del self.flights[item]
+            self.put(item, started_at, value)
+            return value
+
+        task = asyncio.create_task(run())
+        # Retrieve the exception of flights nobody awaits anymore, so it isn't reported as unhandled.
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        self.flights[item] = (started_at, task)
+        return task
+
+    def put(self, item: tuple[str, str, str], started_at: float, value: Any) -> None:
+        size = len(pickle.dumps(value))
+        if size > self.max_bytes:
+            return
+        if item in self.entries:
+            self.bytes -= self.entries.pop(item)[1]
+        self.entries[item] = (started_at, size, value)
+        self.bytes += size
+        while self.bytes > self.max_bytes:
+            _, (_, evicted, _) = self.entries.popitem(last=False)
+            self.bytes -= evicted
+
+    def expire(self) -> None:
+        now = time.time()
+        if now - self.expired_at < EXPIRY_INTERVAL_SECONDS:
+            return
+        self.expired_at = now
+        for item in [item for item, (started_at, _, _) in self.entries.items() if started_at < now - self.retention_seconds]:
+            self.bytes -= self.entries.pop(item)[1]
+
+
+artifact_store = ArtifactStore(ARTIFACT_CACHE_BYTES, RUN_MAX_SECONDS)
@@ -0,0 +1,182 @@
+from math import erfc, log, sqrt
+from urllib.parse import urlparse
+from playwright.async_api import Browser
+
+# Lighthouse mobile defaults: simulated slow 4G and a 4x CPU slowdown.
+THROTTLING = {
+    "latency": 150,
+    "downloadThroughput": 1.6 * 1024 * 1024 / 8 * 0.9,
+    "uploadThroughput": 750 * 1024 / 8 * 0.9,
+    "cpu_rate": 4,
+}
+MOBILE_VIEWPORT = {"width": 412, "height": 823}
+
+# Lighthouse v10 mobile scoring curves: (p10, median, weight). Speed Index is not
+# observable from inside the page, so its weight is redistributed over the others.
+SCORING = {
+    "FCP": (1800, 3000, 0.10),
+    "LCP": (2500, 4000, 0.25),
+    "TBT": (200, 600, 0.30),
+    "CLS": (0.1, 0.25, 0.25),
+}
+ERFCINV_0_2 = 0.9061938024368232
+
+OBSERVER_SCRIPT = """
+(() => {
+    const perf = window.__websterPerf = { lcp: 0, cls: 0, longTasks: [] };
+    let session = 0, sessionStart = 0, lastShift = 0;
+    const observe = (type, callback) => {
+        try { new PerformanceObserver(list => list.getEntries().forEach(callback)).observe({ type, buffered: true }); }
+        catch (e) { /* unsupported entry type */ }
+    };
+    observe('largest-contentful-paint', e => { perf.lcp = e.renderTime || e.loadTime || e.startTime; });
+    observe('layout-shift', e => {
+        if (e.hadRecentInput) return;
+        // CLS is the largest session window: shifts less than 1s apart, capped at 5s.
+        if (e.startTime - lastShift > 1000 || e.startTime - sessionStart > 5000) {
+            session = 0;
+            sessionStart = e.startTime;
+        }
+        session += e.value;
+        lastShift = e.startTime;
+        perf.cls = Math.max(perf.cls, session);
+    });
+    observe('longtask', e => { perf.longTasks.push([e.startTime, e.duration]); });
+})();
+"""
+
+COLLECT_SCRIPT = """
+() => {
+    const perf = window.__websterPerf || { lcp: 0, cls: 0, longTasks: [] };
+    const nav = performance.getEntriesByType('navigation')[0];
+    const fcp = performance.getEntriesByName('first-contentful-paint')[0];
+    return {
+        ttfb: nav ? nav.responseStart : null,
+        dcl: nav ? nav.domContentLoadedEventEnd : null,
+        load: nav ? nav.loadEventEnd : null,
+        document_bytes: nav ? nav.transferSize : 0,
+        fcp: fcp ? fcp.startTime : null,
+        lcp: perf.lcp || null,
+        cls: perf.cls,
+        long_tasks: perf.longTasks,
+        resources: performance.getEntriesByType('resource').map(r => ({
+            url: r.name,
+            initiator: r.initiatorType,
+            transfer: r.transferSize,
+            encoded: r.encodedBodySize,
+            decoded: r.decodedBodySize,
+            blocking: r.renderBlockingStatus || '',
+        })),
+    };
+}
+"""
+
+RESOURCE_TYPES = {
+    "script": (".js", ".mjs"),
+    "stylesheet": (".css",),
+    "image": (".png", ".jpg", ".jpeg", ".gif", ".webp", ".avif", ".svg", ".ico"),
+    "font": (".woff", ".woff2", ".ttf", ".otf"),
+}
+
+
+def metric_score(name: str, value: float) -> float:
+    p10, median, _ = SCORING[name]
+    if value <= 0:
+        return 1.0
+    sigma = (log(median) - log(p10)) / (sqrt(2) * ERFCINV_0_2)
+    return 0.5 * erfc((log(value) - log(median)) / (sqrt(2) * sigma))
+
+
+def resource_type(resource: dict) -> str:
+    path = urlparse(resource["url"]).path.lower()
+    for kind, extensions in RESOURCE_TYPES.items():
+        if path.endswith(extensions):
+            return kind
+    return {"script": "script", "img": "image", "link": "stylesheet"}.get(resource["initiator"], "other")
+
+
+def summarize_audit(raw: dict) -> dict:
+    fcp = raw["fcp"] or raw["dcl"] or 0
+    lcp = raw["lcp"] or fcp
+    long_tasks = [(start, duration) for start, duration in raw["long_tasks"] if start >= fcp]
+    tbt = sum(max(0, duration - 50) for _, duration in long_tasks)
+    tti = max([fcp, raw["dcl"] or 0] + [start + duration for start, duration in long_tasks])
+    metrics = {"FCP": fcp, "LCP": lcp, "TBT": tbt, "CLS": raw["cls"]}
+    score = sum(metric_score(k, v) * SCORING[k][2] for k, v in metrics.items()) / sum(w for _, _, w in SCORING.values())
+
+    breakdown: dict[str, dict] = {}
+    for resource in raw["resources"]:
+        entry = breakdown.setdefault(resource_type(resource), {"count": 0, "bytes": 0})
+        entry["count"] += 1
+        entry["bytes"] += resource["transfer"]
+    total_bytes = raw["document_bytes"] + sum(r["transfer"] for r in raw["resources"])
+
+    opportunities = []
+    blocking = [r for r in raw["resources"] if r["blocking"] == "blocking"]
+    if blocking:
+        opportunities.append(f"Eliminate render-blocking resources: {len(blocking)} ({', '.join(r['url'] for r in blocking[:3])})")
+    uncompressed = [r for r in raw["resources"] if resource_type(r) in ("script", "stylesheet") and r["decoded"] > 10_000 and r["encoded"] >= r["decoded"]]
+    if uncompressed:
+        opportunities.append(f"Enable text compression: {len(uncompressed)} uncompressed scripts/stylesheets")
+    heavy_images = [r for r in raw["resources"] if resource_type(r) == "image" and r["transfer"] > 100_000]
+    if heavy_images:
+        opportunities.append(f"Properly size images: {len(heavy_images)} images over 100 KB ({sum(r['transfer'] for r in heavy_images) // 1024} KB)")
+    if total_bytes > 1_600_000:
+        opportunities.append(f"Avoid enormous network payloads: {total_bytes // 1024} KB total")
+    if tbt > 200:
+        opportunities.append(f"Reduce main-thread work: {len(long_tasks)} long tasks after first paint")
+
+    return {
+        "score": round(score * 100),
+        "metrics": {
+            "FCP": f"{fcp / 1000:.1f} s",
+            "LCP": f"{lcp / 1000:.1f} s",
+            "TBT": f"{tbt:.0f} ms",
+            "CLS": f"{raw['cls']:.3f}",
+            "TTFB": f"{(raw['ttfb'] or 0):.0f} ms",
+            "TTI": f"{tti / 1000:.1f} s",
+        },
+        "opportunities": opportunities,
+        "resources": breakdown,
+        "total_bytes": total_bytes,
+    }
+
+
+def format_audit(summary: dict) -> str:
+    parts = [f"Performance score (mobile, local audit): {summary['score']}/100"]
+    parts += [f"{k}: {v}" for k, v in summary["metrics"].items()]
+    parts.append(
+        f"Page weight: {summary['total_bytes'] // 1024} KB ("
+        + ", ".join(f"{kind} {v['count']} files/{v['bytes'] // 1024} KB" for kind, v in sorted(summary["resources"].items()))
+        + ")"
+    )
+    if summary["opportunities"]:
+        parts.append("Top opportunities:\n" + "\n".join(f"- {o}" for o in summary["opportunities"][:5]))
+    return "\n".join(parts)
+
+
+async def run_performance_audit(browser: Browser, url: str, timeout_ms: int = 45000) -> dict:
+    """Load a URL cold in a fresh throttled mobile context and measure it like a Lighthouse navigation."""
+    context = await browser.new_context(viewport=MOBILE_VIEWPORT, is_mobile=True, has_touch=True, device_scale_factor=1.75)
+    try:
+        await context.add_init_script(OBSERVER_SCRIPT)
+        page = await context.new_page()
+        cdp = await context.new_cdp_session(page)
+        await cdp.send("Network.enable")
+        await cdp.send("Network.setCacheDisabled", {"cacheDisabled": True})
+        await cdp.send("Network.emulateNetworkConditions", {
+            "offline": False,
+            "latency": THROTTLING["latency"],
+            "downloadThroughput": THROTTLING["downloadThroughput"],
+            "uploadThroughput": THROTTLING["uploadThroughput"],
+        })
+        await cdp.send("Emulation.setCPUThrottlingRate", {"rate": THROTTLING["cpu_rate"]})
+        await page.goto(url, wait_until="load", timeout=timeout_ms)
+        try:
+            await page.wait_for_load_state("networkidle", timeout=10000)
+        except Exception:
+            pass
+        raw = await page.evaluate(COLLECT_SCRIPT)
+        return summarize_audit(raw)
+    finally:
+        await context.close()
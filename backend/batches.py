@@ -0,0 +1,198 @@
+"""
+Verification of many of a user's websites in one batch run: the entries are verified in
+parallel, up to BATCH_CONCURRENCY at a time, and their progress is relayed on the batch's
+single event stream, which ends with one summary of what every verification found.
+
+The batch is admitted once, as a single run against the user's concurrent run and rate limits
+(main.py); its entries are not admitted one by one. An entry whose site already has a run in
+progress is skipped, and while an entry runs it is the entry's active run, so a chat message to
+that entry is refused until it finishes.
+
+Each entry is a verification like a webhook-triggered or scheduled one, so on top of the batch's
+own BATCH_CONCURRENCY limit it holds one of the VERIFICATION_CONCURRENCY slots while it runs.
+Those slots are handed out in request order, and at most BATCH_CONCURRENCY entries of a batch
+wait for one at a time, so a webhook or scheduled verification arriving mid-batch queues behind
+only those, not behind the rest of the batch.
+
+The runs share one token budget, BATCH_MAX_TOKENS: each run reserves up to RUN_MAX_TOKENS of
+what is left when it starts, and settles against what it actually used, so later entries are
+skipped once the batch has spent its budget. The cap is best-effort: a run stops at its
+reservation only after the LLM call that crosses it, so a batch can overshoot by what that last
+call of each running entry costs. Runs executing in this process also share one browser
+(browsers.py) and the crawl artifacts of sites they have in common (artifacts.py).
+"""
+
+from collections import Counter
+from sqlmodel import Session, select
+from sqlalchemy import Engine
+from typing import AsyncIterator
+import asyncio
+import logging
+import time
+
+from constants import BATCH_CONCURRENCY, BATCH_MAX_TOKENS, RUN_MAX_TOKENS
+from models import WebsiteEntry
+from runs import active_runs, get_active_run
+from verification import SEVERITY_ORDER, run_verification
+
+logger = logging.getLogger(__name__)
+
+# A run left with less than this share of a full run's tokens can't get far; the entry is skipped instead.
+MIN_RESERVATION_SHARE = 0.1
+MAX_ISSUES_PER_ENTRY = 5
+
+
+class TokenPool:
+    def __init__(self, total: int):
+        self.remaining = total
+
+    def reserve(self) -> int:
+        """Tokens set aside for one run, or 0 if too few are left to start one."""
+        tokens = min(RUN_MAX_TOKENS, self.remaining)
+        if tokens < RUN_MAX_TOKENS * MIN_RESERVATION_SHARE:
+            return 0
+        self.remaining -= tokens
+        return tokens
+
+    def settle(self, reserved: int, used: int) -> None:
+        # A run that overshot its reservation is charged the overshoot too, so the pool tracks actual spend.
+        self.remaining += reserved - used
+
+
+def count_severities(diagnostics: list[tuple[str, str]]) -> dict[str, int]:
+    counts = Counter(severity for severity, _ in diagnostics)
+    return {severity: counts[severity] for severity in sorted(counts, key=lambda s: -SEVERITY_ORDER.get(s, 0))}
+
+
+def format_counts(counts: dict[str, int]) -> str:
+    return ", ".join(f"{count} {severity}{'s' if count > 1 else ''}" for severity, count in counts.items())
+
+
+def format_batch_summary(results: list[dict], elapsed_ms: int, tokens: int) -> str:
+    verified = [r for r in results if r["status"] == "verified"]
+    diagnostics = [d for r in verified for d in r["diagnostics"]]
+    parts = [
+        f"Verified {len(verified)} of {len(results)} websites in {elapsed_ms // 1000} s using {tokens:,} tokens. "
+        + (f"{len(diagnostics)} new issues: {format_counts(count_severities(diagnostics))}." if diagnostics else "No new issues.")
+    ]
+    for r in results:
+        if r["status"] != "verified":
+            parts.append(f"- **{r['website_url']}**: {r['status']} ({r['reason']})")
+        elif not r["diagnostics"]:
+            parts.append(f"- **{r['website_url']}**: no new issues")
+        else:
+            ordered = sorted(r["diagnostics"], key=lambda d: -SEVERITY_ORDER.get(d[0], 0))
+            shown = "; ".join(f"[{severity}] {desc}" for severity, desc in ordered[:MAX_ISSUES_PER_ENTRY])
+            more = f" (+{len(ordered) - MAX_ISSUES_PER_ENTRY} more)" if len(ordered) > MAX_ISSUES_PER_ENTRY else ""
+            parts.append(f"- **{r['website_url']}**: {format_counts(count_severities(r['diagnostics']))}: {shown}{more}")
+    return "\n".join(parts)
+
+
+async def run_batch(engine: Engine, user_id: int, github_token: str, run_id: str, entry_ids: list[int] | None = None) -> AsyncIterator[dict]:
+    """
+    Verify the user's entries (all of them, or `entry_ids`) as the batch run `run_id`, yielding
+    each entry's progress events tagged with its website_entry_id and a final "done" event with
+    the summary. Entries with a run already in progress are skipped.
+    """
+    start = time.time()
+    with Session(engine) as session:
+        query = select(WebsiteEntry).where(WebsiteEntry.user_id == user_id).order_by(WebsiteEntry.id)
+        if entry_ids is not None:
+            query = query.where(WebsiteEntry.id.in_(entry_ids))
+        entries = [(entry.id, entry.website_url) for entry in session.exec(query).all()]
+    yield {"type": "batch_start", "entries": [{"website_entry_id": i, "website_url": url} for i, url in entries]}
+
+    pool = TokenPool(BATCH_MAX_TOKENS)
+    slots = asyncio.Semaphore(BATCH_CONCURRENCY)
+    events: asyncio.Queue[dict | None] = asyncio.Queue()
+    results: dict[int, dict] = {}
+
+    async def verify(entry_id: int, website_url: str) -> None:
+        result = {"website_entry_id": entry_id, "website_url": website_url, "diagnostics": [], "tokens": 0}
+
+        async def relay(event: dict) -> None:
+            await events.put({**event, "website_entry_id": entry_id})
+
+        async with slots:
+            reason = "a run is already in progress" if get_active_run(entry_id) else ""
+            reserved = 0 if reason else pool.reserve()
+            if not reserved:
+                reason = reason or "the batch's token budget is used up"
+                results[entry_id] = {**result, "status": "skipped", "reason": reason}
+                await events.put({"type": "entry_skipped", "website_entry_id": entry_id, "reason": reason})
+                return
+            # Until its verification ends the entry's active run is the batch, so a chat message to the entry is refused meanwhile.
+            active_runs[entry_id] = run_id
+            entry_start = time.time()
+            try:
+                await events.put({"type": "entry_start", "website_entry_id": entry_id, "website_url": website_url})
+                verification = await run_verification(entry_id, github_token, engine, on_event=relay, budget_limits={"max_tokens": reserved})
+            except Exception as e:
+                logger.exception("Batch verification failed website_entry_id=%s", entry_id)
+                # The run's usage is unknown, so its reservation is not given back.
+                results[entry_id] = {**result, "status": "failed", "reason": str(e)}
+                await events.put({"type": "entry_failed", "website_entry_id": entry_id, "message": str(e)})
+                return
+            finally:
+                if active_runs.get(entry_id) == run_id:
+                    del active_runs[entry_id]
+            if verification is None:
+                pool.settle(reserved, 0)
+                results[entry_id] = {**result, "status": "skipped", "reason": "the website was deleted"}
+                await events.put({"type": "entry_skipped", "website_entry_id": entry_id, "reason": "the website was deleted"})
+                return
+            tokens = verification.usage.get("tokens", 0)
+            pool.settle(reserved, tokens)
+            results[entry_id] = {**result, "status": "verified", "diagnostics": verification.diagnostics, "tokens": tokens}
+            logger.info(
+                "Batch entry verified website_entry_id=%s diagnostics=%s tokens=%s elapsed_ms=%s",
+                entry_id, len(verification.diagnostics), tokens, int((time.time() - entry_start) * 1000),
+            )
+            await events.put({
+                "type": "entry_done",
+                "website_entry_id": entry_id,
+                "content": verification.conclusion,
+                "diagnostics": [{"severity": severity, "shortDesc": desc} for severity, desc in verification.diagnostics],
+                "usage": verification.usage,
+            })
+
+    async def verify_all() -> None:
+        try:
+            await asyncio.gather(*(verify(entry_id, url) for entry_id, url in entries))
+        finally:
+            await events.put(None)
+
+    runner = asyncio.create_task(verify_all())
+    try:
+        while (event := await events.get()) is not None:
+            yield event
+        await runner
+    finally:
+        runner.cancel()
+
+    ordered = [results[entry_id] for entry_id, _ in entries if entry_id in results]
+    tokens = sum(r["tokens"] for r in ordered)
+    elapsed_ms = int((time.time() - start) * 1000)
+    logger.info("Batch verification done user_id=%s entries=%s tokens=%s elapsed_ms=%s", user_id, len(entries), tokens, elapsed_ms)
+    yield {
+        "type": "done",
+        "content": format_batch_summary(ordered, elapsed_ms, tokens),
+        "summary": {
+            "entries": [
+                {
+                    "websiteEntryId": r["website_entry_id"],
+                    "websiteUrl": r["website_url"],
+                    "status": r["status"],
+                    "reason": r.get("reason", ""),
+                    "severities": count_severities(r["diagnostics"]),
+                    "tokens": r["tokens"],
+                }
+                for r in ordered
+            ],
+            "verified": sum(1 for r in ordered if r["status"] == "verified"),
+            "skipped": sum(1 for r in ordered if r["status"] == "skipped"),
+            "failed": sum(1 for r in ordered if r["status"] == "failed"),
+            "tokens": tokens,
+            "elapsedMs": elapsed_ms,
+        },
+    }
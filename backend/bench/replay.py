@@ -0,0 +1,169 @@
+"""
+Offline regression benchmark for the agent loop. A cassette (see cassettes.py) captures one
+verification run's OpenAI exchanges and tool results; replaying it re-runs the LangGraph loop,
+the database-backed tools and the persistence in verification.run_verification at full speed,
+with no network, browser or MCP server. Run from the backend directory:
+
+    # Record once, against the services configured in the environment...
+    python -m bench.replay record --cassette cassette.json.gz --website-url https://example.com --repo owner/name --github-token ghp_...
+    # ...or against the local stand-ins used by bench.run
+    python -m bench.replay record --cassette cassette.json.gz --stubs
+
+    # Then replay as often as needed, failing on cassette misses or a slow median
+    python -m bench.replay replay --cassette cassette.json.gz --runs 10 --strict --max-median-seconds 2
+"""
+
+from pathlib import Path
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+from bench.run import BENCH_DIR, configure_environment, span_breakdown, summarize
+from bench.stubs import ServerThread, fake_github_app, fake_github_mcp, fake_openai_app, fixture_site_app
+
+
+def use_cassette(mode: str, cassette: str) -> None:
+    os.environ.update({
+        "AGENT_CASSETTE_MODE": mode,
+        "AGENT_CASSETTE_PATH": str(Path(cassette).resolve()),
+        # Cassettes only see runs executed in this process.
+        "AGENT_EXECUTOR": "inline",
+        "SCHEDULER_ENABLED": "false",
+    })
+
+
+async def verify_once(database_path: Path, website_url: str, repo_name: str, github_token: str) -> dict:
+    """Run one verification against a fresh database, so every run sees the same ids and history."""
+    from sqlmodel import Session, SQLModel, create_engine, func, select
+    from models import Diagnostic, Message, User, VerificationSettings, WebsiteEntry
+    from verification import run_verification
+
+    database_path.unlink(missing_ok=True)
+    engine = create_engine(f"sqlite:///{database_path}")
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        user = User(github_id=1, github_token=github_token)
+        session.add(user)
+        session.commit()
+        entry = WebsiteEntry(user_id=user.id, website_url=website_url, repo_name=repo_name)
+        session.add(entry)
+        session.commit()
+        session.add(VerificationSettings(website_entry_id=entry.id, enabled=True))
+        session.commit()
+        entry_id = entry.id
+
+    start = time.perf_counter()
+    await run_verification(entry_id, github_token, engine)
+    wall = time.perf_counter() - start
+
+    with Session(engine) as session:
+        diagnostics = session.exec(select(Diagnostic.severity, Diagnostic.short_desc).order_by(Diagnostic.id)).all()
+        messages = session.exec(select(func.count()).select_from(Message)).one()
+    engine.dispose()
+    return {"wall_s": wall, "diagnostics": [list(d) for d in diagnostics], "messages": messages}
+
+
+async def record(args: argparse.Namespace) -> dict:
+    stubs = []
+    website_url, repo_name, github_token = args.website_url, args.repo, args.github_token
+    if args.stubs:
+        scenario = json.loads(Path(args.scenario).read_text())
+        site = ServerThread(fixture_site_app()).start()
+        openai_stub = ServerThread(fake_openai_app(scenario, site.url)).start()
+        github = ServerThread(fake_github_app()).start()
+        mcp = ServerThread(fake_github_mcp().streamable_http_app()).start()
+        stubs = [mcp, github, openai_stub, site]
+        configure_environment(Path(args.workdir) / "record.db", openai_stub.url, github.url, f"{mcp.url}/mcp", 1)
+        website_url, repo_name, github_token = f"{site.url}/", "bench/site", "bench-token"
+    elif not (website_url and repo_name and github_token):
+        raise SystemExit("record needs --website-url, --repo and --github-token, or --stubs")
+    use_cassette("record", args.cassette)
+
+    from cassettes import get_store
+
+    store = get_store()
+    store.meta = {"website_url": website_url, "repo_name": repo_name, "recorded_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())}
+    try:
+        result = await verify_once(Path(args.workdir) / "record.db", website_url, repo_name, github_token)
+    finally:
+        for stub in stubs:
+            stub.stop()
+    store.save()
+    return {
+        "cassette": args.cassette,
+        "interactions": len(store.interactions),
+        "recorded_wall_s": round(result["wall_s"], 3),
+        "diagnostics": result["diagnostics"],
+    }
+
+
+async def replay(args: argparse.Namespace) -> dict:
+    configure_environment(Path(args.workdir) / "replay.db", "http://127.0.0.1:9", "http://127.0.0.1:9", "http://127.0.0.1:9/mcp", 1)
+    use_cassette("replay", args.cassette)
+
+    from cassettes import get_store
+    from tracing import InMemoryExporter, tracer
+    from workers import load_agent
+
+    store = get_store()
+    # Import the agent stack up front so the first replay isn't charged for it.
+    await load_agent()
+    exporter = InMemoryExporter()
+    tracer.add_exporter(exporter)
+    results, misses = [], []
+    for _ in range(args.runs):
+        store.rewind()
+        results.append(await verify_once(Path(args.workdir) / "replay.db", store.meta["website_url"], store.meta["repo_name"], "replay-token"))
+        misses.append(store.misses)
+
+    report = {
+        "cassette": args.cassette,
+        "recorded_at": store.meta.get("recorded_at"),
+        "interactions": len(store.interactions),
+        "wall_s": summarize([r["wall_s"] for r in results]),
+        "cassette_misses": misses,
+        "diagnostics": results[0]["diagnostics"],
+        "messages": results[0]["messages"],
+        "spans": span_breakdown(exporter.spans),
+    }
+    failures = []
+    if args.strict and any(misses):
+        failures.append(f"requests no longer match the recording: {max(misses)} cassette misses")
+    if any(r["diagnostics"] != results[0]["diagnostics"] or r["messages"] != results[0]["messages"] for r in results):
+        failures.append("replays persisted different results")
+    if args.max_median_seconds and report["wall_s"]["median"] > args.max_median_seconds:
+        failures.append(f"median replay {report['wall_s']['median']}s exceeds {args.max_median_seconds}s")
+    report["failures"] = failures
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Record an agent run to a cassette, or replay one as an offline regression test.")
+    parser.add_argument("mode", choices=["record", "replay"])
+    parser.add_argument("--cassette", required=True)
+    parser.add_argument("--workdir", default=tempfile.gettempdir())
+    parser.add_argument("--output", default="")
+    parser.add_argument("--website-url", default="")
+    parser.add_argument("--repo", default="")
+    parser.add_argument("--github-token", default="")
+    parser.add_argument("--stubs", action="store_true", help="Record against the local stand-ins from bench.stubs.")
+    parser.add_argument("--scenario", default=str(BENCH_DIR / "scenarios" / "default.json"))
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--strict", action="store_true", help="Fail if any request no longer matches its recording.")
+    parser.add_argument("--max-median-seconds", type=float, default=0)
+    args = parser.parse_args()
+
+    report = asyncio.run(record(args) if args.mode == "record" else replay(args))
+    output = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(output + "\n")
+    print(output)
+    if report.get("failures"):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+"""
+End-to-end benchmark for the Webster API against local stand-ins for OpenAI, GitHub and
+the target website. Run from the backend directory:
+
+    python -m bench.run --iterations 5 --concurrency 4 --output bench_report.json
+"""
+
+from pathlib import Path
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import tempfile
+import time
+import tracemalloc
+
+from bench.stubs import ServerThread, fake_github_app, fake_github_mcp, fake_openai_app, fixture_site_app, free_port
+
+BENCH_DIR = Path(__file__).parent
+
+
+def summarize(samples: list[float]) -> dict:
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+    return {
+        "count": len(ordered),
+        "min": round(ordered[0], 2),
+        "median": round(statistics.median(ordered), 2),
+        "p95": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 2),
+        "max": round(ordered[-1], 2),
+        "mean": round(statistics.fmean(ordered), 2),
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, cwd=BENCH_DIR).stdout.strip()
+    except OSError:
+        return ""
+
+
+def configure_environment(database_path: Path, openai_url: str, github_url: str, mcp_url: str, concurrency: int) -> None:
+    os.environ.update({
+        "DATABASE_URL": f"sqlite:///{database_path}",
+        "FRONTEND_URL": "http://127.0.0.1",
+        "JWT_SECRET": "bench-secret",
+        "GITHUB_CLIENT_ID": "bench",
+        "GITHUB_CLIENT_SECRET": "bench",
+        "GITHUB_API_URL": github_url,
+        "GITHUB_MCP_URL": mcp_url,
+        "OPENAI_BASE_URL": f"{openai_url}/v1",
+        "OPENAI_API_KEY": "bench",
+        "SCHEDULER_ENABLED": "false",
+        "VERIFICATION_CONCURRENCY": str(concurrency),
+    })
+
+
+def seed_database(engine, site_url: str, entries: int) -> tuple[int, list[int]]:
+    from sqlmodel import Session
+    from models import User, VerificationSettings, WebsiteEntry
+
+    with Session(engine) as session:
+        user = User(github_id=1, github_token="bench-token")
+        session.add(user)
+        session.commit()
+        entry_ids = []
+        for _ in range(entries):
+            entry = WebsiteEntry(user_id=user.id, website_url=f"{site_url}/", repo_name="bench/site")
+            session.add(entry)
+            session.commit()
+            session.add(VerificationSettings(website_entry_id=entry.id, enabled=True))
+            session.commit()
+            entry_ids.append(entry.id)
+        return user.id, entry_ids
+
+
+async def bench_chat(client, entry_id: int, iterations: int) -> dict:
+    latencies, first_events = [], []
+    for i in range(iterations):
+        start = time.perf_counter()
+        first_event = None
+        done = False
+        async with client.stream(
+            "POST",
+            f"/messages/send?website_entry_id={entry_id}&is_fix_action=false",
+            json={"content": f"Benchmark request {i}: analyze the site."},
+        ) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if not line.startswith("data: "):
+                    continue
+                if first_event is None:
+                    first_event = time.perf_counter() - start
+                done = done or json.loads(line[len("data: "):])["type"] == "done"
+        if not done:
+            raise RuntimeError("Chat stream ended without a done event")
+        latencies.append((time.perf_counter() - start) * 1000)
+        first_events.append((first_event or 0) * 1000)
+    return {"chat_latency_ms": summarize(latencies), "sse_first_event_ms": summarize(first_events)}
+
+
+async def bench_verification(engine, entry_ids: list[int]) -> dict:
+    from verification import run_verification
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    await asyncio.gather(*(run_verification(entry_id, "bench-token", engine) for entry_id in entry_ids))
+    wall = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "verification": {
+            "runs": len(entry_ids),
+            "wall_s": round(wall, 3),
+            "runs_per_s": round(len(entry_ids) / wall, 3),
+        },
+        "memory": {
+            "python_peak_mb": round(peak / 2**20, 2),
+            "python_peak_per_run_mb": round(peak / 2**20 / len(entry_ids), 2),
+            # Chromium runs in child processes, which tracemalloc cannot see.
+            "max_child_rss_mb": round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024, 2),
+        },
+    }
+
+
+def span_breakdown(spans) -> dict:
+    breakdown: dict[str, list[float]] = {}
+    for span in spans:
+        breakdown.setdefault(span.name, []).append(span.duration_ms)
+    return {name: {"count": len(d), "total_ms": round(sum(d), 2)} for name, d in sorted(breakdown.items())}
+
+
+async def run(args: argparse.Namespace) -> dict:
+    scenario = json.loads(Path(args.scenario).read_text())
+    site = ServerThread(fixture_site_app()).start()
+    openai_stub = ServerThread(fake_openai_app(scenario, site.url)).start()
+    github = ServerThread(fake_github_app()).start()
+    mcp = ServerThread(fake_github_mcp().streamable_http_app()).start()
+
+    database_path = Path(args.workdir) / "bench.db"
+    database_path.unlink(missing_ok=True)
+    configure_environment(database_path, openai_stub.url, github.url, f"{mcp.url}/mcp", args.concurrency)
+
+    import httpx
+    import uvicorn
+    import main
+    from auth import create_session_token
+    from constants import SESSION_COOKIE_NAME
+    from tracing import InMemoryExporter, tracer
+
+    exporter = InMemoryExporter()
+    tracer.add_exporter(exporter)
+    user_id, entry_ids = seed_database(main.engine, site.url, max(args.concurrency, 1))
+
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(main.api, host="127.0.0.1", port=port, log_level="warning"))
+    serve_task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+
+    report = {
+        "meta": {
+            "scenario": scenario.get("name", Path(args.scenario).stem),
+            "iterations": args.iterations,
+            "concurrency": args.concurrency,
+            "git_commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+        },
+    }
+    try:
+        cookies = {SESSION_COOKIE_NAME: create_session_token(user_id)}
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", cookies=cookies, timeout=300) as client:
+            report |= await bench_chat(client, entry_ids[0], args.iterations)
+        report |= await bench_verification(main.engine, entry_ids)
+        report["spans"] = span_breakdown(exporter.spans)
+    finally:
+        server.should_exit = True
+        await serve_task
+        for stub in (mcp, github, openai_stub, site):
+            stub.stop()
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark Webster against local service stand-ins.")
+    parser.add_argument("--scenario", default=str(BENCH_DIR / "scenarios" / "default.json"))
+    parser.add_argument("--iterations", type=int, default=5)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--workdir", default=tempfile.gettempdir())
+    parser.add_argument("--output", default="")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    output = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        Path(args.output).write_text(output + "\n")
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Cold-start benchmark and regression check for the Webster API. Each sample runs in a fresh
+interpreter, so nothing is cached between samples. Run from the backend directory:
+
+    python -m bench.startup --runs 5 --max-import-seconds 1.5
+
+Measures the time to import `main`, the time until a freshly spawned server answers its first
+request, and the deferred cost of importing the agent stack. Exits non-zero if `main` pulls the
+agent stack back in at import time or if the import takes longer than --max-import-seconds.
+"""
+
+from pathlib import Path
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+from bench.run import summarize
+from bench.stubs import free_port
+
+BACKEND_DIR = Path(__file__).parent.parent
+
+# Modules that must only load with the first agent run (or the background pre-warm), never with `main`.
+DEFERRED_MODULES = ("agent", "agent_tools", "langchain_core", "langgraph", "langchain_openai", "langchain_mcp_adapters", "playwright", "openai")
+
+IMPORT_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "loaded": [m for m in {deferred!r} if m in sys.modules]}}))
+"""
+
+
+def environment(workdir: str) -> dict:
+    return {
+        **os.environ,
+        "DATABASE_URL": f"sqlite:///{Path(workdir) / 'startup-bench.db'}",
+        "FRONTEND_URL": "http://127.0.0.1",
+        "JWT_SECRET": "bench-secret",
+        "GITHUB_CLIENT_ID": "bench",
+        "GITHUB_CLIENT_SECRET": "bench",
+        "SCHEDULER_ENABLED": "false",
+    }
+
+
+def time_import(module: str, env: dict) -> dict:
+    probe = IMPORT_PROBE.format(module=module, deferred=DEFERRED_MODULES)
+    result = subprocess.run([sys.executable, "-c", probe], capture_output=True, text=True, cwd=BACKEND_DIR, env=env, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def time_first_response(env: dict, timeout: float = 60) -> float:
+    """Spawn uvicorn and poll an endpoint that needs no auth until it answers."""
+    port = free_port()
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:api", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics", timeout=1):
+                    return time.perf_counter() - start
+            except OSError:
+                time.sleep(0.02)
+        raise TimeoutError(f"server did not answer within {timeout}s")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Measure Webster API cold start and check for import regressions.")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-import-seconds", type=float, default=0, help="Fail if the median import of main exceeds this.")
+    parser.add_argument("--workdir", default=tempfile.gettempdir())
+    parser.add_argument("--output", default="")
+    args = parser.parse_args()
+
+    env = environment(args.workdir)
+    main_imports = [time_import("main", env) for _ in range(args.runs)]
+    agent_imports = [time_import("agent", env) for _ in range(args.runs)]
+    first_responses = [time_first_response(env) for _ in range(args.runs)]
+
+    report = {
+        "python": sys.version.split()[0],
+        "import_main_seconds": summarize([r["seconds"] for r in main_imports]),
+        "import_agent_seconds": summarize([r["seconds"] for r in agent_imports]),
+        "first_response_seconds": summarize(first_responses),
+        "deferred_modules_loaded_by_main": sorted({m for r in main_imports for m in r["loaded"]}),
+    }
+    failures = []
+    if report["deferred_modules_loaded_by_main"]:
+        failures.append(f"main imports the agent stack eagerly: {', '.join(report['deferred_modules_loaded_by_main'])}")
+    if args.max_import_seconds and report["import_main_seconds"]["median"] > args.max_import_seconds:
+        failures.append(f"median import of main {report['import_main_seconds']['median']}s exceeds {args.max_import_seconds}s")
+    report["failures"] = failures
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(output)
+    print(output)
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
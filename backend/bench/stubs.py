@@ -0,0 +1,233 @@
+"""Local stand-ins for OpenAI, GitHub (REST and MCP) and a target website."""
+
+from pathlib import Path
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from fastapi.staticfiles import StaticFiles
+from mcp.server.fastmcp import FastMCP
+import asyncio
+import base64
+import hashlib
+import json
+import socket
+import threading
+import time
+import uvicorn
+
+SITE_DIR = Path(__file__).parent / "site"
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class ServerThread:
+    def __init__(self, app, port: int | None = None):
+        self.port = port or free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        self.server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=self.port, log_level="warning"))
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    def start(self) -> "ServerThread":
+        self.thread.start()
+        deadline = time.monotonic() + 10
+        while not self.server.started:
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"Stub server on port {self.port} did not start")
+            time.sleep(0.01)
+        return self
+
+    def stop(self) -> None:
+        self.server.should_exit = True
+        self.thread.join(timeout=5)
+
+
+def render_args(args: dict, site_url: str) -> dict:
+    return json.loads(json.dumps(args).replace("{site}", site_url))
+
+
+def fake_openai_app(scenario: dict, site_url: str) -> FastAPI:
+    """
+    OpenAI-compatible chat completions driven by a scripted transcript.
+    Requests that offer tools are answered from scenario["analyze"], indexed by how many
+    assistant turns follow the latest human message; requests without tools get scenario["conclude"].
+    """
+    app = FastAPI()
+    latency = scenario.get("llm_latency_ms", 0) / 1000
+
+    def next_step(messages: list[dict]) -> dict:
+        last_user = max((i for i, m in enumerate(messages) if m["role"] == "user"), default=-1)
+        turn = sum(1 for m in messages[last_user + 1:] if m["role"] == "assistant")
+        steps = scenario["analyze"]
+        return steps[min(turn, len(steps) - 1)] | {"turn": turn}
+
+    def build_message(body: dict) -> dict:
+        if not body.get("tools"):
+            return {"role": "assistant", "content": scenario["conclude"]}
+        step = next_step(body["messages"])
+        if "tool_calls" not in step:
+            return {"role": "assistant", "content": step.get("content", "")}
+        return {
+            "role": "assistant",
+            "content": None,
+            "tool_calls": [
+                {
+                    "id": f"call_{step['turn']}_{i}",
+                    "type": "function",
+                    "function": {"name": call["name"], "arguments": json.dumps(render_args(call["args"], site_url))},
+                }
+                for i, call in enumerate(step["tool_calls"])
+            ],
+        }
+
+    def usage(body: dict, message: dict) -> dict:
+        prompt_tokens = sum(len(str(m.get("content") or "")) for m in body["messages"]) // 4
+        completion_tokens = len(json.dumps(message)) // 4
+        return {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+            "prompt_tokens_details": {"cached_tokens": 0},
+        }
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        await asyncio.sleep(latency)
+        message = build_message(body)
+        finish_reason = "tool_calls" if message.get("tool_calls") else "stop"
+        base = {"id": "chatcmpl-bench", "created": 0, "model": body["model"]}
+
+        if not body.get("stream"):
+            return JSONResponse(base | {
+                "object": "chat.completion",
+                "choices": [{"index": 0, "message": message, "finish_reason": finish_reason}],
+                "usage": usage(body, message),
+            })
+
+        async def chunks():
+            delta = {"role": "assistant", "content": message.get("content") or ""}
+            if message.get("tool_calls"):
+                delta["tool_calls"] = [call | {"index": i} for i, call in enumerate(message["tool_calls"])]
+            for choice in ({"index": 0, "delta": delta, "finish_reason": None}, {"index": 0, "delta": {}, "finish_reason": finish_reason}):
+                yield f"data: {json.dumps(base | {'object': 'chat.completion.chunk', 'choices': [choice]})}\n\n"
+            if body.get("stream_options", {}).get("include_usage"):
+                yield f"data: {json.dumps(base | {'object': 'chat.completion.chunk', 'choices': [], 'usage': usage(body, message)})}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(chunks(), media_type="text/event-stream")
+
+    return app
+
+
+def fake_github_app() -> FastAPI:
+    """The subset of the GitHub REST API that Webster calls, with deterministic responses."""
+    app = FastAPI()
+    state = {"hook_id": 1000, "commit": 0}
+
+    def commit_sha() -> str:
+        state["commit"] += 1
+        return f"{state['commit']:040x}"
+
+    @app.get("/user")
+    def user():
+        return {"id": 1, "login": "bench"}
+
+    @app.get("/user/repos")
+    def repos():
+        return [{"full_name": "bench/site"}]
+
+    @app.get("/user/installations")
+    def installations():
+        return {"installations": []}
+
+    @app.post("/repos/{owner}/{repo}/hooks")
+    def create_hook(owner: str, repo: str):
+        state["hook_id"] += 1
+        return {"id": state["hook_id"]}
+
+    @app.delete("/repos/{owner}/{repo}/hooks/{hook_id}")
+    def delete_hook(owner: str, repo: str, hook_id: int):
+        return JSONResponse(None, status_code=204)
+
+    @app.get("/repos/{owner}/{repo}/branches/{branch}")
+    def branch(owner: str, repo: str, branch: str):
+        return {"name": branch, "commit": {"sha": "0" * 40}}
+
+    # The fixture site doubles as the repository contents, at a single fixed commit.
+    site_files = {p.relative_to(SITE_DIR).as_posix(): p.read_bytes() for p in sorted(SITE_DIR.rglob("*")) if p.is_file()}
+    blob_shas = {path: hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest() for path, data in site_files.items()}
+
+    @app.get("/repos/{owner}/{repo}/commits/{ref}")
+    def commit(owner: str, repo: str, ref: str):
+        return PlainTextResponse("0" * 40)
+
+    @app.get("/repos/{owner}/{repo}/git/trees/{sha}")
+    def tree(owner: str, repo: str, sha: str):
+        items = [{"path": path, "mode": "100644", "type": "blob", "sha": blob_shas[path], "size": len(data)} for path, data in site_files.items()]
+        return {"sha": "1" * 40, "tree": items, "truncated": False}
+
+    @app.get("/repos/{owner}/{repo}/git/blobs/{sha}")
+    def blob(owner: str, repo: str, sha: str):
+        data = next(site_files[path] for path, blob_sha in blob_shas.items() if blob_sha == sha)
+        return {"sha": sha, "encoding": "base64", "content": base64.b64encode(data).decode("ascii"), "size": len(data)}
+
+    @app.get("/repos/{owner}/{repo}/git/ref/heads/{branch:path}")
+    def get_ref(owner: str, repo: str, branch: str):
+        return {"ref": f"refs/heads/{branch}", "object": {"sha": "0" * 40}}
+
+    @app.post("/repos/{owner}/{repo}/git/blobs")
+    async def create_blob(owner: str, repo: str, request: Request):
+        data = (await request.json())["content"].encode("utf-8")
+        return JSONResponse({"sha": hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()}, status_code=201)
+
+    @app.post("/repos/{owner}/{repo}/git/trees")
+    def create_tree(owner: str, repo: str):
+        return JSONResponse({"sha": commit_sha()}, status_code=201)
+
+    @app.post("/repos/{owner}/{repo}/git/commits")
+    def create_commit(owner: str, repo: str):
+        return JSONResponse({"sha": commit_sha()}, status_code=201)
+
+    @app.patch("/repos/{owner}/{repo}/git/refs/heads/{branch:path}")
+    def update_ref(owner: str, repo: str, branch: str):
+        return {"ref": f"refs/heads/{branch}"}
+
+    @app.post("/repos/{owner}/{repo}/git/refs")
+    def create_ref(owner: str, repo: str):
+        return JSONResponse({"object": {"sha": "0" * 40}}, status_code=201)
+
+    @app.put("/repos/{owner}/{repo}/contents/{path:path}")
+    def put_contents(owner: str, repo: str, path: str):
+        return {"content": {"path": path}, "commit": {"sha": commit_sha()}}
+
+    @app.post("/repos/{owner}/{repo}/pulls")
+    def create_pull(owner: str, repo: str):
+        return JSONResponse({"html_url": f"https://github.com/{owner}/{repo}/pull/1"}, status_code=201)
+
+    return app
+
+
+def fake_github_mcp() -> FastMCP:
+    """Read-only GitHub MCP tools backed by the fixture site's files."""
+    mcp = FastMCP("github", stateless_http=True, json_response=True)
+
+    @mcp.tool()
+    def get_file_contents(owner: str, repo: str, path: str = "/") -> str:
+        """Get the contents of a file or directory from a GitHub repository."""
+        target = (SITE_DIR / path.lstrip("/")).resolve()
+        if not target.is_relative_to(SITE_DIR.resolve()) or not target.exists():
+            return f"Not found: {path}"
+        if target.is_dir():
+            return "\n".join(sorted(p.name for p in target.iterdir()))
+        return target.read_text()
+
+    return mcp
+
+
+def fixture_site_app() -> FastAPI:
+    app = FastAPI()
+    app.mount("/", StaticFiles(directory=SITE_DIR, html=True))
+    return app
@@ -0,0 +1,81 @@
+"""
+One Chromium per process, shared by the agent runs executing in it. Launching a browser takes
+about a second and a few hundred MB, so concurrent runs (e.g. a batch verification fanned out
+over a user's sites) each open their own context in the shared browser instead, which keeps
+their cookies and storage apart.
+
+In the API process (AGENT_EXECUTOR=inline) the browser stays up for BROWSER_IDLE_SECONDS after
+the last run releases it, so back-to-back runs don't relaunch it. Worker processes run each job
+in its own event loop, which Playwright objects can't outlive, so there it closes with the job.
+"""
+
+import asyncio
+import logging
+import time
+
+from playwright.async_api import Browser, Playwright, async_playwright
+
+from constants import AGENT_EXECUTOR, BROWSER_IDLE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+
+class BrowserPool:
+    def __init__(self, idle_seconds: float):
+        self.idle_seconds = idle_seconds
+        self.playwright: Playwright | None = None
+        self.browser: Browser | None = None
+        self.users = 0
+        self.loop: asyncio.AbstractEventLoop | None = None
+        self.lock: asyncio.Lock | None = None
+        self.idle_close: asyncio.TimerHandle | None = None
+
+    async def acquire(self) -> Browser:
+        """The shared browser, launched (or relaunched after a crash) if needed. Every acquire() needs a release()."""
+        loop = asyncio.get_running_loop()
+        if self.loop is not loop:
+            self.loop, self.lock = loop, asyncio.Lock()
+            self.playwright, self.browser, self.users = None, None, 0
+        async with self.lock:
+            if self.idle_close is not None:
+                self.idle_close.cancel()
+                self.idle_close = None
+            if self.browser is None or not self.browser.is_connected():
+                start = time.time()
+                self.playwright = self.playwright or await async_playwright().start()
+                self.browser = await self.playwright.chromium.launch()
+                logger.info("Browser launched users=%s elapsed_ms=%s", self.users, int((time.time() - start) * 1000))
+            self.users += 1
+            return self.browser
+
+    async def release(self) -> None:
+        # Not below zero: a forced close() already let go of the runs still holding the browser.
+        self.users = max(self.users - 1, 0)
+        if self.users > 0:
+            return
+        if self.idle_seconds > 0:
+            self.idle_close = self.loop.call_later(self.idle_seconds, lambda: asyncio.ensure_future(self.close()))
+        else:
+            await self.close()
+
+    async def close(self, force: bool = False) -> None:
+        """Close the browser once no run uses it, or right away with `force` (at shutdown)."""
+        if self.lock is None or self.loop is not asyncio.get_running_loop():
+            return  # never launched in this event loop
+        async with self.lock:
+            if self.users > 0 and not force:
+                return
+            if self.idle_close is not None:
+                self.idle_close.cancel()
+                self.idle_close = None
+            self.users = 0
+            if self.browser is not None:
+                await self.browser.close()
+                self.browser = None
+            if self.playwright is not None:
+                await self.playwright.stop()
+                self.playwright = None
+            logger.info("Browser closed")
+
+
+browser_pool = BrowserPool(BROWSER_IDLE_SECONDS if AGENT_EXECUTOR == "inline" else 0)
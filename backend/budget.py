@@ -0,0 +1,69 @@
+from dataclasses import dataclass, field
+import time
+
+from constants import (
+    RUN_BUDGET_NUDGE_FRACTION, RUN_MAX_PAGE_LOADS, RUN_MAX_PAGESPEED_CALLS, RUN_MAX_SECONDS, RUN_MAX_TOKENS,
+    RUN_MAX_TOOL_CALLS,
+)
+
+BUDGET_LIMITS = {
+    "tool_calls": "max_tool_calls",
+    "tokens": "max_tokens",
+    "page_loads": "max_page_loads",
+    "pagespeed_calls": "max_pagespeed_calls",
+}
+
+
+@dataclass
+class RunBudget:
+    """Resource limits for a single agent run, shared by the graph and every tool."""
+
+    max_seconds: float = RUN_MAX_SECONDS
+    max_tool_calls: int = RUN_MAX_TOOL_CALLS
+    max_tokens: int = RUN_MAX_TOKENS
+    max_page_loads: int = RUN_MAX_PAGE_LOADS
+    max_pagespeed_calls: int = RUN_MAX_PAGESPEED_CALLS
+    started: float = field(default_factory=time.monotonic)
+    tool_calls: int = 0
+    tokens: int = 0
+    page_loads: int = 0
+    pagespeed_calls: int = 0
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    def fractions(self) -> dict[str, float]:
+        fractions = {"seconds": self.elapsed() / self.max_seconds}
+        for used, limit in BUDGET_LIMITS.items():
+            fractions[used] = getattr(self, used) / getattr(self, limit)
+        return fractions
+
+    def exhausted(self) -> list[str]:
+        return [name for name, fraction in self.fractions().items() if fraction >= 1]
+
+    def nearly_exhausted(self) -> bool:
+        return max(self.fractions().values()) >= RUN_BUDGET_NUDGE_FRACTION
+
+    def charge(self, resource: str, amount: int = 1) -> str | None:
+        """Record usage of a resource. Returns an error message for the tool to return if the run is out of it."""
+        if self.elapsed() >= self.max_seconds:
+            return "Error: this run is out of time. Stop calling tools and conclude with what you have."
+        if getattr(self, resource) + amount > getattr(self, BUDGET_LIMITS[resource]):
+            return f"Error: this run has used its {resource.replace('_', ' ')} budget. Stop calling tools and conclude with what you have."
+        setattr(self, resource, getattr(self, resource) + amount)
+        return None
+
+    def restore(self, usage: dict) -> None:
+        """Carry over what an interrupted attempt of the same run already spent, as recorded by usage()."""
+        self.started -= usage.get("seconds", 0)
+        for used in BUDGET_LIMITS:
+            setattr(self, used, usage.get(used, 0))
+
+    def usage(self) -> dict:
+        return {
+            "seconds": round(self.elapsed(), 1),
+            "tool_calls": self.tool_calls,
+            "tokens": self.tokens,
+            "page_loads": self.page_loads,
+            "pagespeed_calls": self.pagespeed_calls,
+        }
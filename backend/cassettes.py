@@ -0,0 +1,255 @@
+"""
+Record/replay cassettes for agent runs, so the agent loop can be profiled and regression-tested
+without paying for OpenAI calls, GitHub calls or page loads.
+
+- AGENT_CASSETTE_MODE=record writes every OpenAI HTTP exchange, the GitHub MCP tool list and
+  every external tool result of each run to AGENT_CASSETTE_PATH (gzipped JSON).
+- AGENT_CASSETTE_MODE=replay serves them back from that file at full speed, without touching
+  the network, a browser or the MCP server. Tools in LIVE_TOOLS only touch the application
+  database and always run for real, so replays still exercise persistence.
+
+Recordings are matched by a hash of the request within a scope (the website entry). When the
+request changed, e.g. after a prompt edit, the next unused recording of the same model or tool
+is served instead and counted as a miss. Only runs executed in this process are recorded, so
+record with AGENT_EXECUTOR=inline.
+"""
+
+from collections import defaultdict, deque
+from pathlib import Path
+from typing import Any, Awaitable, Callable
+import gzip
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+import httpx
+from langchain_core.messages import ToolMessage
+from langchain_core.tools import BaseTool, StructuredTool
+
+from constants import AGENT_CASSETTE_MODE, AGENT_CASSETTE_PATH
+
+logger = logging.getLogger(__name__)
+
+CASSETTE_VERSION = 1
+LIVE_TOOLS = {"submit_diagnostic"}
+
+
+def digest(value: Any) -> str:
+    return hashlib.sha256(json.dumps(value, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:32]
+
+
+class CassetteStore:
+    """The recordings of one cassette file, shared by every run in the process."""
+
+    def __init__(self, path: str, mode: str):
+        if mode not in ("record", "replay"):
+            raise RuntimeError(f"AGENT_CASSETTE_MODE must be 'record' or 'replay', not '{mode}'")
+        self.path = Path(path)
+        self.mode = mode
+        self.lock = threading.Lock()
+        self.meta: dict[str, Any] = {}
+        self.tools: dict[str, list[dict]] = {}
+        self.interactions: list[dict] = []
+        if mode == "replay":
+            data = json.loads(gzip.decompress(self.path.read_bytes()))
+            if data.get("version") != CASSETTE_VERSION:
+                raise RuntimeError(f"Unsupported cassette version {data.get('version')} in {self.path}")
+            self.meta = data["meta"]
+            self.tools = data["tools"]
+            self.interactions = data["interactions"]
+        self.rewind()
+
+    def rewind(self) -> None:
+        """Make every recording available again, e.g. before replaying the same runs once more."""
+        with self.lock:
+            self.used: set[int] = set()
+            self.by_key: dict[tuple, deque[int]] = defaultdict(deque)
+            self.by_name: dict[tuple, deque[int]] = defaultdict(deque)
+            for index, item in enumerate(self.interactions):
+                self.by_key[(item["scope"], item["kind"], item["name"], item["key"])].append(index)
+                self.by_name[(item["scope"], item["kind"], item["name"])].append(index)
+            self.misses = 0
+
+    def record(self, scope: str, kind: str, name: str, key: str, response: dict, elapsed_ms: int) -> None:
+        with self.lock:
+            self.interactions.append({
+                "scope": scope,
+                "kind": kind,
+                "name": name,
+                "key": key,
+                "elapsed_ms": elapsed_ms,
+                "response": response,
+            })
+
+    def play(self, scope: str, kind: str, name: str, key: str) -> dict:
+        with self.lock:
+            index = self.take(self.by_key[(scope, kind, name, key)])
+            if index is None:
+                index = self.take(self.by_name[(scope, kind, name)])
+                if index is None:
+                    raise LookupError(f"Cassette {self.path} has no recording left for {kind} '{name}' in scope {scope}")
+                self.misses += 1
+                logger.warning("Cassette miss scope=%s kind=%s name=%s, replaying the next recording instead", scope, kind, name)
+            self.used.add(index)
+            return self.interactions[index]["response"]
+
+    def take(self, candidates: deque[int]) -> int | None:
+        while candidates:
+            index = candidates.popleft()
+            if index not in self.used:
+                return index
+        return None
+
+    def save(self) -> None:
+        with self.lock:
+            data = {"version": CASSETTE_VERSION, "meta": self.meta, "tools": self.tools, "interactions": self.interactions}
+            # Written to a temporary file first so an interrupted save never leaves a truncated cassette.
+            partial = self.path.with_name(self.path.name + ".partial")
+            partial.write_bytes(gzip.compress(json.dumps(data, separators=(",", ":")).encode("utf-8")))
+            os.replace(partial, self.path)
+        logger.info("Cassette saved path=%s interactions=%s", self.path, len(self.interactions))
+
+
+class CassetteTransport(httpx.BaseTransport, httpx.AsyncBaseTransport):
+    """httpx transport for the OpenAI client that records or replays each exchange."""
+
+    def __init__(self, cassette: "Cassette"):
+        self.cassette = cassette
+        self.sync_transport = httpx.HTTPTransport()
+        self.async_transport = httpx.AsyncHTTPTransport()
+
+    def lookup(self, request: httpx.Request) -> tuple[str, str]:
+        body = json.loads(request.content or b"{}")
+        return body.get("model", request.url.path), digest({"path": request.url.path, "body": body})
+
+    def replay(self, request: httpx.Request) -> httpx.Response:
+        recorded = self.cassette.play("llm", *self.lookup(request))
+        return httpx.Response(
+            recorded["status"],
+            headers={"content-type": recorded["content_type"]},
+            content=recorded["body"].encode("utf-8"),
+            request=request,
+        )
+
+    def record(self, request: httpx.Request, response: httpx.Response, start: float) -> httpx.Response:
+        content_type = response.headers.get("content-type", "application/json")
+        self.cassette.record("llm", *self.lookup(request), {
+            "status": response.status_code,
+            "content_type": content_type,
+            "body": response.content.decode("utf-8"),
+        }, start)
+        # The body was already read and decoded, so only the content type is passed on.
+        return httpx.Response(response.status_code, headers={"content-type": content_type}, content=response.content, request=request)
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        if self.cassette.replaying:
+            return self.replay(request)
+        start = time.time()
+        response = self.sync_transport.handle_request(request)
+        response.read()
+        return self.record(request, response, start)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        if self.cassette.replaying:
+            return self.replay(request)
+        start = time.time()
+        response = await self.async_transport.handle_async_request(request)
+        await response.aread()
+        return self.record(request, response, start)
+
+    def close(self) -> None:
+        self.sync_transport.close()
+
+    async def aclose(self) -> None:
+        await self.async_transport.aclose()
+
+
+class Cassette:
+    """One agent run's view of the cassette store."""
+
+    def __init__(self, store: CassetteStore, scope: str):
+        self.store = store
+        self.scope = scope
+
+    @property
+    def replaying(self) -> bool:
+        return self.store.mode == "replay"
+
+    def record(self, kind: str, name: str, key: str, response: dict, start: float) -> None:
+        self.store.record(self.scope, kind, name, key, response, int((time.time() - start) * 1000))
+
+    def play(self, kind: str, name: str, key: str) -> dict:
+        return self.store.play(self.scope, kind, name, key)
+
+    def llm_options(self) -> dict:
+        """Keyword arguments for ChatOpenAI that route its requests through the cassette."""
+        transport = CassetteTransport(self)
+        options = {"http_client": httpx.Client(transport=transport), "http_async_client": httpx.AsyncClient(transport=transport)}
+        if self.replaying:
+            options["api_key"] = "cassette-replay"
+        return options
+
+    def record_tools(self, server: str, tools: list[BaseTool]) -> None:
+        self.store.tools[server] = [
+            {
+                "name": t.name,
+                "description": t.description,
+                "args_schema": t.args_schema if isinstance(t.args_schema, dict) else t.tool_call_schema.model_json_schema(),
+                "response_format": t.response_format,
+            }
+            for t in tools
+        ]
+
+    def replay_tools(self, server: str) -> list[BaseTool]:
+        """Stand-ins for a tool server's tools, with the recorded schemas. Their calls are answered by wrap_tool_call."""
+        async def unrecorded(**kwargs) -> str:
+            raise RuntimeError("This tool is only available from a cassette recording")
+
+        return [
+            StructuredTool(
+                name=spec["name"],
+                description=spec["description"],
+                args_schema=spec["args_schema"],
+                coroutine=unrecorded,
+                response_format=spec["response_format"],
+            )
+            for spec in self.store.tools.get(server, [])
+        ]
+
+    async def wrap_tool_call(self, request, execute: Callable[[Any], Awaitable[Any]]):
+        """ToolNode interceptor that records tool results, or answers tool calls from the recording."""
+        name = request.tool_call["name"]
+        if name in LIVE_TOOLS:
+            return await execute(request)
+        key = digest(request.tool_call["args"])
+        if self.replaying:
+            recorded = self.play("tool", name, key)
+            return ToolMessage(recorded["content"], tool_call_id=request.tool_call["id"], name=name, status=recorded["status"])
+        start = time.time()
+        result = await execute(request)
+        if isinstance(result, ToolMessage):
+            self.record("tool", name, key, {"content": result.content, "status": result.status}, start)
+        return result
+
+    def save(self) -> None:
+        if not self.replaying:
+            self.store.save()
+
+
+store: CassetteStore | None = None
+
+
+def get_store() -> CassetteStore | None:
+    global store
+    if store is None and AGENT_CASSETTE_MODE:
+        store = CassetteStore(AGENT_CASSETTE_PATH, AGENT_CASSETTE_MODE)
+    return store
+
+
+def open_cassette(website_entry_id: int) -> Cassette | None:
+    """The cassette for a run on a website entry, or None when cassettes are off."""
+    cassette_store = get_store()
+    return Cassette(cassette_store, str(website_entry_id)) if cassette_store else None
@@ -0,0 +1,202 @@
+from collections.abc import AsyncIterator, Iterator, Sequence
+from typing import Any
+import asyncio
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP, BaseCheckpointSaver, ChannelVersions, Checkpoint, CheckpointMetadata, CheckpointTuple,
+    get_checkpoint_id, get_checkpoint_metadata, writes_sort_key,
+)
+from sqlalchemy import Engine, delete
+from sqlmodel import Session, select
+
+from constants import CHECKPOINTS_KEPT_PER_RUN
+from models import AgentCheckpoint, AgentCheckpointWrite
+
+
+class DatabaseCheckpointSaver(BaseCheckpointSaver[str]):
+    """
+    LangGraph checkpointer backed by the application database, with one thread per agent run.
+    Each checkpoint stores the full graph state, so only the newest few per run are kept:
+    a run only ever resumes from its latest checkpoint.
+    """
+
+    def __init__(self, engine: Engine):
+        super().__init__()
+        self.engine = engine
+
+    def _tuple(self, session: Session, row: AgentCheckpoint) -> CheckpointTuple:
+        writes = session.exec(
+            select(AgentCheckpointWrite).where(
+                AgentCheckpointWrite.thread_id == row.thread_id,
+                AgentCheckpointWrite.checkpoint_ns == row.checkpoint_ns,
+                AgentCheckpointWrite.checkpoint_id == row.checkpoint_id,
+            )
+        ).all()
+        writes = sorted(writes, key=lambda w: writes_sort_key(w.task_path, w.task_id, w.idx))
+        configurable = {"thread_id": row.thread_id, "checkpoint_ns": row.checkpoint_ns}
+        return CheckpointTuple(
+            config={"configurable": {**configurable, "checkpoint_id": row.checkpoint_id}},
+            checkpoint=self.serde.loads_typed((row.checkpoint_type, row.checkpoint)),
+            metadata=self.serde.loads_typed((row.metadata_type, row.metadata_blob)),
+            parent_config=(
+                {"configurable": {**configurable, "checkpoint_id": row.parent_checkpoint_id}}
+                if row.parent_checkpoint_id else None
+            ),
+            pending_writes=[(w.task_id, w.channel, self.serde.loads_typed((w.value_type, w.value))) for w in writes],
+        )
+
+    def get_tuple(self, config: RunnableConfig) -> CheckpointTuple | None:
+        configurable = config["configurable"]
+        query = select(AgentCheckpoint).where(
+            AgentCheckpoint.thread_id == configurable["thread_id"],
+            AgentCheckpoint.checkpoint_ns == configurable.get("checkpoint_ns", ""),
+        )
+        if checkpoint_id := get_checkpoint_id(config):
+            query = query.where(AgentCheckpoint.checkpoint_id == checkpoint_id)
+        with Session(self.engine) as session:
+            row = session.exec(query.order_by(AgentCheckpoint.checkpoint_id.desc())).first()
+            return self._tuple(session, row) if row else None
+
+    def list(
+        self,
+        config: RunnableConfig | None,
+        *,
+        filter: dict[str, Any] | None = None,
+        before: RunnableConfig | None = None,
+        limit: int | None = None,
+    ) -> Iterator[CheckpointTuple]:
+        query = select(AgentCheckpoint)
+        if config:
+            configurable = config["configurable"]
+            query = query.where(AgentCheckpoint.thread_id == configurable["thread_id"])
+            if "checkpoint_ns" in configurable:
+                query = query.where(AgentCheckpoint.checkpoint_ns == configurable["checkpoint_ns"])
+            if checkpoint_id := get_checkpoint_id(config):
+                query = query.where(AgentCheckpoint.checkpoint_id == checkpoint_id)
+        if before and (before_id := get_checkpoint_id(before)):
+            query = query.where(AgentCheckpoint.checkpoint_id < before_id)
+        with Session(self.engine) as session:
+            results = []
+            for row in session.exec(query.order_by(AgentCheckpoint.checkpoint_id.desc())).all():
+                item = self._tuple(session, row)
+                if filter and not all(item.metadata.get(k) == v for k, v in filter.items()):
+                    continue
+                results.append(item)
+                if limit is not None and len(results) >= limit:
+                    break
+        yield from results
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_type, checkpoint_blob = self.serde.dumps_typed(checkpoint)
+        metadata_type, metadata_blob = self.serde.dumps_typed(get_checkpoint_metadata(config, metadata))
+        with Session(self.engine) as session:
+            session.add(AgentCheckpoint(
+                thread_id=thread_id,
+                checkpoint_ns=checkpoint_ns,
+                checkpoint_id=checkpoint["id"],
+                parent_checkpoint_id=config["configurable"].get("checkpoint_id"),
+                checkpoint_type=checkpoint_type,
+                checkpoint=checkpoint_blob,
+                metadata_type=metadata_type,
+                metadata_blob=metadata_blob,
+            ))
+            # Checkpoint ids are time-ordered, so everything older than the newest few is dead weight.
+            stale = session.exec(
+                select(AgentCheckpoint.checkpoint_id)
+                .where(AgentCheckpoint.thread_id == thread_id, AgentCheckpoint.checkpoint_ns == checkpoint_ns)
+                .order_by(AgentCheckpoint.checkpoint_id.desc())
+                .offset(CHECKPOINTS_KEPT_PER_RUN)
+            ).all()
+            if stale:
+                for model in (AgentCheckpoint, AgentCheckpointWrite):
+                    session.exec(delete(model).where(
+                        model.thread_id == thread_id,
+                        model.checkpoint_ns == checkpoint_ns,
+                        model.checkpoint_id.in_(stale),
+                    ))
+            session.commit()
+        return {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint["id"]}}
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        configurable = config["configurable"]
+        key = {
+            "thread_id": configurable["thread_id"],
+            "checkpoint_ns": configurable.get("checkpoint_ns", ""),
+            "checkpoint_id": configurable["checkpoint_id"],
+        }
+        with Session(self.engine) as session:
+            for position, (channel, value) in enumerate(writes):
+                idx = WRITES_IDX_MAP.get(channel, position)
+                existing = session.exec(select(AgentCheckpointWrite).where(
+                    *(getattr(AgentCheckpointWrite, k) == v for k, v in key.items()),
+                    AgentCheckpointWrite.task_id == task_id,
+                    AgentCheckpointWrite.idx == idx,
+                )).first()
+                # Regular writes are idempotent per (task, index); special channels (negative index) overwrite.
+                if existing and idx >= 0:
+                    continue
+                value_type, value_blob = self.serde.dumps_typed(value)
+                row = existing or AgentCheckpointWrite(**key, task_id=task_id, idx=idx)
+                row.task_path = task_path
+                row.channel = channel
+                row.value_type = value_type
+                row.value = value_blob
+                session.add(row)
+            session.commit()
+
+    def delete_thread(self, thread_id: str) -> None:
+        with Session(self.engine) as session:
+            for model in (AgentCheckpoint, AgentCheckpointWrite):
+                session.exec(delete(model).where(model.thread_id == thread_id))
+            session.commit()
+
+    async def aget_tuple(self, config: RunnableConfig) -> CheckpointTuple | None:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(
+        self,
+        config: RunnableConfig | None,
+        *,
+        filter: dict[str, Any] | None = None,
+        before: RunnableConfig | None = None,
+        limit: int | None = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        for item in await asyncio.to_thread(lambda: list(self.list(config, filter=filter, before=before, limit=limit))):
+            yield item
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await asyncio.to_thread(self.delete_thread, thread_id)
+
@@ -6,8 +6,53 @@ JWT_SECRET = os.getenv("JWT_SECRET")
 JWT_ALGORITHM = "HS256"
 SESSION_COOKIE_NAME = "webster_auth"
 SESSION_TTL_SECONDS = int(os.getenv("SESSION_TTL_SECONDS", str(60 * 60 * 24)))
+# Bearer token required by /metrics; the endpoint is disabled when unset.
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
 FRONTEND_ORIGIN = FRONTEND_URL.rstrip("/") if FRONTEND_URL else ""
 GITHUB_CLIENT_ID = os.getenv("GITHUB_CLIENT_ID")
 GITHUB_CLIENT_SECRET = os.getenv("GITHUB_CLIENT_SECRET")
 BACKEND_URL = os.getenv("BACKEND_URL", "").rstrip("/")
 GITHUB_APP_SLUG = os.getenv("GITHUB_APP_SLUG", "")
+GITHUB_API_URL = os.getenv("GITHUB_API_URL", "https://api.github.com").rstrip("/")
+GITHUB_MCP_URL = os.getenv("GITHUB_MCP_URL", "https://api.githubcopilot.com/mcp/readonly")
+VERIFICATION_CONCURRENCY = int(os.getenv("VERIFICATION_CONCURRENCY", "3"))
+# Entries of one batch verified at once. Each also holds one of the VERIFICATION_CONCURRENCY slots (batches.py).
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "3"))
+SCHEDULER_ENABLED = os.getenv("SCHEDULER_ENABLED", "true").lower() == "true"
+SCHEDULER_TICK_SECONDS = int(os.getenv("SCHEDULER_TICK_SECONDS", "30"))
+SCHEDULER_BATCH_SIZE = int(os.getenv("SCHEDULER_BATCH_SIZE", "50"))
+SCHEDULER_MAX_JITTER_SECONDS = int(os.getenv("SCHEDULER_MAX_JITTER_SECONDS", "300"))
+# Scheduled runs skip unchanged sites, but never for longer than this: regressions can come from
+# things the change check can't see (third-party services, expired certificates, server config).
+SCHEDULER_MAX_SKIP_SECONDS = int(os.getenv("SCHEDULER_MAX_SKIP_SECONDS", str(60 * 60 * 24 * 7)))
+RUN_EVENT_BUFFER_SIZE = int(os.getenv("RUN_EVENT_BUFFER_SIZE", "500"))
+RUN_RETENTION_SECONDS = int(os.getenv("RUN_RETENTION_SECONDS", str(60 * 15)))
+MAX_CONCURRENT_AGENT_RUNS = int(os.getenv("MAX_CONCURRENT_AGENT_RUNS", "4"))
+USER_MAX_CONCURRENT_RUNS = int(os.getenv("USER_MAX_CONCURRENT_RUNS", "2"))
+USER_RUNS_PER_MINUTE = float(os.getenv("USER_RUNS_PER_MINUTE", "6"))
+USER_RUN_BURST = int(os.getenv("USER_RUN_BURST", "3"))
+ENTRY_RUNS_PER_MINUTE = float(os.getenv("ENTRY_RUNS_PER_MINUTE", "4"))
+ENTRY_RUN_BURST = int(os.getenv("ENTRY_RUN_BURST", "2"))
+RUN_MAX_SECONDS = float(os.getenv("RUN_MAX_SECONDS", "300"))
+RUN_MAX_TOOL_CALLS = int(os.getenv("RUN_MAX_TOOL_CALLS", "60"))
+RUN_MAX_TOKENS = int(os.getenv("RUN_MAX_TOKENS", "400000"))
+BATCH_MAX_TOKENS = int(os.getenv("BATCH_MAX_TOKENS", str(RUN_MAX_TOKENS * 10)))
+RUN_MAX_PAGE_LOADS = int(os.getenv("RUN_MAX_PAGE_LOADS", "30"))
+RUN_MAX_PAGESPEED_CALLS = int(os.getenv("RUN_MAX_PAGESPEED_CALLS", "3"))
+RUN_BUDGET_NUDGE_FRACTION = float(os.getenv("RUN_BUDGET_NUDGE_FRACTION", "0.8"))
+REPO_REF_TTL_SECONDS = int(os.getenv("REPO_REF_TTL_SECONDS", "60"))
+REPO_BLOB_CACHE_BYTES = int(os.getenv("REPO_BLOB_CACHE_BYTES", str(64 * 1024 * 1024)))
+ARTIFACT_CACHE_BYTES = int(os.getenv("ARTIFACT_CACHE_BYTES", str(128 * 1024 * 1024)))
+AGENT_PREWARM = os.getenv("AGENT_PREWARM", "true").lower() == "true"
+AGENT_EXECUTOR = os.getenv("AGENT_EXECUTOR", "inline")  # "inline", "process" or "modal"
+BROWSER_IDLE_SECONDS = float(os.getenv("BROWSER_IDLE_SECONDS", "60"))
+MCP_TOOLS_TTL_SECONDS = int(os.getenv("MCP_TOOLS_TTL_SECONDS", "300"))
+AGENT_WORKER_PROCESSES = int(os.getenv("AGENT_WORKER_PROCESSES", str(MAX_CONCURRENT_AGENT_RUNS)))
+MODAL_APP_NAME = os.getenv("MODAL_APP_NAME", "webster-api")
+CHECKPOINTS_KEPT_PER_RUN = int(os.getenv("CHECKPOINTS_KEPT_PER_RUN", "2"))
+CHECKPOINT_RETENTION_SECONDS = int(os.getenv("CHECKPOINT_RETENTION_SECONDS", str(60 * 60 * 24)))
+AGENT_JOB_STALE_SECONDS = int(os.getenv("AGENT_JOB_STALE_SECONDS", "120"))
+AGENT_JOB_MAX_ATTEMPTS = int(os.getenv("AGENT_JOB_MAX_ATTEMPTS", "3"))
+VISUAL_SNAPSHOTS_ENABLED = os.getenv("VISUAL_SNAPSHOTS_ENABLED", "true").lower() == "true"
+AGENT_CASSETTE_MODE = os.getenv("AGENT_CASSETTE_MODE", "")  # "", "record" or "replay"
+AGENT_CASSETTE_PATH = os.getenv("AGENT_CASSETTE_PATH", "agent_cassette.json.gz")
@@ -0,0 +1,140 @@
+"""
+Fingerprinting and deduplication of the diagnostics agent runs submit. A diagnostic that was
+already reported for the entry, verbatim or reworded, is merged into the open one instead of
+being stored again.
+"""
+
+from datetime import datetime, timezone
+from difflib import SequenceMatcher
+import hashlib
+import re
+
+from sqlmodel import Session, select
+
+from models import Diagnostic, DiagnosticBucket
+
+# Bumped whenever canonicalize_diagnostic changes, so migrations.py recomputes stored fingerprints.
+FINGERPRINT_VERSION = 1
+NEAR_DUPLICATE_RATIO = 0.85
+# MinHash LSH over description tokens: descriptions sharing most of their tokens land in a
+# common bucket with high probability, so near-duplicate candidates are found by index.
+MINHASH_BANDS = 6
+MINHASH_ROWS = 2
+MAX_NEAR_DUPLICATE_CANDIDATES = 20
+# A merged diagnostic keeps every distinct report's details up to this size.
+MAX_MERGED_DETAILS_CHARS = 8000
+FINGERPRINT_STOPWORDS = {"a", "an", "the", "is", "are", "on", "in", "of", "for", "to", "and", "with", "page", "website", "site"}
+
+# URLs are kept as host and path and site paths as they are, since they tell issues on different
+# resources apart, as are HTTP status codes. Other numbers (sizes, timings, counts) vary between
+# runs of the same issue and are folded into "n".
+DESCRIPTION_TOKEN = re.compile(
+    r"https?://(?P<url>[^\s?#'\"<>]+)(?:[?#][^\s'\"<>]*)?"
+    r"|(?P<path>(?<![\w/.])/[\w\-./~%]*)"
+    r"|(?P<status>\b[1-5]\d\d\b)"
+    r"|(?P<number>\d+(?:\.\d+)?)"
+    r"|(?P<word>[a-z]+)"
+)
+
+
+def canonicalize_diagnostic(short_desc: str) -> str:
+    tokens = []
+    for match in DESCRIPTION_TOKEN.finditer(short_desc.lower()):
+        kind, value = match.lastgroup, match.group(match.lastgroup)
+        if kind in ("url", "path"):
+            tokens.append(value.rstrip(".,;:)").rstrip("/") or "/")
+        elif kind == "number":
+            tokens.append("n")
+        elif kind == "status" or value not in FINGERPRINT_STOPWORDS:
+            tokens.append(value)
+    return " ".join(tokens)
+
+
+def diagnostic_identifiers(canonical: str) -> set[str]:
+    """The URLs, paths and status codes of a canonical description."""
+    return {token for token in canonical.split() if "/" in token or token.isdigit()}
+
+
+def diagnostic_fingerprint(severity: str, canonical: str) -> str:
+    return hashlib.sha256(f"{severity}:{canonical}".encode("utf-8")).hexdigest()[:32]
+
+
+def is_near_duplicate(canonical_a: str, canonical_b: str) -> bool:
+    # Rewordings of one issue name the same resources; "broken link /a" and "broken link /b" are two issues.
+    if diagnostic_identifiers(canonical_a) != diagnostic_identifiers(canonical_b):
+        return False
+    return SequenceMatcher(None, canonical_a, canonical_b).ratio() >= NEAR_DUPLICATE_RATIO
+
+
+def diagnostic_buckets(severity: str, canonical: str) -> list[str]:
+    tokens = set(canonical.split())
+    if not tokens:
+        return []
+    minimums = [
+        min(int.from_bytes(hashlib.blake2b(f"{i}:{token}".encode("utf-8"), digest_size=8).digest(), "big") for token in tokens)
+        for i in range(MINHASH_BANDS * MINHASH_ROWS)
+    ]
+    return [
+        hashlib.sha256(f"{severity}:{band}:{minimums[band * MINHASH_ROWS:(band + 1) * MINHASH_ROWS]}".encode("utf-8")).hexdigest()[:32]
+        for band in range(MINHASH_BANDS)
+    ]
+
+
+def bucket_rows(diagnostic: Diagnostic, canonical: str) -> list[DiagnosticBucket]:
+    return [
+        DiagnosticBucket(diagnostic_id=diagnostic.id, website_entry_id=diagnostic.website_entry_id, bucket=bucket)
+        for bucket in diagnostic_buckets(diagnostic.severity, canonical)
+    ]
+
+
+def merge_details(existing: str, new: str, seen_at: datetime) -> str:
+    """The existing details, followed by the new report's when it adds something and there is room."""
+    new = new.strip()
+    if not new or new in existing or len(existing) + len(new) > MAX_MERGED_DETAILS_CHARS:
+        return existing
+    return f"{existing}\n\nReported again on {seen_at.strftime('%Y-%m-%d %H:%M UTC')}:\n{new}"
+
+
+def find_duplicate(session: Session, website_entry_id: int, severity: str, canonical: str) -> Diagnostic | None:
+    open_diagnostics = select(Diagnostic).where(
+        Diagnostic.website_entry_id == website_entry_id,
+        Diagnostic.dismissed == False,
+    )
+    fingerprint = diagnostic_fingerprint(severity, canonical)
+    if existing := session.exec(open_diagnostics.where(Diagnostic.fingerprint == fingerprint)).first():
+        return existing
+    buckets = diagnostic_buckets(severity, canonical)
+    if not buckets:
+        return None
+    candidates = session.exec(
+        open_diagnostics.join(DiagnosticBucket, DiagnosticBucket.diagnostic_id == Diagnostic.id)
+        .where(DiagnosticBucket.website_entry_id == website_entry_id, DiagnosticBucket.bucket.in_(buckets))
+        .distinct()
+        .limit(MAX_NEAR_DUPLICATE_CANDIDATES)
+    ).all()
+    return next((d for d in candidates if is_near_duplicate(canonical, canonicalize_diagnostic(d.short_desc))), None)
+
+
+def record_diagnostic(session: Session, website_entry_id: int, short_desc: str, full_desc: str, severity: str) -> tuple[Diagnostic, bool]:
+    """Store a diagnostic, or merge it into the open one it duplicates. Returns the row and whether it is new."""
+    canonical = canonicalize_diagnostic(short_desc)
+    now = datetime.now(timezone.utc)
+    if existing := find_duplicate(session, website_entry_id, severity, canonical):
+        existing.full_desc = merge_details(existing.full_desc, full_desc, now)
+        existing.occurrence_count += 1
+        existing.last_seen_at = now
+        session.commit()
+        return existing, False
+    diagnostic = Diagnostic(
+        website_entry_id=website_entry_id,
+        short_desc=short_desc,
+        full_desc=full_desc,
+        severity=severity,
+        fingerprint=diagnostic_fingerprint(severity, canonical),
+        fingerprint_version=FINGERPRINT_VERSION,
+    )
+    session.add(diagnostic)
+    session.flush()
+    session.add_all(bucket_rows(diagnostic, canonical))
+    session.commit()
+    return diagnostic, True
@@ -0,0 +1,224 @@
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import AsyncIterator
+from urllib.parse import urljoin, urlparse
+from urllib.robotparser import RobotFileParser
+import heapq
+import time
+import xml.etree.ElementTree as ET
+import zlib
+
+import httpx
+
+from links import USER_AGENT
+
+MAX_FRONTIER_URLS = 500
+MAX_SITEMAP_FILES = 20
+MAX_SITEMAP_DEPTH = 3
+# The sitemap protocol caps a sitemap at 50 MB uncompressed; anything beyond that is not read.
+MAX_SITEMAP_BYTES = 50 * 1024 * 1024
+MAX_ROBOTS_BYTES = 512 * 1024
+FETCH_TIMEOUT_SECONDS = 20
+GZIP_MAGIC = b"\x1f\x8b"
+
+
+@lru_cache(maxsize=4096)
+def lastmod_key(value: str) -> str:
+    """Normalize a W3C datetime (a date, or a date and time with an offset) to a sortable UTC string."""
+    value = value.strip()
+    if not value:
+        return ""
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        return ""
+    if parsed.tzinfo:
+        parsed = parsed.astimezone(timezone.utc)
+    return parsed.strftime("%Y-%m-%dT%H:%M:%S")
+
+
+def local_name(tag: str) -> str:
+    return tag.rsplit("}", 1)[-1]
+
+
+class Frontier:
+    """
+    Keeps the best `limit` URLs seen so far, newest lastmod first and shallower paths before deeper
+    ones, so a sitemap of any size is ranked in bounded memory. Duplicates keep their newest lastmod.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.best: dict[str, tuple[str, int]] = {}
+        # Min-heap of (rank, url); entries whose rank no longer matches `best` are stale and skipped.
+        self.heap: list[tuple[tuple[str, int], str]] = []
+
+    @staticmethod
+    def rank(url: str, lastmod: str) -> tuple[str, int]:
+        # Path depth by counting slashes past "scheme://": runs once per sitemap entry, so no URL parsing.
+        return lastmod, 2 - url.rstrip("/").count("/")
+
+    def worst(self) -> tuple[tuple[str, int], str]:
+        while self.heap[0][0] != self.best.get(self.heap[0][1]):
+            heapq.heappop(self.heap)
+        return self.heap[0]
+
+    def admits(self, url: str, lastmod: str) -> bool:
+        """Whether add() would keep this URL, so costlier checks can be skipped for URLs that won't make the cut."""
+        return url in self.best or len(self.best) < self.limit or self.rank(url, lastmod) > self.worst()[0]
+
+    def add(self, url: str, lastmod: str) -> None:
+        rank = self.rank(url, lastmod)
+        if url in self.best:
+            if rank > self.best[url]:
+                self.best[url] = rank
+                heapq.heappush(self.heap, (rank, url))
+            return
+        if len(self.best) >= self.limit:
+            worst_rank, worst_url = self.worst()
+            if rank <= worst_rank:
+                return
+            heapq.heappop(self.heap)
+            del self.best[worst_url]
+        self.best[url] = rank
+        heapq.heappush(self.heap, (rank, url))
+
+    def ranked(self) -> list[tuple[str, str]]:
+        """(url, lastmod) pairs, best first."""
+        return [(url, rank[0]) for url, rank in sorted(self.best.items(), key=lambda i: i[1], reverse=True)]
+
+
+@dataclass
+class FrontierResult:
+    pages: list[tuple[str, str]]
+    sitemaps_read: int = 0
+    urls_seen: int = 0
+    disallowed: int = 0
+    errors: list[str] = field(default_factory=list)
+    elapsed_ms: int = 0
+
+
+async def fetch_robots(client: httpx.AsyncClient, origin: str) -> tuple[RobotFileParser, list[str]]:
+    """Parse robots.txt for the rules that apply to us, and the sitemaps it declares."""
+    robots = RobotFileParser(f"{origin}/robots.txt")
+    lines, size = [], 0
+    try:
+        async with client.stream("GET", robots.url) as response:
+            if response.status_code >= 400:
+                # No robots.txt (or an error page) means everything is allowed, as crawlers treat it.
+                robots.allow_all = True
+                return robots, []
+            async for line in response.aiter_lines():
+                size += len(line)
+                if size > MAX_ROBOTS_BYTES:
+                    break
+                lines.append(line)
+    except httpx.HTTPError:
+        robots.allow_all = True
+        return robots, []
+    robots.parse(lines)
+    return robots, robots.site_maps() or []
+
+
+async def stream_sitemap(client: httpx.AsyncClient, url: str) -> AsyncIterator[tuple[str, str, str]]:
+    """
+    Yield ("url" | "sitemap", loc, lastmod) for each entry of a sitemap or sitemap index as it
+    downloads, decompressing gzip sitemaps on the fly. Parsed entries are discarded immediately,
+    so memory stays flat however large the file is.
+    """
+    parser = ET.XMLPullParser(events=("start", "end"))
+    root = None
+    decompressor = None
+    size = 0
+    async with client.stream("GET", url) as response:
+        response.raise_for_status()
+        async for chunk in response.aiter_bytes():
+            if decompressor is None and size == 0 and chunk.startswith(GZIP_MAGIC):
+                decompressor = zlib.decompressobj(wbits=31)
+            data = decompressor.decompress(chunk, MAX_SITEMAP_BYTES - size) if decompressor else chunk
+            size += len(data)
+            parser.feed(data)
+            for event, element in parser.read_events():
+                if event == "start":
+                    root = root if root is not None else element
+                    continue
+                kind = local_name(element.tag)
+                if kind not in ("url", "sitemap"):
+                    continue
+                values = {local_name(child.tag): (child.text or "").strip() for child in element}
+                if values.get("loc"):
+                    yield kind, values["loc"], lastmod_key(values.get("lastmod", ""))
+                root.clear()
+            if size >= MAX_SITEMAP_BYTES:
+                break
+
+
+async def build_frontier(website_url: str, limit: int = MAX_FRONTIER_URLS) -> FrontierResult:
+    """
+    Rank the website's pages from robots.txt and its sitemaps (falling back to /sitemap.xml).
+    Nested sitemap indexes are followed newest first, up to MAX_SITEMAP_FILES files, so the
+    cost is fixed however large the site is. Only same-site URLs that robots.txt allows are kept.
+    """
+    start = time.time()
+    parsed = urlparse(website_url)
+    origin = f"{parsed.scheme}://{parsed.netloc}"
+    # Sitemaps often mix http and https for the same site; both count as on-site.
+    site_prefixes = (f"http://{parsed.netloc}/", f"https://{parsed.netloc}/")
+    frontier = Frontier(limit)
+    result = FrontierResult(pages=[])
+    async with httpx.AsyncClient(timeout=FETCH_TIMEOUT_SECONDS, follow_redirects=True, headers={"User-Agent": USER_AGENT}) as client:
+        robots, declared = await fetch_robots(client, origin)
+        has_rules = not robots.allow_all and bool(robots.entries or robots.default_entry)
+        # Sitemap indexes are read level by level, newest child sitemaps first.
+        level = [(url, "") for url in declared or [f"{origin}/sitemap.xml"]]
+        seen_sitemaps = {url for url, _ in level}
+        for _ in range(MAX_SITEMAP_DEPTH + 1):
+            children = []
+            for position, (sitemap_url, _) in enumerate(sorted(level, key=lambda s: s[1], reverse=True)):
+                if result.sitemaps_read >= MAX_SITEMAP_FILES:
+                    result.errors.append(f"{len(level) - position} more sitemaps were not read (limit {MAX_SITEMAP_FILES})")
+                    break
+                result.sitemaps_read += 1
+                try:
+                    async for kind, loc, lastmod in stream_sitemap(client, sitemap_url):
+                        if not loc.startswith(("http://", "https://")):
+                            loc = urljoin(sitemap_url, loc)
+                        if kind == "sitemap":
+                            if loc not in seen_sitemaps:
+                                seen_sitemaps.add(loc)
+                                children.append((loc, lastmod))
+                            continue
+                        url = loc.split("#", 1)[0]
+                        if not url.startswith(site_prefixes) and url not in (origin, origin.replace("https:", "http:", 1)):
+                            continue
+                        result.urls_seen += 1
+                        if not frontier.admits(url, lastmod):
+                            continue
+                        if has_rules and not robots.can_fetch(USER_AGENT, url):
+                            result.disallowed += 1
+                            continue
+                        frontier.add(url, lastmod)
+                except (httpx.HTTPError, ET.ParseError, zlib.error) as e:
+                    result.errors.append(f"{sitemap_url}: {e}")
+            level = children
+            if not level:
+                break
+    result.pages = frontier.ranked()
+    result.elapsed_ms = int((time.time() - start) * 1000)
+    return result
+
+
+def format_frontier(result: FrontierResult, limit: int, path_prefix: str = "") -> str:
+    pages = [(url, lastmod) for url, lastmod in result.pages if urlparse(url).path.startswith(path_prefix or "/")]
+    parts = [
+        f"Read {result.sitemaps_read} sitemaps in {result.elapsed_ms} ms: {result.urls_seen} URLs on this site, "
+        f"{result.disallowed} candidates disallowed by robots.txt. Top {min(limit, len(pages))} of {len(pages)} ranked pages "
+        "(most recently modified first):"
+    ]
+    parts += [f"- {url}" + (f" (lastmod {lastmod[:10]})" if lastmod else "") for url, lastmod in pages[:limit]]
+    if not pages:
+        parts.append("- no pages found in the sitemaps")
+    if result.errors:
+        parts.append("Problems:\n" + "\n".join(f"- {e}" for e in result.errors[:10]))
+    return "\n".join(parts)
@@ -0,0 +1,114 @@
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator
+import asyncio
+import json
+import logging
+
+from sqlalchemy import Engine, delete, func
+from sqlmodel import Session, select, update
+
+from constants import AGENT_JOB_MAX_ATTEMPTS, AGENT_JOB_STALE_SECONDS, CHECKPOINT_RETENTION_SECONDS
+from models import AgentCheckpoint, AgentCheckpointWrite, AgentJob, Message
+
+logger = logging.getLogger(__name__)
+
+HEARTBEAT_SECONDS = max(AGENT_JOB_STALE_SECONDS // 4, 1)
+
+
+def create_job(engine: Engine, job: AgentJob) -> None:
+    with Session(engine, expire_on_commit=False) as session:
+        session.add(job)
+        session.commit()
+
+
+def set_job(engine: Engine, run_id: str, **values) -> None:
+    with Session(engine) as session:
+        session.exec(update(AgentJob).where(AgentJob.run_id == run_id).values(**values))
+        session.commit()
+
+
+def job_budget_limits(job: AgentJob) -> dict | None:
+    """The job's RunBudget overrides, so a resumed run keeps the limits it started with."""
+    return json.loads(job.budget_limits_json or "{}") or None
+
+
+def save_answer(engine: Engine, job: AgentJob, content: str) -> None:
+    with Session(engine) as session:
+        session.add(Message(
+            website_entry_id=job.website_entry_id,
+            role="ai",
+            content=content,
+            is_automated=job.is_automated,
+            is_fix_action=job.is_fix_action,
+        ))
+        session.commit()
+
+
+async def run_job(engine: Engine, run_id: str, events: AsyncIterator[dict]) -> AsyncIterator[dict]:
+    """
+    Relay a durable agent run's events while heartbeating its job row. A run that raises is
+    marked failed: its error was already reported, and errors like a rejected LLM request or a
+    deleted entry would only fail again. A run whose owner dies stops heartbeating and is
+    recovered elsewhere, resuming from its last checkpoint.
+    """
+    async def heartbeat() -> None:
+        while True:
+            await asyncio.sleep(HEARTBEAT_SECONDS)
+            await asyncio.to_thread(set_job, engine, run_id, heartbeat_at=datetime.now(timezone.utc))
+
+    beat = asyncio.create_task(heartbeat())
+    try:
+        async for event in events:
+            yield event
+    except Exception:
+        set_job(engine, run_id, status="failed")
+        raise
+    else:
+        set_job(engine, run_id, status="done")
+    finally:
+        beat.cancel()
+
+
+def claim_stale_jobs(engine: Engine) -> list[AgentJob]:
+    """Claim running jobs whose owner stopped heartbeating. Jobs out of attempts are marked failed."""
+    now = datetime.now(timezone.utc)
+    claimed_ids = []
+    with Session(engine, expire_on_commit=False) as session:
+        stale = session.exec(
+            select(AgentJob).where(
+                AgentJob.status == "running",
+                AgentJob.heartbeat_at < now - timedelta(seconds=AGENT_JOB_STALE_SECONDS),
+            )
+        ).all()
+        for job in stale:
+            exhausted = job.attempts >= AGENT_JOB_MAX_ATTEMPTS
+            values = {"status": "failed"} if exhausted else {"heartbeat_at": now, "attempts": job.attempts + 1}
+            # Compare-and-set on the heartbeat so only one container recovers each job.
+            result = session.exec(
+                update(AgentJob)
+                .where(AgentJob.run_id == job.run_id, AgentJob.heartbeat_at == job.heartbeat_at)
+                .values(**values)
+                .execution_options(synchronize_session=False)
+            )
+            if result.rowcount == 1 and exhausted:
+                logger.warning("Agent job failed permanently run_id=%s attempts=%s", job.run_id, job.attempts)
+            elif result.rowcount == 1:
+                claimed_ids.append(job.run_id)
+        session.commit()
+        if not claimed_ids:
+            return []
+        session.expire_all()
+        return list(session.exec(select(AgentJob).where(AgentJob.run_id.in_(claimed_ids))).all())
+
+
+def prune_jobs(engine: Engine) -> None:
+    """Keep checkpoint storage bounded: drop checkpoints of failed runs and of runs idle past retention."""
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=CHECKPOINT_RETENTION_SECONDS)
+    with Session(engine) as session:
+        failed = select(AgentJob.run_id).where(AgentJob.status == "failed")
+        idle = select(AgentCheckpoint.thread_id).group_by(AgentCheckpoint.thread_id).having(func.max(AgentCheckpoint.created_at) < cutoff)
+        for model in (AgentCheckpoint, AgentCheckpointWrite):
+            session.exec(delete(model).where(model.thread_id.in_(failed)))
+            session.exec(delete(model).where(model.thread_id.in_(idle)))
+        session.exec(delete(AgentJob).where(AgentJob.status != "running", AgentJob.heartbeat_at < cutoff))
+        session.commit()
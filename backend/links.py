@@ -0,0 +1,236 @@
+from collections import defaultdict
+from dataclasses import dataclass, field
+from urllib.parse import urldefrag, urljoin, urlparse
+import asyncio
+import ipaddress
+import logging
+import socket
+import time
+
+import httpx
+
+from artifacts import artifact_store, site_key
+from site_resources import is_third_party
+
+logger = logging.getLogger(__name__)
+
+MAX_REDIRECTS = 10
+PER_HOST_CONCURRENCY = 6
+TOTAL_CONCURRENCY = 64
+LINK_TIMEOUT_SECONDS = 10
+SLOW_LINK_MS = 2000
+TOP_N = 10
+USER_AGENT = "Mozilla/5.0 (compatible; WebsterLinkChecker/1.0)"
+
+# Every URL a page references: anchors plus the assets it loads (srcset candidates included).
+LINK_SCRIPT = """() => {
+    const links = [];
+    const add = (url, kind) => { if (url) links.push({url, kind}); };
+    document.querySelectorAll('a[href], area[href]').forEach(el => add(el.href, 'link'));
+    document.querySelectorAll('link[href]').forEach(el => add(el.href, el.rel || 'link'));
+    document.querySelectorAll('script[src], iframe[src], embed[src]').forEach(el => add(el.src, el.tagName.toLowerCase()));
+    document.querySelectorAll('img, source, video, audio, track').forEach(el => {
+        add(el.currentSrc || el.src, el.tagName.toLowerCase());
+        (el.getAttribute('srcset') || '').split(',').forEach(candidate => {
+            const url = candidate.trim().split(/\\s+/)[0];
+            if (url) add(new URL(url, document.baseURI).href, el.tagName.toLowerCase());
+        });
+    });
+    return links;
+}"""
+
+
+@dataclass
+class LinkResult:
+    url: str
+    status: int | None
+    elapsed_ms: int
+    method: str = "HEAD"
+    # (status, url) for every redirect hop before the final response.
+    redirects: list[tuple[int, str]] = field(default_factory=list)
+    error: str | None = None
+
+    @property
+    def broken(self) -> bool:
+        return self.error is not None or self.status is None or self.status >= 400
+
+    @property
+    def final_url(self) -> str:
+        return self.redirects[-1][1] if self.redirects else self.url
+
+
+class BlockedAddress(RuntimeError):
+    pass
+
+
+def is_public_address(address: str) -> bool:
+    ip = ipaddress.ip_address(address.split("%", 1)[0])
+    if ip.version == 6 and ip.ipv4_mapped:
+        ip = ip.ipv4_mapped
+    return ip.is_global and not ip.is_multicast
+
+
+def normalize_link(url: str) -> str | None:
+    """Checkable form of a link: http(s) only, without the fragment (fragments are never sent to the server)."""
+    url, _ = urldefrag(url.strip())
+    return url if urlparse(url).scheme in ("http", "https") else None
+
+
+class LinkChecker:
+    """
+    Checks URLs concurrently over one pooled client, with a per-host concurrency cap so a site
+    isn't hammered. Each URL is checked once per checker, so results are shared across pages
+    and across calls in the same run. Given the run's start time, results are also shared with
+    overlapping runs through the artifact store.
+    """
+
+    def __init__(self, since: float | None = None):
+        self.since = since
+        self.client = httpx.AsyncClient(
+            timeout=LINK_TIMEOUT_SECONDS,
+            follow_redirects=False,
+            limits=httpx.Limits(max_connections=TOTAL_CONCURRENCY, max_keepalive_connections=TOTAL_CONCURRENCY),
+            headers={"User-Agent": USER_AGENT},
+        )
+        self.hosts: dict[str, asyncio.Semaphore] = defaultdict(lambda: asyncio.Semaphore(PER_HOST_CONCURRENCY))
+        self.addresses: dict[str, asyncio.Task[str]] = {}
+        self.results: dict[str, asyncio.Task[LinkResult]] = {}
+
+    async def resolve(self, host: str) -> str:
+        """
+        A public address of the host. The URLs come from pages the user controls, so hosts that
+        resolve to loopback, private, link-local or other non-public addresses are refused
+        rather than letting the backend probe its own network.
+        """
+        infos = await asyncio.get_running_loop().getaddrinfo(host, None, type=socket.SOCK_STREAM)
+        addresses = [info[4][0] for info in infos]
+        if blocked := next((a for a in addresses if not is_public_address(a)), None):
+            raise BlockedAddress(f"refused: {host} resolves to a non-public address ({blocked})")
+        return addresses[0]
+
+    async def address(self, host: str) -> str:
+        """The checked address of a host, resolved once per checker. Failed lookups other than refusals are retried."""
+        if host not in self.addresses:
+            self.addresses[host] = asyncio.create_task(self.resolve(host))
+        task = self.addresses[host]
+        try:
+            return await task
+        except BlockedAddress:
+            raise
+        except Exception:
+            if self.addresses.get(host) is task:
+                del self.addresses[host]
+            raise
+
+    async def request(self, method: str, url: str) -> httpx.Response:
+        host = urlparse(url).hostname or ""
+        address = await self.address(host)
+        request = self.client.build_request(method, url, extensions={"sni_hostname": host})
+        # Connect to the address that was checked (the Host header and TLS name stay the original
+        # host), so a second DNS answer can't point the request somewhere else.
+        request.url = request.url.copy_with(host=address)
+        async with self.hosts[urlparse(url).netloc]:
+            # Streamed and closed unread, so a GET fallback never downloads the body.
+            response = await self.client.send(request, stream=True)
+            await response.aclose()
+            return response
+
+    async def follow(self, method: str, url: str) -> tuple[httpx.Response, list[tuple[int, str]]]:
+        redirects = []
+        seen = {url}
+        response = await self.request(method, url)
+        while response.is_redirect:
+            if len(redirects) >= MAX_REDIRECTS:
+                raise RuntimeError(f"more than {MAX_REDIRECTS} redirects")
+            # Every hop goes through request(), so redirects to non-public addresses are refused too.
+            target = urljoin(redirects[-1][1] if redirects else url, response.headers["location"])
+            if target in seen:
+                raise RuntimeError(f"redirect loop at {target}")
+            if not normalize_link(target):
+                raise RuntimeError(f"redirect to unsupported URL {target}")
+            seen.add(target)
+            redirects.append((response.status_code, target))
+            response = await self.request(method, target)
+        return response, redirects
+
+    async def check_one(self, url: str) -> LinkResult:
+        start = time.time()
+        method = "HEAD"
+        try:
+            try:
+                response, redirects = await self.follow(method, url)
+            except BlockedAddress:
+                raise
+            except Exception:
+                if self.client.is_closed:
+                    raise
+                response = None
+            # Plenty of servers reject, drop or mishandle HEAD, so a failed HEAD is confirmed with a GET.
+            if response is None or response.status_code >= 400:
+                method = "GET"
+                response, redirects = await self.follow(method, url)
+            return LinkResult(url, response.status_code, int((time.time() - start) * 1000), method, redirects)
+        except BlockedAddress as e:
+            # A redirect to a non-public address.
+            logger.warning("Link refused url=%s reason=%s", url, e)
+            return LinkResult(url, None, int((time.time() - start) * 1000), method, error=str(e))
+        except Exception as e:
+            if self.client.is_closed:
+                # The run ended; this says nothing about the link, so it must not be shared.
+                raise
+            return LinkResult(url, None, int((time.time() - start) * 1000), method, error=str(e) or type(e).__name__)
+
+    async def lookup(self, url: str) -> LinkResult:
+        try:
+            # Checked before the shared computation, so a refused host is reported and logged for each
+            # of its URLs in this run, and a refusal is never stored as another run's link result.
+            await self.address(urlparse(url).hostname or "")
+        except BlockedAddress as e:
+            logger.warning("Link refused url=%s reason=%s", url, e)
+            return LinkResult(url, None, 0, error=str(e))
+        except OSError:
+            pass  # DNS failures are reported by the check itself.
+        if self.since is None:
+            return await self.check_one(url)
+        return await artifact_store.share(site_key(url), "link", url, lambda: self.check_one(url), self.since)
+
+    async def check(self, urls: list[str]) -> dict[str, LinkResult]:
+        for url in urls:
+            if url not in self.results:
+                self.results[url] = asyncio.create_task(self.lookup(url))
+        return {url: await self.results[url] for url in urls}
+
+    async def close(self) -> None:
+        for task in self.results.values():
+            task.cancel()
+        await self.client.aclose()
+
+
+def format_link_report(pages: list[str], references: dict[str, set[str]], results: dict[str, LinkResult], website_host: str, elapsed_ms: int) -> str:
+    """Summarize link checks: broken links with the pages that reference them, redirect chains and slow links."""
+    broken = sorted((r for r in results.values() if r.broken), key=lambda r: r.url)
+    redirected = sorted((r for r in results.values() if r.redirects and not r.broken), key=lambda r: -len(r.redirects))
+    slow = sorted((r for r in results.values() if r.elapsed_ms >= SLOW_LINK_MS), key=lambda r: -r.elapsed_ms)
+    external = sum(1 for url in results if is_third_party(url, website_host))
+
+    def found_on(url: str) -> str:
+        on = sorted(references.get(url, ()))
+        return ", ".join(on[:3]) + (f" (+{len(on) - 3} more pages)" if len(on) > 3 else "")
+
+    def chain(r: LinkResult) -> str:
+        return " -> ".join([r.url, *(f"[{status}] {target}" for status, target in r.redirects)])
+
+    parts = [
+        f"Checked {len(results)} unique URLs ({external} external) referenced {sum(len(p) for p in references.values())} times "
+        f"on {len(pages)} pages in {elapsed_ms} ms: {len(broken)} broken, {len(redirected)} redirected, {len(slow)} slow (>= {SLOW_LINK_MS} ms).",
+    ]
+    sections = [
+        ("Broken", [f"{r.url}: {r.error or r.status} ({r.method}, found on {found_on(r.url)})" for r in broken]),
+        ("Redirect chains", [f"{chain(r)} ({len(r.redirects)} hops, final {r.status})" for r in redirected]),
+        ("Slow", [f"{r.url} ({r.elapsed_ms} ms)" for r in slow]),
+    ]
+    for title, items in sections:
+        if items:
+            more = f" (+{len(items) - TOP_N} more)" if len(items) > TOP_N else ""
+            parts.append(f"{title} ({len(items)}){more}:\n" + "\n".join(f"- {i}" for i in items[:TOP_N]))
+    return "\n".join(parts)
@@ -1,21 +1,36 @@
-from langchain_core.messages import AIMessage, HumanMessage
 from fastapi import BackgroundTasks, FastAPI, HTTPException, Request
-from fastapi.responses import RedirectResponse, StreamingResponse
+from fastapi.responses import PlainTextResponse, RedirectResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from sqlmodel import Session, SQLModel, create_engine, select
+from sqlmodel import Session, create_engine, select
 from dotenv import load_dotenv
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from typing import NamedTuple
+import asyncio
 import hashlib
 import hmac
 import json
 import requests
+import time
+import uuid
 
 load_dotenv()
 
-from agent import run_agent
+from admission import take_run_token
 from auth import create_session_token, get_current_user_id, get_owned_entry, get_user
+from batches import run_batch
 from constants import *
+from jobs import create_job, run_job, save_answer
+from migrations import upgrade_schema
 from models import *
-from verification import SEVERITY_ORDER, deregister_github_webhook, register_github_webhook, run_verification
+from runs import count_active_runs, get_active_batch, get_active_run, get_run, sse_events, start_batch, start_run
+from scheduler import compute_next_run, run_scheduler
+from tracing import instrument_engine, tracer
+from verification import (
+    SEVERITY_ORDER, collect_changed_files, deregister_github_webhook, filter_changes_in_scope,
+    format_change_manifest, parse_paths_in_scope, register_github_webhook, run_verification,
+)
+from workers import build_payload, close_browser, prewarm_workers, shutdown_workers, stream_agent_run
 
 if not FRONTEND_ORIGIN:
     raise RuntimeError("FRONTEND_URL is required")
@@ -23,11 +38,32 @@ if not JWT_SECRET:
     raise RuntimeError("JWT_SECRET is required")
 if not GITHUB_CLIENT_ID or not GITHUB_CLIENT_SECRET:
     raise RuntimeError("GITHUB_CLIENT_ID and GITHUB_CLIENT_SECRET are required")
+if AGENT_EXECUTOR == "modal" and DATABASE_URL.startswith("sqlite"):
+    # Agent containers would write their own copy of the SQLite file, which the API never sees.
+    raise RuntimeError("AGENT_EXECUTOR=modal requires a networked DATABASE_URL, not SQLite")
 
 engine = create_engine(DATABASE_URL)
-SQLModel.metadata.create_all(engine)
-
-api = FastAPI()
+instrument_engine(engine)
+upgrade_schema(engine)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    scheduler_task = asyncio.create_task(run_scheduler(engine)) if SCHEDULER_ENABLED else None
+    if AGENT_PREWARM:
+        # The agent stack is imported lazily; warming it in the background keeps the first run from paying for it.
+        prewarm_workers()
+    yield
+    if scheduler_task:
+        scheduler_task.cancel()
+        # Let the tick in progress unwind before the workers and the engine go away.
+        await asyncio.gather(scheduler_task, return_exceptions=True)
+    await close_browser()
+    shutdown_workers()
+    engine.dispose()
+
+
+api = FastAPI(lifespan=lifespan)
 api.add_middleware(
     CORSMiddleware,
     allow_origins=[FRONTEND_ORIGIN],
@@ -37,6 +73,16 @@ api.add_middleware(
 )
 
 
+# --- Metrics ---
+
+@api.get("/metrics", response_class=PlainTextResponse)
+def get_metrics(request: Request) -> str:
+    authorization = request.headers.get("Authorization", "")
+    if not METRICS_TOKEN or not hmac.compare_digest(authorization, f"Bearer {METRICS_TOKEN}"):
+        raise HTTPException(status_code=404, detail="Not found")
+    return tracer.render_metrics()
+
+
 # --- Auth ---
 
 @api.get("/integrations/github/oauth2/callback")
@@ -52,7 +98,7 @@ def integrations_github_oauth2_callback(code: str) -> RedirectResponse:
         raise HTTPException(status_code=400, detail=f"GitHub token exchange failed: {data}")
     access_token = data["access_token"]
 
-    github_user = requests.get("https://api.github.com/user", headers={
+    github_user = requests.get(f"{GITHUB_API_URL}/user", headers={
         "Authorization": f"Bearer {access_token}"
     }).json()
 
@@ -66,6 +112,8 @@ def integrations_github_oauth2_callback(code: str) -> RedirectResponse:
         session.commit()
         session.refresh(user)
         user_id = user.id
+    # Cached webhook routes carry the user's token.
+    invalidate_user_webhook_routes(user_id)
 
     session_token = create_session_token(user_id)
     frontend_is_https = FRONTEND_ORIGIN.startswith("https://")
@@ -96,7 +144,7 @@ def get_github_repos(request: Request) -> list[str]:
     user_id = get_current_user_id(request)
     with Session(engine) as session:
         user = get_user(session, user_id)
-    response = requests.get("https://api.github.com/user/repos?per_page=100", headers={
+    response = requests.get(f"{GITHUB_API_URL}/user/repos?per_page=100", headers={
         "Authorization": f"Bearer {user.github_token}"
     })
     repos = response.json()
@@ -112,7 +160,7 @@ def get_github_app_installed(request: Request) -> dict:
         user = get_user(session, user_id)
     if not GITHUB_APP_SLUG:
         return {"installed": True}
-    response = requests.get("https://api.github.com/user/installations", headers={
+    response = requests.get(f"{GITHUB_API_URL}/user/installations", headers={
         "Authorization": f"Bearer {user.github_token}",
         "Accept": "application/vnd.github+json",
     })
@@ -169,6 +217,16 @@ async def send_message(request: Request, website_entry_id: int, is_fix_action: b
     with Session(engine) as session:
         entry = get_owned_entry(session, user_id, website_entry_id)
         user = get_user(session, user_id)
+        if active := get_active_run(website_entry_id):
+            raise HTTPException(status_code=409, detail=f"A run is already in progress: {active.id}")
+        if count_active_runs(user_id) >= USER_MAX_CONCURRENT_RUNS:
+            raise HTTPException(
+                status_code=429,
+                detail=f"You already have {USER_MAX_CONCURRENT_RUNS} runs in progress",
+                headers={"Retry-After": "30"},
+            )
+        if retry_after := take_run_token(user_id, website_entry_id):
+            raise HTTPException(status_code=429, detail="Too many runs, slow down", headers={"Retry-After": str(retry_after)})
         website_url = entry.website_url
         repo_name = entry.repo_name
         github_token = user.github_token
@@ -181,20 +239,44 @@ async def send_message(request: Request, website_entry_id: int, is_fix_action: b
         ).all()
         message_history = [(msg.role, msg.content) for msg in msgs]
 
-    messages = [
-        AIMessage(content) if role == "ai" else HumanMessage(content)
-        for role, content in message_history
-    ]
+    # The job row makes the run durable: its graph checkpoints are keyed by run_id, and a run
+    # whose container dies is picked up by the scheduler's recovery pass and resumed.
+    job = AgentJob(run_id=uuid.uuid4().hex, kind="message", website_entry_id=website_entry_id, user_id=user_id, is_fix_action=is_fix_action)
+    create_job(engine, job)
+    payload = build_payload(message_history, website_url, repo_name, website_entry_id, github_token, is_fix_action, job.run_id)
+
+    # The run is owned by the run registry rather than this response, so it survives the
+    # client disconnecting and can be resumed through /runs/{run_id}/events.
+    run = start_run(
+        website_entry_id, user_id, is_fix_action,
+        run_job(engine, job.run_id, stream_agent_run(payload, engine)),
+        lambda content: save_answer(engine, job, content),
+        job.run_id,
+    )
+    return StreamingResponse(sse_events(run), media_type="text/event-stream", headers={"X-Run-Id": run.id})
+
+
+# --- Runs ---
+
+@api.get("/runs/active")
+def get_active_run_for_entry(request: Request, website_entry_id: int) -> ActiveRunResponse:
+    user_id = get_current_user_id(request)
+    with Session(engine) as session:
+        get_owned_entry(session, user_id, website_entry_id)
+    run = get_active_run(website_entry_id)
+    return ActiveRunResponse(runId=run.id if run else None, isFixAction=run.is_fix_action if run else False)
 
-    async def event_generator():
-        async for event in run_agent(messages, website_url, repo_name, engine, website_entry_id, github_token, is_fix_action):
-            if event["type"] == "done":
-                with Session(engine) as session:
-                    session.add(Message(website_entry_id=website_entry_id, role="ai", content=event["content"]))
-                    session.commit()
-            yield f"data: {json.dumps(event)}\n\n"
 
-    return StreamingResponse(event_generator(), media_type="text/event-stream")
+@api.get("/runs/{run_id}/events")
+async def get_run_events(request: Request, run_id: str, last_event_id: int = 0):
+    user_id = get_current_user_id(request)
+    run = get_run(run_id)
+    if not run or run.user_id != user_id:
+        raise HTTPException(status_code=404, detail="Run not found")
+    header_id = request.headers.get("Last-Event-ID", "")
+    if header_id.isdigit():
+        last_event_id = max(last_event_id, int(header_id))
+    return StreamingResponse(sse_events(run, last_event_id), media_type="text/event-stream")
 
 
 # --- Diagnostics ---
@@ -244,6 +326,8 @@ def get_verification_settings(request: Request, website_entry_id: int) -> Verifi
         webhookAuthHeaderValue=settings.webhook_auth_header_value,
         triggerKeyword=settings.trigger_keyword,
         webhookFormat=settings.webhook_format,
+        scheduleIntervalMinutes=settings.schedule_interval_minutes,
+        scheduleCron=settings.schedule_cron,
     )
 
 
@@ -262,6 +346,7 @@ def update_verification_settings(request: Request, website_entry_id: int, body:
             session.add(settings)
 
         was_enabled = settings.enabled
+        previous_webhook_id = settings.github_webhook_id
         settings.enabled = body.enabled
         settings.min_severity = body.minSeverity
         settings.auto_fix = body.autoFix
@@ -271,6 +356,13 @@ def update_verification_settings(request: Request, website_entry_id: int, body:
         settings.webhook_auth_header_value = body.webhookAuthHeaderValue
         settings.trigger_keyword = body.triggerKeyword
         settings.webhook_format = body.webhookFormat
+        settings.schedule_interval_minutes = max(body.scheduleIntervalMinutes, 0)
+        settings.schedule_cron = body.scheduleCron.strip()
+        try:
+            now = datetime.now(timezone.utc)
+            settings.next_run_at = compute_next_run(settings, now) if body.enabled else None
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid schedule: {e}")
 
         if not was_enabled and body.enabled:
             try:
@@ -288,10 +380,96 @@ def update_verification_settings(request: Request, website_entry_id: int, body:
             settings.github_webhook_secret = ""
 
         session.commit()
+        invalidate_webhook_route(previous_webhook_id)
+        invalidate_webhook_route(settings.github_webhook_id)
+
+
+# --- Batch verification ---
+
+@api.post("/verification/batch")
+async def verify_entries(request: Request, body: BatchVerificationRequest):
+    user_id = get_current_user_id(request)
+    with Session(engine) as session:
+        user = get_user(session, user_id)
+        for website_entry_id in body.websiteEntryIds or []:
+            get_owned_entry(session, user_id, website_entry_id)
+        github_token = user.github_token
+    if active := get_active_batch(user_id):
+        raise HTTPException(status_code=409, detail=f"A batch verification is already in progress: {active.id}")
+    # The batch is admitted once, as one run against the user's limits; its entries are not admitted one by one.
+    if count_active_runs(user_id) >= USER_MAX_CONCURRENT_RUNS:
+        raise HTTPException(
+            status_code=429,
+            detail=f"You already have {USER_MAX_CONCURRENT_RUNS} runs in progress",
+            headers={"Retry-After": "30"},
+        )
+    if retry_after := take_run_token(user_id, None):
+        raise HTTPException(status_code=429, detail="Too many runs, slow down", headers={"Retry-After": str(retry_after)})
+
+    # Like a single run, the batch outlives this response and can be resumed through /runs/{run_id}/events.
+    run_id = uuid.uuid4().hex
+    run = start_batch(user_id, run_batch(engine, user_id, github_token, run_id, body.websiteEntryIds), run_id)
+    return StreamingResponse(sse_events(run), media_type="text/event-stream", headers={"X-Run-Id": run.id})
 
 
 # --- Webhook ---
 
+class WebhookRoute(NamedTuple):
+    entry_id: int
+    user_id: int
+    github_token: str
+    repo_name: str
+    secret: str
+    trigger_keyword: str
+    paths_in_scope: str
+
+
+WEBHOOK_ROUTE_TTL_SECONDS = 300
+# Keyed by GitHub hook id. Each enabled entry registers its own hook, so a delivery's
+# X-GitHub-Hook-ID identifies exactly one settings row. The TTL bounds staleness across
+# containers, since invalidation only reaches the local process.
+webhook_routes: dict[int, tuple[float, WebhookRoute]] = {}
+
+
+def get_webhook_route(hook_id: int) -> WebhookRoute | None:
+    cached = webhook_routes.get(hook_id)
+    if cached and time.monotonic() - cached[0] < WEBHOOK_ROUTE_TTL_SECONDS:
+        return cached[1]
+    with Session(engine) as session:
+        row = session.exec(
+            select(VerificationSettings, WebsiteEntry, User)
+            .join(WebsiteEntry, WebsiteEntry.id == VerificationSettings.website_entry_id)
+            .join(User, User.id == WebsiteEntry.user_id)
+            .where(VerificationSettings.github_webhook_id == hook_id, VerificationSettings.enabled == True)
+        ).first()
+    if not row:
+        webhook_routes.pop(hook_id, None)
+        return None
+    settings, entry, user = row
+    route = WebhookRoute(
+        entry_id=entry.id,
+        user_id=entry.user_id,
+        github_token=user.github_token,
+        repo_name=entry.repo_name,
+        secret=settings.github_webhook_secret,
+        trigger_keyword=settings.trigger_keyword,
+        paths_in_scope=settings.paths_in_scope,
+    )
+    webhook_routes[hook_id] = (time.monotonic(), route)
+    return route
+
+
+def invalidate_webhook_route(hook_id: int | None) -> None:
+    if hook_id is not None:
+        webhook_routes.pop(hook_id, None)
+
+
+def invalidate_user_webhook_routes(user_id: int) -> None:
+    for hook_id, (_, route) in list(webhook_routes.items()):
+        if route.user_id == user_id:
+            webhook_routes.pop(hook_id, None)
+
+
 @api.post("/webhook/github")
 async def github_webhook(request: Request, background_tasks: BackgroundTasks):
     body = await request.body()
@@ -304,34 +482,35 @@ async def github_webhook(request: Request, background_tasks: BackgroundTasks):
     if not repo_name:
         return {"ok": True}
 
+    try:
+        hook_id = int(request.headers.get("X-GitHub-Hook-ID", ""))
+    except ValueError:
+        return {"ok": True}
+
+    route = get_webhook_route(hook_id)
+    if not route or not route.secret or route.repo_name != repo_name:
+        return {"ok": True}
+
+    sig_header = request.headers.get("X-Hub-Signature-256", "")
+    expected = "sha256=" + hmac.new(route.secret.encode(), body, hashlib.sha256).hexdigest()
+    if not hmac.compare_digest(sig_header, expected):
+        return {"ok": True}
+
     commits = payload.get("commits", [])
+    triggered = any(route.trigger_keyword in c.get("message", "") for c in commits)
+    if not triggered:
+        return {"ok": True}
 
-    with Session(engine) as session:
-        entries = session.exec(
-            select(WebsiteEntry).where(WebsiteEntry.repo_name == repo_name)
-        ).all()
+    patterns = parse_paths_in_scope(route.paths_in_scope)
+    changes = collect_changed_files(commits)
+    scoped_changes = filter_changes_in_scope(changes, patterns)
+    has_changes = any(scoped_changes.values())
+    # Only skip pushes known to touch nothing in scope; pushes without file info are analyzed in full below.
+    if patterns and any(changes.values()) and not has_changes:
+        return {"ok": True}
 
-        for entry in entries:
-            settings = session.exec(
-                select(VerificationSettings).where(
-                    VerificationSettings.website_entry_id == entry.id,
-                    VerificationSettings.enabled == True,
-                )
-            ).first()
-            if not settings or not settings.github_webhook_secret:
-                continue
-
-            sig_header = request.headers.get("X-Hub-Signature-256", "")
-            expected = "sha256=" + hmac.new(
-                settings.github_webhook_secret.encode(), body, hashlib.sha256
-            ).hexdigest()
-            if not hmac.compare_digest(sig_header, expected):
-                continue
-
-            triggered = any(settings.trigger_keyword in c.get("message", "") for c in commits)
-            if triggered:
-                user = session.get(User, entry.user_id)
-                if user:
-                    background_tasks.add_task(run_verification, entry.id, user.github_token, engine)
+    # Pushes without file info (e.g. empty commits) fall back to a full analysis.
+    manifest = format_change_manifest(scoped_changes, patterns) if has_changes else ""
+    background_tasks.add_task(run_verification, route.entry_id, route.github_token, engine, manifest)
 
     return {"ok": True}
@@ -0,0 +1,80 @@
+"""
+Schema upgrades for databases created by earlier versions. create_all only creates missing
+tables, so columns and indexes added to existing tables are added here. Every step checks the
+live schema first, so running this at each startup is safe.
+"""
+
+from sqlalchemy import Engine, delete, inspect, literal, text
+from sqlmodel import Session, SQLModel, select
+import logging
+
+from diagnostics import FINGERPRINT_VERSION, bucket_rows, canonicalize_diagnostic, diagnostic_fingerprint
+from models import Diagnostic, DiagnosticBucket
+
+logger = logging.getLogger(__name__)
+
+BACKFILL_BATCH = 500
+
+
+def add_column_ddl(engine: Engine, table_name: str, column) -> str:
+    ddl = f'ALTER TABLE "{table_name}" ADD COLUMN "{column.name}" {column.type.compile(dialect=engine.dialect)}'
+    default = column.default
+    # SQLite can only add a NOT NULL column with a constant default; callable defaults are backfilled instead.
+    if default is not None and default.is_scalar:
+        value = literal(default.arg, column.type).compile(dialect=engine.dialect, compile_kwargs={"literal_binds": True})
+        ddl += f" DEFAULT {value}" + ("" if column.nullable else " NOT NULL")
+    return ddl
+
+
+def upgrade_schema(engine: Engine) -> None:
+    SQLModel.metadata.create_all(engine)
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in SQLModel.metadata.sorted_tables:
+            existing = {c["name"] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                conn.execute(text(add_column_ddl(engine, table.name, column)))
+                if column.default is not None and column.default.is_callable:
+                    conn.execute(
+                        text(f'UPDATE "{table.name}" SET "{column.name}" = :value WHERE "{column.name}" IS NULL'),
+                        {"value": column.default.arg(None)},
+                    )
+                logger.info("Schema upgrade added column table=%s column=%s", table.name, column.name)
+            indexes = {i["name"] for i in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in indexes:
+                    if index.unique:
+                        # Rows written before the index existed may repeat its key; the newest one is kept.
+                        key = ", ".join(f'"{c.name}"' for c in index.columns)
+                        removed = conn.execute(text(
+                            f'DELETE FROM "{table.name}" WHERE "id" NOT IN (SELECT MAX("id") FROM "{table.name}" GROUP BY {key})'
+                        )).rowcount
+                        if removed:
+                            logger.info("Schema upgrade removed duplicates table=%s index=%s rows=%s", table.name, index.name, removed)
+                    index.create(conn)
+                    logger.info("Schema upgrade added index table=%s index=%s", table.name, index.name)
+    backfill_diagnostic_fingerprints(engine)
+
+
+def backfill_diagnostic_fingerprints(engine: Engine) -> None:
+    """
+    Fingerprint and bucket diagnostics stored before deduplication existed, or with an older
+    canonical form, so new reports are merged into them too.
+    """
+    updated = 0
+    with Session(engine) as session:
+        while diagnostics := session.exec(
+            select(Diagnostic).where(Diagnostic.fingerprint_version < FINGERPRINT_VERSION).limit(BACKFILL_BATCH)
+        ).all():
+            session.exec(delete(DiagnosticBucket).where(DiagnosticBucket.diagnostic_id.in_([d.id for d in diagnostics])))
+            for diagnostic in diagnostics:
+                canonical = canonicalize_diagnostic(diagnostic.short_desc)
+                diagnostic.fingerprint = diagnostic_fingerprint(diagnostic.severity, canonical)
+                diagnostic.fingerprint_version = FINGERPRINT_VERSION
+                session.add_all(bucket_rows(diagnostic, canonical))
+            session.commit()
+            updated += len(diagnostics)
+    if updated:
+        logger.info("Schema upgrade fingerprinted diagnostics count=%s", updated)
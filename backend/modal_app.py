@@ -8,7 +8,7 @@ image = (
     .pip_install(
         "fastapi[standard]", "sqlmodel", "requests", "python-dotenv",
         "langchain", "langchain-community", "langchain-openai",
-        "langchain-mcp-adapters", "langgraph", "playwright", "pyjwt"
+        "langchain-mcp-adapters", "langgraph", "playwright", "pyjwt", "numpy"
     )
     .run_commands("playwright install --with-deps chromium")
     .add_local_dir(str(API_DIR), remote_path="/root/api")
@@ -17,10 +17,7 @@ image = (
 db = modal.Volume.from_name("webster-db", create_if_missing=True)
 secrets = [modal.Secret.from_name("webster-secrets")]
 
-@app.function(image=image, volumes={"/data": db}, secrets=secrets, min_containers=1)
-@modal.concurrent(max_inputs=20)
-@modal.asgi_app(label="api")
-def fastapi_app():
+def prepare_environment() -> None:
     import os
     import sys
 
@@ -28,5 +25,27 @@ def fastapi_app():
         sys.path.insert(0, "/root/api")
 
     os.environ.setdefault("DATABASE_URL", "sqlite:////data/webster.db")
+
+
+@app.function(image=image, volumes={"/data": db}, secrets=secrets, min_containers=1)
+@modal.concurrent(max_inputs=20)
+@modal.asgi_app(label="api")
+def fastapi_app():
+    prepare_environment()
     from main import api
     return api
+
+
+# The agent tier: each container runs one agent (a browser plus an LLM loop) at a time and
+# scales independently of the API. The API dispatches here when AGENT_EXECUTOR=modal, which
+# requires DATABASE_URL to point at a networked database: the SQLite file on the volume can't
+# be shared, since each container commits its own copy and the last commit wins.
+@app.function(image=image, secrets=secrets, timeout=15 * 60, cpu=2.0, memory=4096)
+async def run_agent_job(payload: dict):
+    prepare_environment()
+    from constants import DATABASE_URL
+    if DATABASE_URL.startswith("sqlite"):
+        raise RuntimeError("run_agent_job needs a networked DATABASE_URL, not SQLite")
+    from workers import execute_payload
+    async for event in execute_payload(payload):
+        yield event
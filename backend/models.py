@@ -1,5 +1,7 @@
+from datetime import datetime, timezone
 from typing import Optional
 from pydantic import BaseModel
+from sqlalchemy import Index
 from sqlmodel import Field, SQLModel
 
 class User(SQLModel, table=True):
@@ -22,12 +24,25 @@ class Message(SQLModel, table=True):
     is_fix_action: bool = Field(default=False)
 
 class Diagnostic(SQLModel, table=True):
+    __table_args__ = (Index("ix_diagnostic_entry_fingerprint", "website_entry_id", "fingerprint"),)
     id: int = Field(primary_key=True)
     website_entry_id: int = Field(foreign_key="websiteentry.id")
     short_desc: str
     full_desc: str
     severity: str = Field(default="warning")
     dismissed: bool = Field(default=False)
+    fingerprint: str = Field(default="")
+    fingerprint_version: int = Field(default=0)  # diagnostics.FINGERPRINT_VERSION the fingerprint was computed with
+    occurrence_count: int = Field(default=1)
+    last_seen_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+class DiagnosticBucket(SQLModel, table=True):
+    # MinHash LSH buckets of a diagnostic's canonical description: near-duplicates share at least one.
+    __table_args__ = (Index("ix_diagnosticbucket_entry_bucket", "website_entry_id", "bucket"),)
+    id: int = Field(primary_key=True)
+    diagnostic_id: int = Field(foreign_key="diagnostic.id")
+    website_entry_id: int = Field(foreign_key="websiteentry.id")
+    bucket: str
 
 class VerificationSettings(SQLModel, table=True):
     id: int = Field(primary_key=True)
@@ -40,9 +55,82 @@ class VerificationSettings(SQLModel, table=True):
     webhook_auth_header_key: str = Field(default="")
     webhook_auth_header_value: str = Field(default="")
     trigger_keyword: str = Field(default="[webster]")
-    github_webhook_id: Optional[int] = Field(default=None, nullable=True)
+    github_webhook_id: Optional[int] = Field(default=None, nullable=True, index=True)
     github_webhook_secret: str = Field(default="")
     webhook_format: str = Field(default="json")
+    schedule_interval_minutes: int = Field(default=0)
+    schedule_cron: str = Field(default="")
+    next_run_at: Optional[datetime] = Field(default=None, nullable=True, index=True)
+    last_content_hash: str = Field(default="")
+    last_verified_at: Optional[datetime] = Field(default=None, nullable=True)  # last scheduled run that wasn't skipped
+
+class PageSnapshot(SQLModel, table=True):
+    id: int = Field(primary_key=True)
+    website_entry_id: int = Field(foreign_key="websiteentry.id", index=True)
+    url: str
+    chunk_hashes: str = Field(default="")  # newline-separated SnapshotChunk hashes, in page order
+    metadata_json: str = Field(default="{}")
+    dom_hash: str = Field(default="")
+    updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+class SnapshotChunk(SQLModel, table=True):
+    hash: str = Field(primary_key=True)  # sha256 of the section text, shared across pages and entries
+    data: bytes  # zlib-compressed section text
+    last_used_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc), index=True)  # last saved in a snapshot
+
+class VisualSnapshot(SQLModel, table=True):
+    # One baseline per page and viewport; concurrent runs upsert it (visual.save_visual_snapshot).
+    __table_args__ = (Index("ux_visualsnapshot_entry_url_device", "website_entry_id", "url", "device", unique=True),)
+
+    id: int = Field(primary_key=True)
+    website_entry_id: int = Field(foreign_key="websiteentry.id", index=True)
+    url: str
+    device: str  # viewport name from viewports.DEVICES, or "default" for the agent's own browser context
+    width: int  # stored pixels, after downscaling
+    height: int
+    scale: float  # CSS pixels per stored pixel
+    phash: str  # 64-bit perceptual hash, hex
+    pixels_hash: str  # sha256 of the stored pixels
+    data: bytes  # zlib-compressed 8-bit grayscale pixels
+    updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+class AgentCheckpoint(SQLModel, table=True):
+    id: int = Field(primary_key=True)
+    thread_id: str = Field(index=True)  # the agent run id
+    checkpoint_ns: str = Field(default="")
+    checkpoint_id: str = Field(index=True)
+    parent_checkpoint_id: Optional[str] = Field(default=None, nullable=True)
+    checkpoint_type: str
+    checkpoint: bytes
+    metadata_type: str
+    metadata_blob: bytes
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+class AgentCheckpointWrite(SQLModel, table=True):
+    id: int = Field(primary_key=True)
+    thread_id: str = Field(index=True)
+    checkpoint_ns: str = Field(default="")
+    checkpoint_id: str = Field(index=True)
+    task_id: str
+    task_path: str = Field(default="")
+    idx: int
+    channel: str = Field(default="")
+    value_type: str = Field(default="")
+    value: bytes = Field(default=b"")
+
+class AgentJob(SQLModel, table=True):
+    run_id: str = Field(primary_key=True)
+    kind: str  # "message" (save the answer as an AI message) or "verification"
+    website_entry_id: int = Field(foreign_key="websiteentry.id", index=True)
+    user_id: int = Field(foreign_key="user.id")
+    is_fix_action: bool = Field(default=False)
+    is_automated: bool = Field(default=False)
+    change_manifest: str = Field(default="")
+    baseline_diagnostic_id: int = Field(default=0)
+    budget_limits_json: str = Field(default="{}")  # RunBudget overrides, e.g. a batch entry's token reservation
+    status: str = Field(default="running", index=True)  # "running", "done" or "failed"
+    attempts: int = Field(default=1)
+    heartbeat_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
 class MessageResponse(BaseModel):
     role: str
@@ -53,6 +141,14 @@ class MessageResponse(BaseModel):
 class SendMessageRequest(BaseModel):
     content: str
 
+class BatchVerificationRequest(BaseModel):
+    # All of the user's entries when omitted.
+    websiteEntryIds: Optional[list[int]] = None
+
+class ActiveRunResponse(BaseModel):
+    runId: Optional[str]
+    isFixAction: bool = False
+
 class WebsiteEntryResponse(BaseModel):
     websiteEntryId: int
     websiteUrl: str
@@ -79,6 +175,8 @@ class VerificationSettingsResponse(BaseModel):
     webhookAuthHeaderValue: str
     triggerKeyword: str
     webhookFormat: str
+    scheduleIntervalMinutes: int = 0
+    scheduleCron: str = ""
 
 class UpdateVerificationSettingsRequest(BaseModel):
     enabled: bool
@@ -90,3 +188,5 @@ class UpdateVerificationSettingsRequest(BaseModel):
     webhookAuthHeaderValue: str
     triggerKeyword: str
     webhookFormat: str
+    scheduleIntervalMinutes: int = 0
+    scheduleCron: str = ""
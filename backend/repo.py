@@ -0,0 +1,257 @@
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from fnmatch import fnmatch
+from http.cookiejar import DefaultCookiePolicy
+from typing import NamedTuple
+import base64
+import hashlib
+import logging
+import re
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+
+from constants import GITHUB_API_URL, REPO_BLOB_CACHE_BYTES, REPO_REF_TTL_SECONDS
+from tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+MAX_SEARCHABLE_BLOB_BYTES = 200_000
+MAX_SEARCH_FILES = 400
+FETCH_WORKERS = 8
+
+
+class TreeEntry(NamedTuple):
+    path: str
+    sha: str
+    size: int
+    mode: str = "100644"
+
+
+class RepoTree(NamedTuple):
+    commit_sha: str
+    tree_sha: str
+    files: dict[str, TreeEntry]
+    truncated: bool
+
+
+# Commits and blobs are immutable, so trees are cached per commit SHA and blobs per blob SHA
+# (unchanged files are shared across commits). Only ref -> commit resolution can go stale.
+# Resolutions are cached per token, and every tree lookup goes through one, so the shared tree
+# and blob caches only serve repos that GitHub recently confirmed the caller's token can read.
+refs: dict[tuple[str, str, str], tuple[str, float]] = {}
+trees: OrderedDict[tuple[str, str], RepoTree] = OrderedDict()
+blobs: OrderedDict[str, str | None] = OrderedDict()
+blob_bytes = 0
+MAX_CACHED_TREES = 32
+MAX_CACHED_REFS = 4096
+# The repo tools run in worker threads, and read_blobs fetches from a thread pool.
+cache_lock = threading.Lock()
+
+# One pooled session for every GitHub REST call in the process, so concurrent runs (and the blob
+# fetch workers) reuse kept-alive TLS connections instead of opening one per request. The session
+# serves every user's token, so it keeps no cookies: one set for a user's request would be sent with the next user's.
+github_http = requests.Session()
+github_http.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+github_http.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=FETCH_WORKERS * 4))
+
+
+def gh_get(path: str, github_token: str, **kwargs) -> requests.Response:
+    headers = {"Authorization": f"Bearer {github_token}", "Accept": "application/vnd.github+json"}
+    headers.update(kwargs.pop("headers", {}))
+    return github_http.get(f"{GITHUB_API_URL}{path}", headers=headers, timeout=15, **kwargs)
+
+
+def gh_send(method: str, path: str, github_token: str, body: dict) -> dict:
+    headers = {"Authorization": f"Bearer {github_token}", "Accept": "application/vnd.github+json"}
+    resp = github_http.request(method, f"{GITHUB_API_URL}{path}", headers=headers, json=body, timeout=15)
+    if not resp.ok:
+        raise RuntimeError(f"{method} {path} failed: {resp.status_code} {resp.text}")
+    return resp.json()
+
+
+def git_blob_sha(data: bytes) -> str:
+    return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+
+def token_key(github_token: str) -> str:
+    return hashlib.sha256(github_token.encode("utf-8")).hexdigest()
+
+
+def remember_ref(repo: str, ref: str, sha: str, github_token: str) -> None:
+    with cache_lock:
+        now = time.monotonic()
+        if len(refs) >= MAX_CACHED_REFS:
+            for item in [item for item, (_, resolved_at) in refs.items() if now - resolved_at >= REPO_REF_TTL_SECONDS]:
+                del refs[item]
+        refs[(token_key(github_token), repo, ref)] = (sha, now)
+
+
+def resolve_ref(repo: str, ref: str, github_token: str) -> str:
+    """
+    Resolve a branch, tag, HEAD or commit SHA to a commit SHA with the caller's token, which also
+    checks that the token can read the repo. Refs this token resolved recently cost no API call.
+    """
+    ref = ref or "HEAD"
+    with cache_lock:
+        cached = refs.get((token_key(github_token), repo, ref))
+    if cached and time.monotonic() - cached[1] < REPO_REF_TTL_SECONDS:
+        tracer.increment("webster_repo_cache_total", "ref_hit")
+        return cached[0]
+    tracer.increment("webster_repo_cache_total", "ref_miss")
+    resp = gh_get(f"/repos/{repo}/commits/{ref}", github_token, headers={"Accept": "application/vnd.github.sha"})
+    resp.raise_for_status()
+    sha = resp.text.strip()
+    remember_ref(repo, ref, sha, github_token)
+    return sha
+
+
+def get_tree(repo: str, ref: str, github_token: str) -> RepoTree:
+    with tracer.span("repo.tree", repo=repo) as span:
+        commit_sha = resolve_ref(repo, ref, github_token)
+        key = (repo, commit_sha)
+        with cache_lock:
+            cached = trees.get(key)
+            if cached:
+                trees.move_to_end(key)
+        span.attributes["cache"] = "hit" if cached else "miss"
+        tracer.increment("webster_repo_cache_total", f"tree_{span.attributes['cache']}")
+        return cached or fetch_tree(repo, commit_sha, github_token)
+
+
+def fetch_tree(repo: str, commit_sha: str, github_token: str) -> RepoTree:
+    key = (repo, commit_sha)
+    start = time.time()
+    resp = gh_get(f"/repos/{repo}/git/trees/{commit_sha}", github_token, params={"recursive": "1"})
+    resp.raise_for_status()
+    data = resp.json()
+    files = {
+        item["path"]: TreeEntry(item["path"], item["sha"], item.get("size", 0), item["mode"])
+        for item in data["tree"]
+        if item["type"] == "blob"
+    }
+    tree = RepoTree(commit_sha, data["sha"], files, data.get("truncated", False))
+    with cache_lock:
+        trees[key] = tree
+        if len(trees) > MAX_CACHED_TREES:
+            trees.popitem(last=False)
+    logger.info(
+        "Fetched repo tree repo=%s commit=%s files=%s truncated=%s elapsed_ms=%s",
+        repo,
+        commit_sha,
+        len(files),
+        tree.truncated,
+        int((time.time() - start) * 1000),
+    )
+    return tree
+
+
+def cache_blob(sha: str, text: str | None) -> None:
+    global blob_bytes
+    with cache_lock:
+        if sha in blobs:
+            blob_bytes -= len(blobs.pop(sha) or "")
+        blobs[sha] = text
+        blob_bytes += len(text or "")
+        while blob_bytes > REPO_BLOB_CACHE_BYTES and len(blobs) > 1:
+            _, evicted = blobs.popitem(last=False)
+            blob_bytes -= len(evicted or "")
+
+
+def fetch_blob(repo: str, sha: str, github_token: str) -> str | None:
+    resp = gh_get(f"/repos/{repo}/git/blobs/{sha}", github_token)
+    resp.raise_for_status()
+    raw = base64.b64decode(resp.json()["content"])
+    try:
+        return raw.decode("utf-8")
+    except UnicodeDecodeError:
+        return None  # binary file
+
+
+def read_blobs(repo: str, entries: list[TreeEntry], github_token: str) -> dict[str, str | None]:
+    """Return the text of each entry keyed by path (None for binary files), fetching missing blobs in parallel."""
+    with cache_lock:
+        found = {e.sha: blobs[e.sha] for e in entries if e.sha in blobs}
+    missing = list({e.sha for e in entries if e.sha not in found})
+    with tracer.span("repo.blobs", repo=repo, hits=len(found), misses=len(missing)):
+        tracer.increment("webster_repo_cache_total", "blob_hit", len(found))
+        tracer.increment("webster_repo_cache_total", "blob_miss", len(missing))
+        if missing:
+            with ThreadPoolExecutor(max_workers=FETCH_WORKERS) as pool:
+                for sha, text in zip(missing, pool.map(lambda s: fetch_blob(repo, s, github_token), missing)):
+                    cache_blob(sha, text)
+                    # Kept for this call even if a batch larger than the cache evicts it again.
+                    found[sha] = text
+            logger.info("Fetched repo blobs repo=%s count=%s cached_bytes=%s", repo, len(missing), blob_bytes)
+    return {entry.path: found[entry.sha] for entry in entries}
+
+
+def list_files(tree: RepoTree, prefix: str = "", pattern: str = "") -> list[TreeEntry]:
+    prefix = prefix.strip("/")
+    return [
+        e for path, e in sorted(tree.files.items())
+        if (not prefix or path == prefix or path.startswith(prefix + "/"))
+        and (not pattern or fnmatch(path, pattern) or fnmatch(path.rsplit("/", 1)[-1], pattern))
+    ]
+
+
+def search_files(repo: str, tree: RepoTree, regex: str, github_token: str, pattern: str = "", max_matches: int = 50) -> tuple[list[str], int]:
+    """Grep the text files of a tree. Returns 'path:line: text' matches and the number of files searched."""
+    compiled = re.compile(regex, re.IGNORECASE)
+    candidates = [e for e in list_files(tree, pattern=pattern) if e.size <= MAX_SEARCHABLE_BLOB_BYTES][:MAX_SEARCH_FILES]
+    matches = []
+    for path, text in read_blobs(repo, candidates, github_token).items():
+        if text is None:
+            continue
+        for number, line in enumerate(text.splitlines(), start=1):
+            if compiled.search(line):
+                matches.append(f"{path}:{number}: {line.strip()[:200]}")
+                if len(matches) >= max_matches:
+                    return matches, len(candidates)
+    return matches, len(candidates)
+
+
+def commit_files(repo: str, branch: str, message: str, files: dict[str, str], deletions: list[str], github_token: str) -> tuple[str, list[str]]:
+    """
+    Write several files and deletions to a branch as one commit through the Git Data API.
+    Files whose content already matches the branch are skipped. Returns the new commit SHA
+    (or the unchanged head if nothing changed) and the paths that were actually changed.
+    """
+    ref = gh_get(f"/repos/{repo}/git/ref/heads/{branch}", github_token)
+    if not ref.ok:
+        raise RuntimeError(f"branch '{branch}' not found: {ref.status_code} {ref.text}")
+    head_sha = ref.json()["object"]["sha"]
+    # Reading the branch already checked this token's access, so the tree lookup needs no second check.
+    remember_ref(repo, head_sha, head_sha, github_token)
+    tree = get_tree(repo, head_sha, github_token)
+
+    changed = {}
+    for path, content in files.items():
+        path = path.strip("/")
+        existing = tree.files.get(path)
+        if not existing or existing.sha != git_blob_sha(content.encode("utf-8")):
+            changed[path] = content
+    removed = [p.strip("/") for p in deletions if p.strip("/") in tree.files]
+    if not changed and not removed:
+        return head_sha, []
+
+    def create_blob(content: str) -> str:
+        return gh_send("POST", f"/repos/{repo}/git/blobs", github_token, {"content": content, "encoding": "utf-8"})["sha"]
+
+    with ThreadPoolExecutor(max_workers=FETCH_WORKERS) as pool:
+        blob_shas = dict(zip(changed, pool.map(create_blob, changed.values())))
+    for path, sha in blob_shas.items():
+        cache_blob(sha, changed[path])
+
+    entries = [
+        {"path": path, "mode": tree.files[path].mode if path in tree.files else "100644", "type": "blob", "sha": sha}
+        for path, sha in blob_shas.items()
+    ]
+    entries += [{"path": path, "mode": tree.files[path].mode, "type": "blob", "sha": None} for path in removed]
+    new_tree = gh_send("POST", f"/repos/{repo}/git/trees", github_token, {"base_tree": tree.tree_sha, "tree": entries})
+    commit = gh_send("POST", f"/repos/{repo}/git/commits", github_token, {"message": message, "tree": new_tree["sha"], "parents": [head_sha]})
+    # Not forced: if the branch moved since it was read, GitHub rejects the update instead of dropping commits.
+    gh_send("PATCH", f"/repos/{repo}/git/refs/heads/{branch}", github_token, {"sha": commit["sha"], "force": False})
+    remember_ref(repo, branch, commit["sha"], github_token)
+    return commit["sha"], list(blob_shas) + removed
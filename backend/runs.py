@@ -0,0 +1,131 @@
+from collections import deque
+from typing import AsyncIterator, Callable
+import asyncio
+import json
+import logging
+import time
+import uuid
+
+from constants import RUN_EVENT_BUFFER_SIZE, RUN_RETENTION_SECONDS
+
+logger = logging.getLogger(__name__)
+
+
+class AgentRun:
+    """
+    An agent run decoupled from any HTTP connection, with a bounded buffer of its progress events.
+    Batch runs, which verify several of a user's entries, have no website_entry_id.
+    """
+
+    def __init__(self, website_entry_id: int | None, user_id: int, is_fix_action: bool, run_id: str | None = None):
+        self.id = run_id or uuid.uuid4().hex
+        self.website_entry_id = website_entry_id
+        self.user_id = user_id
+        self.is_fix_action = is_fix_action
+        self.events: deque[tuple[int, dict]] = deque(maxlen=RUN_EVENT_BUFFER_SIZE)
+        self.last_event_id = 0
+        self.finished_at: float | None = None
+        self.changed = asyncio.Condition()
+        self.task: asyncio.Task | None = None
+
+    @property
+    def finished(self) -> bool:
+        return self.finished_at is not None
+
+    async def publish(self, event: dict) -> None:
+        async with self.changed:
+            self.last_event_id += 1
+            self.events.append((self.last_event_id, event))
+            self.changed.notify_all()
+
+    async def finish(self) -> None:
+        async with self.changed:
+            self.finished_at = time.monotonic()
+            self.changed.notify_all()
+
+    async def stream(self, last_event_id: int = 0) -> AsyncIterator[tuple[int, dict]]:
+        # Events older than the ring buffer are dropped; resuming clients get the oldest retained event onward.
+        while True:
+            async with self.changed:
+                pending = [(i, e) for i, e in self.events if i > last_event_id]
+                if not pending:
+                    if self.finished:
+                        return
+                    await self.changed.wait()
+                    continue
+            for event_id, event in pending:
+                yield event_id, event
+                last_event_id = event_id
+
+
+runs: dict[str, AgentRun] = {}
+active_runs: dict[int, str] = {}
+active_batches: dict[int, str] = {}
+
+
+def get_run(run_id: str) -> AgentRun | None:
+    return runs.get(run_id)
+
+
+def get_active_run(website_entry_id: int) -> AgentRun | None:
+    run_id = active_runs.get(website_entry_id)
+    return runs.get(run_id) if run_id else None
+
+
+def get_active_batch(user_id: int) -> AgentRun | None:
+    run_id = active_batches.get(user_id)
+    return runs.get(run_id) if run_id else None
+
+
+def count_active_runs(user_id: int) -> int:
+    """The user's runs in progress. A batch counts as one run, however many of its entries are running."""
+    run_ids = set(active_runs.values()) | set(active_batches.values())
+    return sum(1 for run_id in run_ids if runs[run_id].user_id == user_id)
+
+
+def prune_runs() -> None:
+    now = time.monotonic()
+    for run_id, run in list(runs.items()):
+        if run.finished and now - run.finished_at > RUN_RETENTION_SECONDS:
+            del runs[run_id]
+
+
+async def drive_run(run: AgentRun, events: AsyncIterator[dict], on_done: Callable[[str], None]) -> None:
+    try:
+        await run.publish({"type": "run", "run_id": run.id})
+        async for event in events:
+            if event["type"] == "done":
+                on_done(event["content"])
+            await run.publish(event)
+    except Exception as e:
+        logger.exception("Agent run failed run_id=%s website_entry_id=%s", run.id, run.website_entry_id)
+        await run.publish({"type": "error", "message": str(e)})
+    finally:
+        if active_runs.get(run.website_entry_id) == run.id:
+            del active_runs[run.website_entry_id]
+        if run.website_entry_id is None and active_batches.get(run.user_id) == run.id:
+            del active_batches[run.user_id]
+        await run.finish()
+
+
+def start_run(website_entry_id: int, user_id: int, is_fix_action: bool, events: AsyncIterator[dict], on_done: Callable[[str], None], run_id: str | None = None) -> AgentRun:
+    prune_runs()
+    run = AgentRun(website_entry_id, user_id, is_fix_action, run_id)
+    runs[run.id] = run
+    active_runs[website_entry_id] = run.id
+    run.task = asyncio.create_task(drive_run(run, events, on_done))
+    return run
+
+
+def start_batch(user_id: int, events: AsyncIterator[dict], run_id: str | None = None) -> AgentRun:
+    prune_runs()
+    run = AgentRun(None, user_id, False, run_id)
+    runs[run.id] = run
+    active_batches[user_id] = run.id
+    run.task = asyncio.create_task(drive_run(run, events, lambda content: None))
+    return run
+
+
+async def sse_events(run: AgentRun, last_event_id: int = 0) -> AsyncIterator[str]:
+    async for event_id, event in run.stream(last_event_id):
+        yield f"id: {event_id}\ndata: {json.dumps(event)}\n\n"
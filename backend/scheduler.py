@@ -0,0 +1,282 @@
+from bs4 import BeautifulSoup
+from datetime import datetime, timedelta, timezone
+from sqlmodel import Session, select, update
+from sqlalchemy import Engine
+from urllib.parse import urljoin
+import asyncio
+import hashlib
+import logging
+import requests
+import time
+
+from constants import SCHEDULER_BATCH_SIZE, SCHEDULER_MAX_JITTER_SECONDS, SCHEDULER_MAX_SKIP_SECONDS, SCHEDULER_TICK_SECONDS
+from jobs import claim_stale_jobs, job_budget_limits, prune_jobs, run_job, save_answer
+from models import AgentJob, PageSnapshot, User, VerificationSettings, WebsiteEntry
+from runs import get_active_run, start_run
+from snapshots import prune_chunks
+from verification import load_history, resume_verification, run_verification
+from workers import build_payload, stream_agent_run
+
+logger = logging.getLogger(__name__)
+
+CRON_FIELD_RANGES = [(0, 59), (0, 23), (1, 31), (1, 12), (0, 6)]
+# Markup whose text isn't visible and commonly differs on every request (nonces, inline state).
+INVISIBLE_TAGS = ["script", "style", "noscript", "template"]
+# Code and styles the pages load, whose changes (a new bundle, an updated CDN or third-party script)
+# don't show in the text.
+ASSET_SELECTOR = "script[src], link[rel~=stylesheet][href], link[rel~=modulepreload][href], link[rel~=preload][href]"
+# The change check reads the homepage and the pages verification runs read most recently, and the
+# assets they load. It is meant to stay far cheaper than a run.
+MAX_CHECKED_PAGES = 5
+MAX_CHECKED_ASSETS = 30
+
+
+def parse_cron_field(field: str, low: int, high: int) -> set[int]:
+    values: set[int] = set()
+    for part in field.split(","):
+        step = 1
+        if "/" in part:
+            part, step_str = part.split("/", 1)
+            step = int(step_str)
+        if part == "*":
+            start, end = low, high
+        elif "-" in part:
+            start_str, end_str = part.split("-", 1)
+            start, end = int(start_str), int(end_str)
+        else:
+            start = end = int(part)
+        if start < low or end > high or start > end or step < 1:
+            raise ValueError(f"Cron field '{field}' is out of range {low}-{high}")
+        values.update(range(start, end + 1, step))
+    return values
+
+
+def parse_cron(expr: str) -> list[set[int]]:
+    fields = expr.split()
+    if len(fields) != 5:
+        raise ValueError("Cron expressions need 5 fields: minute hour day-of-month month day-of-week")
+    return [parse_cron_field(f, low, high) for f, (low, high) in zip(fields, CRON_FIELD_RANGES)]
+
+
+def next_cron_time(expr: str, after: datetime) -> datetime:
+    minutes, hours, days, months, weekdays = parse_cron(expr)
+    _, _, day_field, _, weekday_field = expr.split()
+    # As in standard cron, when both day fields are restricted a day matching either one fires.
+    either_day = not day_field.startswith("*") and not weekday_field.startswith("*")
+    t = after.replace(second=0, microsecond=0) + timedelta(minutes=1)
+    limit = after + timedelta(days=366 * 4)
+    while t < limit:
+        # Python weekdays start on Monday, cron weekdays on Sunday.
+        day_matches, weekday_matches = t.day in days, (t.weekday() + 1) % 7 in weekdays
+        if t.month not in months or not (day_matches or weekday_matches if either_day else day_matches and weekday_matches):
+            t = (t + timedelta(days=1)).replace(hour=0, minute=0)
+        elif t.hour not in hours:
+            t = (t + timedelta(hours=1)).replace(minute=0)
+        elif t.minute not in minutes:
+            t += timedelta(minutes=1)
+        else:
+            return t
+    raise ValueError(f"Cron expression '{expr}' never fires")
+
+
+def schedule_jitter(entry_id: int, period: timedelta) -> timedelta:
+    # Deterministic per entry, so entries sharing a schedule are spread across the wheel
+    # instead of all firing on the same tick, while each entry keeps a stable cadence.
+    max_jitter = min(SCHEDULER_MAX_JITTER_SECONDS, int(period.total_seconds() * 0.1))
+    if max_jitter <= 0:
+        return timedelta()
+    digest = hashlib.sha256(str(entry_id).encode()).digest()
+    return timedelta(seconds=int.from_bytes(digest[:4], "big") % max_jitter)
+
+
+def compute_next_run(settings: VerificationSettings, after: datetime) -> datetime | None:
+    if settings.schedule_cron:
+        first = next_cron_time(settings.schedule_cron, after)
+        period = next_cron_time(settings.schedule_cron, first) - first
+        return first + schedule_jitter(settings.website_entry_id, period)
+    if settings.schedule_interval_minutes > 0:
+        period = timedelta(minutes=settings.schedule_interval_minutes)
+        return after + period + schedule_jitter(settings.website_entry_id, period)
+    return None
+
+
+def page_content(html: bytes, page_url: str) -> tuple[str, list[str]]:
+    """
+    A page's visible text and the URLs of the scripts and stylesheets it loads. Inline scripts
+    and styles are left out, so per-request markup like nonces and CSRF tokens isn't a change.
+    """
+    soup = BeautifulSoup(html, "html.parser")
+    assets = sorted({urljoin(page_url, element.get("src") or element.get("href")) for element in soup.select(ASSET_SELECTOR)})
+    for element in soup(INVISIBLE_TAGS):
+        element.decompose()
+    return " ".join(soup.get_text(" ").split()), assets
+
+
+def asset_version(url: str) -> str:
+    """What identifies the asset's current content: its validators, or a hash of the body when it sends none."""
+    try:
+        response = requests.head(url, timeout=10, allow_redirects=True)
+        if version := response.headers.get("etag") or response.headers.get("last-modified"):
+            return version
+        response = requests.get(url, timeout=15)
+        return f"{response.status_code}:{hashlib.sha256(response.content).hexdigest()}"
+    except requests.RequestException as e:
+        return f"error:{type(e).__name__}"
+
+
+def fetch_content_hash(website_url: str, page_urls: list[str]) -> str:
+    """Hash of the checked pages' visible text and of the versions of the assets they load."""
+    digest = hashlib.sha256()
+    assets: set[str] = set()
+    for url in [website_url, *[u for u in page_urls if u != website_url]][:MAX_CHECKED_PAGES]:
+        try:
+            response = requests.get(url, timeout=15)
+        except requests.RequestException as e:
+            if url == website_url:
+                raise
+            digest.update(f"{url}\nerror:{type(e).__name__}\n".encode("utf-8"))
+            continue
+        if url == website_url:
+            response.raise_for_status()
+        text, page_assets = page_content(response.content, str(response.url))
+        digest.update(f"{url}\n{response.status_code}\n{text}\n".encode("utf-8"))
+        assets.update(page_assets)
+    for asset in sorted(assets)[:MAX_CHECKED_ASSETS]:
+        digest.update(f"{asset}\n{asset_version(asset)}\n".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def should_skip(content_hash: str, last_content_hash: str, last_verified_at: datetime | None, now: datetime) -> bool:
+    """Whether a scheduled run can be skipped: nothing it checks changed, and a full run isn't due anyway."""
+    if not content_hash or content_hash != last_content_hash or last_verified_at is None:
+        return False
+    # SQLite hands datetimes back without their timezone; they are stored in UTC.
+    if last_verified_at.tzinfo is None:
+        last_verified_at = last_verified_at.replace(tzinfo=timezone.utc)
+    return now - last_verified_at < timedelta(seconds=SCHEDULER_MAX_SKIP_SECONDS)
+
+
+async def run_scheduled_verification(settings_id: int, engine: Engine) -> None:
+    with Session(engine) as session:
+        row = session.exec(
+            select(VerificationSettings, WebsiteEntry, User)
+            .join(WebsiteEntry, WebsiteEntry.id == VerificationSettings.website_entry_id)
+            .join(User, User.id == WebsiteEntry.user_id)
+            .where(VerificationSettings.id == settings_id)
+        ).first()
+        if not row:
+            return
+        settings, entry, user = row
+        entry_id = entry.id
+        website_url = entry.website_url
+        github_token = user.github_token
+        last_content_hash = settings.last_content_hash
+        last_verified_at = settings.last_verified_at
+        page_urls = list(session.exec(
+            select(PageSnapshot.url)
+            .where(PageSnapshot.website_entry_id == entry_id)
+            .order_by(PageSnapshot.updated_at.desc())
+            .limit(MAX_CHECKED_PAGES)
+        ).all())
+
+    start = time.time()
+    try:
+        content_hash = await asyncio.to_thread(fetch_content_hash, website_url, page_urls)
+    except Exception:
+        logger.exception("Scheduled verification could not fetch website_entry_id=%s url=%s", entry_id, website_url)
+        content_hash = ""
+    check_ms = int((time.time() - start) * 1000)
+    if should_skip(content_hash, last_content_hash, last_verified_at, datetime.now(timezone.utc)):
+        logger.info("Scheduled verification skipped website_entry_id=%s reason=unchanged check_ms=%s", entry_id, check_ms)
+        return
+
+    reason = "changed" if content_hash and content_hash != last_content_hash else "due" if content_hash else "unchecked"
+    logger.info("Scheduled verification start website_entry_id=%s reason=%s check_ms=%s", entry_id, reason, check_ms)
+    await run_verification(entry_id, github_token, engine)
+
+    with Session(engine) as session:
+        settings = session.get(VerificationSettings, settings_id)
+        if settings:
+            settings.last_content_hash = content_hash
+            settings.last_verified_at = datetime.now(timezone.utc)
+            session.commit()
+
+
+def claim_due_settings(engine: Engine, now: datetime) -> list[int]:
+    claimed = []
+    with Session(engine) as session:
+        due = session.exec(
+            select(VerificationSettings)
+            .where(
+                VerificationSettings.enabled == True,
+                VerificationSettings.next_run_at != None,
+                VerificationSettings.next_run_at <= now,
+            )
+            .order_by(VerificationSettings.next_run_at)
+            .limit(SCHEDULER_BATCH_SIZE)
+        ).all()
+        for settings in due:
+            try:
+                next_run_at = compute_next_run(settings, now)
+            except ValueError:
+                logger.warning("Invalid schedule for website_entry_id=%s, disabling it", settings.website_entry_id)
+                next_run_at = None
+            # Compare-and-set on next_run_at so only one scheduler claims a slot when
+            # several containers share the database.
+            result = session.exec(
+                update(VerificationSettings)
+                .where(VerificationSettings.id == settings.id, VerificationSettings.next_run_at == settings.next_run_at)
+                .values(next_run_at=next_run_at)
+            )
+            if result.rowcount == 1:
+                claimed.append(settings.id)
+        session.commit()
+    return claimed
+
+
+def recover_job(job: AgentJob, engine: Engine) -> asyncio.Task | None:
+    """Resume a run whose owner died. Its graph picks up from the last checkpoint."""
+    with Session(engine) as session:
+        row = session.exec(
+            select(WebsiteEntry, User).join(User, User.id == WebsiteEntry.user_id).where(WebsiteEntry.id == job.website_entry_id)
+        ).first()
+    if not row:
+        return None
+    entry, user = row
+    logger.info("Recovering agent job run_id=%s kind=%s website_entry_id=%s attempt=%s", job.run_id, job.kind, entry.id, job.attempts)
+    if job.kind == "verification":
+        return asyncio.create_task(resume_verification(job, user.github_token, engine))
+    if get_active_run(entry.id):
+        # Another run on this entry is streaming here; leave the job for a later pass.
+        return None
+    payload = build_payload(load_history(engine, entry.id), entry.website_url, entry.repo_name, entry.id, user.github_token, job.is_fix_action, job.run_id, job_budget_limits(job), is_automated=job.is_automated)
+    # Registered as the entry's active run, so a reopened chat reattaches to it through /runs/active.
+    run = start_run(
+        entry.id, job.user_id, job.is_fix_action,
+        run_job(engine, job.run_id, stream_agent_run(payload, engine)),
+        lambda content: save_answer(engine, job, content),
+        job.run_id,
+    )
+    return run.task
+
+
+async def run_scheduler(engine: Engine) -> None:
+    background: set[asyncio.Task] = set()
+    while True:
+        try:
+            now = datetime.now(timezone.utc)
+            prune_jobs(engine)
+            prune_chunks(engine)
+            for job in claim_stale_jobs(engine):
+                if task := recover_job(job, engine):
+                    background.add(task)
+                    task.add_done_callback(background.discard)
+            for settings_id in claim_due_settings(engine, now):
+                # run_verification shares its concurrency cap with webhook-triggered runs,
+                # so excess scheduled runs simply queue for a slot.
+                task = asyncio.create_task(run_scheduled_verification(settings_id, engine))
+                background.add(task)
+                task.add_done_callback(background.discard)
+        except Exception:
+            logger.exception("Scheduler tick failed")
+        await asyncio.sleep(SCHEDULER_TICK_SECONDS)
@@ -0,0 +1,104 @@
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from urllib.parse import urlparse
+import re
+
+STATIC_TYPES = {"script", "stylesheet", "image", "font", "media"}
+TEXT_TYPES = {"document", "script", "stylesheet", "xhr", "fetch"}
+MIN_STATIC_MAX_AGE = 60 * 60 * 24
+MIN_COMPRESSIBLE_BYTES = 1024
+TOP_N = 5
+
+
+@dataclass
+class ResourceRecord:
+    page: str
+    url: str
+    resource_type: str
+    status: int
+    size: int
+    headers: dict[str, str]
+    render_blocking: bool = False
+
+
+def is_third_party(url: str, website_host: str) -> bool:
+    host = urlparse(url).hostname or ""
+    return bool(website_host) and host != website_host and not host.endswith("." + website_host)
+
+
+def cache_lifetime(headers: dict[str, str]) -> int | None:
+    cache_control = headers.get("cache-control", "").lower()
+    if "no-store" in cache_control or "no-cache" in cache_control:
+        return 0
+    if match := re.search(r"(?:s-maxage|max-age)=(\d+)", cache_control):
+        return int(match.group(1))
+    return None
+
+
+def kb(size: int) -> str:
+    return f"{size / 1024:.0f} KB"
+
+
+def summarize_resources(records: list[ResourceRecord], pages: list[str], website_host: str) -> str:
+    """Aggregate network responses from several page loads into one compact report."""
+    total = sum(r.size for r in records)
+    by_type: dict[str, list[int]] = defaultdict(lambda: [0, 0])
+    for r in records:
+        by_type[r.resource_type][0] += 1
+        by_type[r.resource_type][1] += r.size
+
+    third_party: dict[str, int] = Counter()
+    for r in records:
+        if is_third_party(r.url, website_host):
+            third_party[urlparse(r.url).hostname or "?"] += r.size
+
+    uncompressed = {
+        r.url: r for r in records
+        if r.resource_type in TEXT_TYPES and r.size >= MIN_COMPRESSIBLE_BYTES and not r.headers.get("content-encoding")
+    }
+    poorly_cached = {}
+    for r in records:
+        if r.resource_type not in STATIC_TYPES or r.status != 200:
+            continue
+        lifetime = cache_lifetime(r.headers)
+        if lifetime is None and not (r.headers.get("etag") or r.headers.get("last-modified")):
+            poorly_cached[r.url] = "no Cache-Control, ETag or Last-Modified"
+        elif lifetime is not None and lifetime < MIN_STATIC_MAX_AGE:
+            poorly_cached[r.url] = f"max-age={lifetime}" if lifetime else "not cacheable"
+
+    # The same asset fetched under several URLs (cache-busting query strings) or several times on one page.
+    variants: dict[str, set[str]] = defaultdict(set)
+    per_page = Counter((r.page, r.url) for r in records)
+    for r in records:
+        parsed = urlparse(r.url)
+        variants[f"{parsed.scheme}://{parsed.netloc}{parsed.path}"].add(r.url)
+    duplicates = [f"{asset} ({len(urls)} URL variants)" for asset, urls in variants.items() if len(urls) > 1]
+    duplicates += [f"{url} (fetched {n}x on {page})" for (page, url), n in per_page.items() if n > 1]
+
+    blocking = sorted({r.url for r in records if r.render_blocking})
+    errors = sorted({f"{r.status} {r.url}" for r in records if r.status >= 400})
+
+    parts = [
+        f"Analyzed {len(pages)} pages, {len(records)} responses, {kb(total)} transferred "
+        f"(avg {kb(total // max(len(pages), 1))} per page).",
+        "By type: " + ", ".join(f"{t} {n} files/{kb(size)}" for t, (n, size) in sorted(by_type.items(), key=lambda i: -i[1][1])),
+    ]
+    heaviest = sorted({r.url: r for r in records}.values(), key=lambda r: -r.size)[:TOP_N]
+    parts.append("Heaviest: " + ", ".join(f"{r.url} ({kb(r.size)})" for r in heaviest))
+    if third_party:
+        parts.append(
+            f"Third-party: {kb(sum(third_party.values()))} from {len(third_party)} hosts ("
+            + ", ".join(f"{h} {kb(s)}" for h, s in third_party.most_common(TOP_N)) + ")"
+        )
+    sections = [
+        ("Uncompressed text responses", [f"{u} ({kb(r.size)})" for u, r in uncompressed.items()]),
+        ("Weak caching on static assets", [f"{u} ({why})" for u, why in poorly_cached.items()]),
+        ("Render-blocking resources", blocking),
+        ("Duplicate downloads", duplicates),
+        ("Failed responses", errors),
+    ]
+    for title, items in sections:
+        if items:
+            more = f" (+{len(items) - TOP_N} more)" if len(items) > TOP_N else ""
+            parts.append(f"{title} ({len(items)}){more}:\n" + "\n".join(f"- {i}" for i in items[:TOP_N]))
+    return "\n".join(parts)
@@ -0,0 +1,161 @@
+from datetime import datetime, timedelta, timezone
+from difflib import SequenceMatcher
+import hashlib
+import json
+import logging
+import time
+import zlib
+
+from sqlalchemy import Engine, delete, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlmodel import Session, select
+
+from models import PageSnapshot, SnapshotChunk
+
+logger = logging.getLogger(__name__)
+
+# Content-defined section boundaries: a section ends after a line whose hash hits the mask,
+# so an edit only changes the sections around it instead of shifting every later one.
+BOUNDARY_MASK = 0x7
+MAX_SECTION_CHARS = 1500
+# Chunks no snapshot references are deleted once they have been unused this long. The grace
+# period keeps a chunk that a snapshot being saved right now reuses from being pruned under it.
+CHUNK_RETENTION_SECONDS = 60 * 60 * 24
+CHUNK_PRUNE_INTERVAL_SECONDS = 60 * 60
+CHUNK_DELETE_BATCH = 500
+chunks_pruned_at = 0.0
+
+# Collects the element structure of the page (tag, depth, id and class) without any text,
+# so copy edits and structural changes can be told apart.
+DOM_SIGNATURE_SCRIPT = """
+() => {
+    const parts = [];
+    const walk = (el, depth) => {
+        parts.push(depth + el.tagName + (el.id ? '#' + el.id : '') + (el.classList.length ? '.' + [...el.classList].sort().join('.') : ''));
+        for (const child of el.children) walk(child, depth + 1);
+    };
+    if (document.body) walk(document.body, 0);
+    return parts.join('|');
+}
+"""
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def split_sections(text: str) -> list[str]:
+    sections, current, size = [], [], 0
+    for line in text.splitlines():
+        current.append(line)
+        size += len(line) + 1
+        if size >= MAX_SECTION_CHARS or int(hashlib.md5(line.encode("utf-8")).hexdigest()[:4], 16) & BOUNDARY_MASK == 0:
+            sections.append("\n".join(current))
+            current, size = [], 0
+    if current:
+        sections.append("\n".join(current))
+    return sections
+
+
+def insert_ignoring_duplicates(session: Session, model):
+    """INSERT that skips rows whose key already exists, e.g. one a concurrent run just inserted."""
+    dialect = postgresql if session.get_bind().dialect.name == "postgresql" else sqlite
+    return dialect.insert(model).on_conflict_do_nothing()
+
+
+def store_chunks(session: Session, sections: list[str]) -> list[str]:
+    """Store each section once, compressed and keyed by its hash. Returns the hashes in page order."""
+    hashes = [content_hash(s) for s in sections]
+    now = datetime.now(timezone.utc)
+    existing = set(session.exec(select(SnapshotChunk.hash).where(SnapshotChunk.hash.in_(hashes))).all())
+    new = {h: section for h, section in zip(hashes, sections) if h not in existing}
+    if new:
+        session.exec(insert_ignoring_duplicates(session, SnapshotChunk).values([
+            {"hash": h, "data": zlib.compress(section.encode("utf-8")), "last_used_at": now} for h, section in new.items()
+        ]))
+    if existing:
+        session.exec(update(SnapshotChunk).where(SnapshotChunk.hash.in_(existing)).values(last_used_at=now))
+    return hashes
+
+
+def prune_chunks(engine: Engine) -> None:
+    """Delete chunks that no snapshot references anymore. Runs at most once per CHUNK_PRUNE_INTERVAL_SECONDS."""
+    global chunks_pruned_at
+    if time.monotonic() - chunks_pruned_at < CHUNK_PRUNE_INTERVAL_SECONDS:
+        return
+    chunks_pruned_at = time.monotonic()
+    start = time.time()
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=CHUNK_RETENTION_SECONDS)
+    with Session(engine) as session:
+        unused = set(session.exec(select(SnapshotChunk.hash).where(SnapshotChunk.last_used_at < cutoff)).all())
+        if unused:
+            for chunk_hashes in session.exec(select(PageSnapshot.chunk_hashes)).all():
+                unused.difference_update(chunk_hashes.split("\n"))
+        unused = sorted(unused)
+        for i in range(0, len(unused), CHUNK_DELETE_BATCH):
+            # Re-checked at delete time: a snapshot saved since the scan has refreshed its chunks.
+            session.exec(delete(SnapshotChunk).where(
+                SnapshotChunk.hash.in_(unused[i:i + CHUNK_DELETE_BATCH]), SnapshotChunk.last_used_at < cutoff,
+            ))
+        session.commit()
+    logger.info("Snapshot chunks pruned count=%s elapsed_ms=%s", len(unused), int((time.time() - start) * 1000))
+
+
+def load_chunks(session: Session, hashes: list[str]) -> dict[str, str]:
+    chunks = session.exec(select(SnapshotChunk).where(SnapshotChunk.hash.in_(hashes))).all()
+    return {c.hash: zlib.decompress(c.data).decode("utf-8") for c in chunks}
+
+
+def get_snapshot(session: Session, website_entry_id: int, url: str) -> PageSnapshot | None:
+    return session.exec(
+        select(PageSnapshot).where(PageSnapshot.website_entry_id == website_entry_id, PageSnapshot.url == url)
+    ).first()
+
+
+def list_snapshot_urls(session: Session, website_entry_id: int) -> list[str]:
+    return list(session.exec(
+        select(PageSnapshot.url).where(PageSnapshot.website_entry_id == website_entry_id).order_by(PageSnapshot.url)
+    ).all())
+
+
+def save_snapshot(session: Session, website_entry_id: int, url: str, sections: list[str], metadata: dict, dom_hash: str) -> None:
+    hashes = store_chunks(session, sections)
+    snapshot = get_snapshot(session, website_entry_id, url) or PageSnapshot(website_entry_id=website_entry_id, url=url)
+    snapshot.chunk_hashes = "\n".join(hashes)
+    snapshot.metadata_json = json.dumps(metadata, sort_keys=True)
+    snapshot.dom_hash = dom_hash
+    snapshot.updated_at = datetime.now(timezone.utc)
+    session.add(snapshot)
+    session.commit()
+
+
+def diff_snapshot(session: Session, previous: PageSnapshot, sections: list[str], metadata: dict, dom_hash: str) -> str:
+    """Describe a page relative to its previous snapshot, quoting only the sections that changed."""
+    seen = previous.updated_at.strftime("%Y-%m-%d %H:%M UTC")
+    old_hashes = previous.chunk_hashes.split("\n") if previous.chunk_hashes else []
+    new_hashes = [content_hash(s) for s in sections]
+    old_metadata = json.loads(previous.metadata_json or "{}")
+    metadata_changes = [
+        f"{key}: {old_metadata.get(key) or 'missing'} -> {metadata.get(key) or 'missing'}"
+        for key in sorted(set(old_metadata) | set(metadata))
+        if old_metadata.get(key) != metadata.get(key)
+    ]
+    if old_hashes == new_hashes and not metadata_changes and previous.dom_hash == dom_hash:
+        return f"Unchanged since last run ({seen}): text, metadata and DOM structure are identical."
+
+    parts = [f"Changed since last run ({seen})."]
+    if previous.dom_hash != dom_hash:
+        parts.append("DOM structure changed.")
+    if metadata_changes:
+        parts.append("Metadata changes:\n" + "\n".join(f"- {c}" for c in metadata_changes))
+    removed_hashes = set(old_hashes) - set(new_hashes)
+    removed_text = load_chunks(session, list(removed_hashes)) if removed_hashes else {}
+    for op, i1, i2, j1, j2 in SequenceMatcher(None, old_hashes, new_hashes, autojunk=False).get_opcodes():
+        if op == "equal":
+            parts.append(f"[{i2 - i1} sections unchanged since last run]")
+        elif op == "delete":
+            first_lines = [removed_text.get(h, "").split("\n", 1)[0] for h in old_hashes[i1:i2]]
+            parts.append(f"[{i2 - i1} sections removed, starting: {first_lines[0][:80]!r}]")
+        else:
+            parts.append("[new or changed]\n" + "\n".join(sections[j1:j2]))
+    return "\n".join(parts)
@@ -0,0 +1,137 @@
+"""
+Shared fixtures. The backend modules read their settings at import time, so the environment is
+set here before any test module imports them. Run from the repository root: `uv run pytest`.
+"""
+
+import base64
+import os
+import tempfile
+
+os.environ.setdefault("FRONTEND_URL", "http://127.0.0.1")
+os.environ.setdefault("JWT_SECRET", "test-secret")
+os.environ.setdefault("GITHUB_CLIENT_ID", "test")
+os.environ.setdefault("GITHUB_CLIENT_SECRET", "test")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'webster-test.db')}")
+os.environ.setdefault("SCHEDULER_ENABLED", "false")
+os.environ.setdefault("METRICS_TOKEN", "test-metrics-token")
+
+import pytest
+import requests
+from sqlalchemy import Engine
+from sqlmodel import Session, SQLModel, create_engine
+
+import models
+import repo
+from repo import git_blob_sha
+from tracing import InMemoryExporter, tracer
+
+
+@pytest.fixture
+def engine(tmp_path) -> Engine:
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    SQLModel.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def entry(engine: Engine) -> models.WebsiteEntry:
+    with Session(engine, expire_on_commit=False) as session:
+        user = models.User(github_id=1, github_token="token")
+        session.add(user)
+        session.commit()
+        entry = models.WebsiteEntry(user_id=user.id, website_url="https://example.com", repo_name="octocat/site")
+        session.add(entry)
+        session.commit()
+        return entry
+
+
+class FakeResponse:
+    def __init__(self, status_code: int = 200, json_body=None, text: str = ""):
+        self.status_code = status_code
+        self.ok = status_code < 400
+        self._json = json_body
+        self.text = text
+
+    def json(self):
+        return self._json
+
+    def raise_for_status(self) -> None:
+        if not self.ok:
+            raise requests.HTTPError(f"{self.status_code}")
+
+
+class FakeGitHub:
+    """The slice of the GitHub REST API repo.py uses: one repo with one branch, readable with `token`."""
+
+    def __init__(self, repo: str, files: dict[str, str], token: str = "token"):
+        self.repo = repo
+        self.token = token
+        self.blobs = {git_blob_sha(content.encode("utf-8")): content for content in files.values()}
+        self.head = "commit-1"
+        self.tree = {path: git_blob_sha(content.encode("utf-8")) for path, content in files.items()}
+        self.calls: list[tuple[str, str]] = []
+        self.commits = 1
+
+    def get(self, path: str, github_token: str, **kwargs) -> FakeResponse:
+        self.calls.append(("GET", path))
+        if github_token != self.token or not path.startswith(f"/repos/{self.repo}/"):
+            return FakeResponse(404)
+        rest = path.removeprefix(f"/repos/{self.repo}")
+        if rest.startswith("/commits/"):
+            return FakeResponse(text=self.head)
+        if rest.startswith("/git/ref/heads/"):
+            return FakeResponse(json_body={"object": {"sha": self.head}})
+        if rest.startswith("/git/trees/"):
+            tree = [{"path": p, "sha": sha, "size": len(self.blobs[sha]), "mode": "100644", "type": "blob"} for p, sha in self.tree.items()]
+            return FakeResponse(json_body={"sha": f"tree-{self.head}", "tree": tree, "truncated": False})
+        if rest.startswith("/git/blobs/"):
+            content = self.blobs[rest.rsplit("/", 1)[1]]
+            return FakeResponse(json_body={"content": base64.b64encode(content.encode("utf-8")).decode("ascii")})
+        return FakeResponse(404)
+
+    def send(self, method: str, path: str, github_token: str, body: dict) -> dict:
+        self.calls.append((method, path))
+        if path.endswith("/git/blobs"):
+            sha = git_blob_sha(body["content"].encode("utf-8"))
+            self.blobs[sha] = body["content"]
+            return {"sha": sha}
+        if path.endswith("/git/trees"):
+            for entry in body["tree"]:
+                if entry["sha"] is None:
+                    self.tree.pop(entry["path"], None)
+                else:
+                    self.tree[entry["path"]] = entry["sha"]
+            return {"sha": f"tree-{len(self.calls)}"}
+        if path.endswith("/git/commits"):
+            self.commits += 1
+            return {"sha": f"commit-{self.commits}"}
+        if "/git/refs/heads/" in path:
+            self.head = body["sha"]
+            return {}
+        raise AssertionError(f"unexpected {method} {path}")
+
+    def writes(self) -> list[tuple[str, str]]:
+        return [call for call in self.calls if call[0] != "GET"]
+
+
+@pytest.fixture
+def github(monkeypatch) -> FakeGitHub:
+    fake = FakeGitHub("octocat/site", {"index.html": "<h1>Hi</h1>", "src/app.css": "body {}"})
+    monkeypatch.setattr(repo, "gh_get", fake.get)
+    monkeypatch.setattr(repo, "gh_send", fake.send)
+    with repo.cache_lock:
+        repo.refs.clear()
+        repo.trees.clear()
+        repo.blobs.clear()
+        repo.blob_bytes = 0
+    return fake
+
+
+@pytest.fixture
+def spans():
+    """Spans ended during the test."""
+    exporter = InMemoryExporter()
+    tracer.add_exporter(exporter)
+    yield exporter.spans
+    tracer.remove_exporter(exporter)
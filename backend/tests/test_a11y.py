@@ -0,0 +1,54 @@
+from a11y import contrast_ratio, format_findings, run_rules
+
+
+def node(node_id, role, name="", children=(), **properties):
+    return {
+        "nodeId": node_id,
+        "role": {"value": role},
+        "name": {"value": name},
+        "childIds": list(children),
+        "properties": [{"name": k, "value": {"value": v}} for k, v in properties.items()],
+    }
+
+
+def dom(**overrides):
+    return {"text": [], "positiveTabindex": [], "clickableNotFocusable": [], "hiddenFocusable": [], "lang": "en"} | overrides
+
+
+def test_contrast_ratio():
+    assert round(contrast_ratio([0, 0, 0], [255, 255, 255]), 1) == 21.0
+    assert round(contrast_ratio([119, 119, 119], [255, 255, 255]), 2) == 4.48
+    # Semi-transparent text is blended onto its background first.
+    assert contrast_ratio([0, 0, 0, 0.5], [255, 255, 255]) < contrast_ratio([0, 0, 0, 1], [255, 255, 255])
+
+
+def test_clean_page_has_no_findings():
+    tree = [
+        node("1", "RootWebArea", "Home", ["2", "3"]),
+        node("2", "navigation", "Main", ["4"]),
+        node("3", "main", "", ["5"]),
+        node("4", "link", "Pricing"),
+        node("5", "heading", "Welcome", level=1),
+    ]
+    assert run_rules(tree, dom()) == []
+    assert format_findings("https://example.com/", [], 5) == (
+        "Accessibility audit of https://example.com/: no issues found across 5 accessibility nodes."
+    )
+
+
+def test_findings_are_ranked_by_severity_and_described_by_context():
+    tree = [
+        node("1", "RootWebArea", "Home", ["2", "5"]),
+        node("2", "navigation", "Main", ["3", "4"]),
+        node("3", "button"),
+        node("4", "button"),
+        node("5", "heading", "Intro", level=2),
+    ]
+    text = [{"selector": "p.muted", "text": "Fine print", "color": [170, 170, 170], "background": [255, 255, 255], "size": 14, "bold": False}]
+    findings = run_rules(tree, dom(text=text, lang=""))
+    assert findings[0] == ("error", "button without an accessible name", ["button in navigation 'Main'"] * 2)
+    rules = [rule for _, rule, _ in findings]
+    assert rules.index("insufficient text contrast") < rules.index("no level-1 heading")
+    assert {"no main landmark", "missing lang attribute on <html>"} <= set(rules)
+    report = format_findings("https://example.com/", findings, 5)
+    assert "- [error] button without an accessible name x2: button in navigation 'Main'; button in navigation 'Main'" in report
@@ -0,0 +1,85 @@
+import asyncio
+
+import pytest
+
+import admission
+from admission import AgentSlots, TokenBucket, take_run_token
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(admission.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_token_bucket_allows_a_burst_then_refills(clock):
+    bucket = TokenBucket(per_minute=6, burst=2)
+    assert bucket.take() == 0
+    assert bucket.take() == 0
+    assert bucket.take() == pytest.approx(10)
+    clock[0] += 10
+    assert bucket.take() == 0
+
+
+def test_rejected_runs_are_not_charged(clock, monkeypatch):
+    monkeypatch.setattr(admission, "buckets", {})
+    monkeypatch.setattr(admission, "ENTRY_RUN_BURST", 1)
+    monkeypatch.setattr(admission, "USER_RUN_BURST", 3)
+    assert take_run_token(1, 10) == 0
+    assert take_run_token(1, 10) > 0
+    # The rejection above refunded the user's token, so the user still has two runs left.
+    assert take_run_token(1, 11) == 0
+    assert take_run_token(1, 12) == 0
+    assert take_run_token(1, 13) > 0
+
+
+
+def test_a_batch_is_charged_to_the_user_only(clock, monkeypatch):
+    monkeypatch.setattr(admission, "buckets", {})
+    monkeypatch.setattr(admission, "ENTRY_RUN_BURST", 1)
+    monkeypatch.setattr(admission, "USER_RUN_BURST", 2)
+    assert take_run_token(1, None) == 0
+    assert take_run_token(1, 10) == 0
+    assert take_run_token(1, None) > 0
+    assert set(admission.buckets) == {("user", 1), ("entry", 10)}
+
+def test_agent_slots_are_handed_out_in_order():
+    async def main():
+        slots = AgentSlots(1)
+        order, positions = [], {}
+
+        async def run(name: str):
+            async for position in slots.acquire():
+                positions.setdefault(name, []).append(position)
+            order.append(name)
+            await asyncio.sleep(0.01)
+            slots.release()
+
+        await asyncio.gather(run("a"), run("b"), run("c"))
+        return order, positions, slots.active
+
+    order, positions, active = asyncio.run(main())
+    assert order == ["a", "b", "c"]
+    assert positions == {"b": [1], "c": [2, 1]}
+    assert active == 0
+
+
+def test_a_waiter_that_gives_up_leaves_the_queue():
+    async def main():
+        slots = AgentSlots(1)
+        async for _ in slots.acquire():
+            pass
+
+        async def wait():
+            async for _ in slots.acquire():
+                pass
+
+        waiter = asyncio.create_task(wait())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        slots.release()
+        return slots.active, len(slots.waiters)
+
+    assert asyncio.run(main()) == (0, 0)
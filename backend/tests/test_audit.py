@@ -0,0 +1,58 @@
+from audit import format_audit, metric_score, resource_type, summarize_audit
+
+
+def raw_audit(**overrides):
+    raw = {
+        "ttfb": 120, "dcl": 900, "load": 1500, "document_bytes": 20_000,
+        "fcp": 1000, "lcp": 1800, "cls": 0.02, "long_tasks": [], "resources": [],
+    }
+    return raw | overrides
+
+
+def resource(url, initiator="other", transfer=1000, encoded=1000, decoded=3000, blocking=""):
+    return {"url": url, "initiator": initiator, "transfer": transfer, "encoded": encoded, "decoded": decoded, "blocking": blocking}
+
+
+def test_metric_score_follows_the_lighthouse_curves():
+    assert metric_score("LCP", 0) == 1.0
+    assert abs(metric_score("LCP", 2500) - 0.9) < 0.001
+    assert abs(metric_score("LCP", 4000) - 0.5) < 0.001
+    assert metric_score("TBT", 100) > metric_score("TBT", 600) > metric_score("TBT", 2000)
+
+
+def test_resource_type_prefers_the_extension_over_the_initiator():
+    assert resource_type(resource("https://x.com/app.js?v=2", "link")) == "script"
+    assert resource_type(resource("https://x.com/logo.SVG")) == "image"
+    assert resource_type(resource("https://x.com/pixel", "img")) == "image"
+    assert resource_type(resource("https://x.com/api/data", "fetch")) == "other"
+
+
+def test_fast_page_scores_high_without_opportunities():
+    summary = summarize_audit(raw_audit())
+    assert summary["score"] >= 90
+    assert summary["opportunities"] == []
+    assert summary["metrics"]["FCP"] == "1.0 s"
+
+
+def test_blocking_time_counts_only_long_tasks_after_first_paint():
+    summary = summarize_audit(raw_audit(long_tasks=[[500, 400], [1200, 350], [2000, 60]]))
+    assert summary["metrics"]["TBT"] == "310 ms"
+    assert summary["metrics"]["TTI"] == "2.1 s"
+    assert any(o.startswith("Reduce main-thread work: 2 long tasks") for o in summary["opportunities"])
+
+
+def test_opportunities_and_page_weight():
+    summary = summarize_audit(raw_audit(resources=[
+        resource("https://x.com/app.css", "link", transfer=30_000, encoded=30_000, decoded=30_000, blocking="blocking"),
+        resource("https://x.com/hero.jpg", "img", transfer=400_000),
+    ]))
+    assert summary["total_bytes"] == 450_000
+    assert summary["resources"] == {"stylesheet": {"count": 1, "bytes": 30_000}, "image": {"count": 1, "bytes": 400_000}}
+    assert summary["opportunities"] == [
+        "Eliminate render-blocking resources: 1 (https://x.com/app.css)",
+        "Enable text compression: 1 uncompressed scripts/stylesheets",
+        "Properly size images: 1 images over 100 KB (390 KB)",
+    ]
+    report = format_audit(summary)
+    assert report.startswith(f"Performance score (mobile, local audit): {summary['score']}/100")
+    assert "Page weight: 439 KB (image 1 files/390 KB, stylesheet 1 files/29 KB)" in report
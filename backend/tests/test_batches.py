@@ -0,0 +1,86 @@
+import asyncio
+
+from sqlmodel import Session
+
+import batches
+from batches import TokenPool, run_batch
+from models import WebsiteEntry
+import runs
+from verification import VerificationResult
+
+
+def test_token_pool_reserves_and_settles_actual_usage(monkeypatch):
+    monkeypatch.setattr(batches, "RUN_MAX_TOKENS", 100)
+    pool = TokenPool(250)
+    assert pool.reserve() == 100
+    assert pool.reserve() == 100
+    assert pool.reserve() == 50
+    assert pool.remaining == 0
+    pool.settle(100, 40)
+    assert pool.remaining == 60
+    # A run that overshot its reservation uses up what other runs gave back.
+    pool.settle(50, 90)
+    assert pool.remaining == 20
+    assert pool.reserve() == 20
+    pool.settle(20, 20)
+    assert pool.reserve() == 0
+
+
+def add_entries(engine, user_id: int, count: int) -> list[int]:
+    with Session(engine, expire_on_commit=False) as session:
+        entries = [WebsiteEntry(user_id=user_id, website_url=f"https://site{i}.example.com", repo_name=f"octocat/site{i}") for i in range(count)]
+        session.add_all(entries)
+        session.commit()
+        return [e.id for e in entries]
+
+
+def collect(engine, user_id: int) -> list[dict]:
+    async def run():
+        return [event async for event in run_batch(engine, user_id, "token", "batch-run")]
+    return asyncio.run(run())
+
+
+def test_batch_runs_entries_concurrently_without_admitting_each(engine, entry, monkeypatch):
+    ids = [entry.id] + add_entries(engine, entry.user_id, 5)
+    running, peak = set(), [0]
+
+    async def verify(entry_id, github_token, engine, on_event=None, budget_limits=None):
+        running.add(entry_id)
+        peak[0] = max(peak[0], len(running))
+        assert runs.active_runs[entry_id] == "batch-run"
+        await on_event({"type": "tool_start", "tool": "browser"})
+        await asyncio.sleep(0.01)
+        running.discard(entry_id)
+        return VerificationResult(conclusion="ok", diagnostics=[("error", f"Broken link on {entry_id}")], usage={"tokens": 1000})
+
+    monkeypatch.setattr(batches, "run_verification", verify)
+    monkeypatch.setattr(batches, "BATCH_CONCURRENCY", 3)
+    events = collect(engine, entry.user_id)
+
+    assert peak[0] == 3
+    assert sum(1 for e in events if e["type"] == "entry_done") == len(ids)
+    assert {e["website_entry_id"] for e in events if e["type"] == "tool_start"} == set(ids)
+    summary = events[-1]["summary"]
+    assert (summary["verified"], summary["tokens"]) == (len(ids), 1000 * len(ids))
+    assert not any(entry_id in runs.active_runs for entry_id in ids)
+
+
+def test_busy_entries_and_an_exhausted_budget_are_skipped(engine, entry, monkeypatch):
+    others = add_entries(engine, entry.user_id, 2)
+    runs.runs["chat"] = runs.AgentRun(entry.id, entry.user_id, False, "chat")
+    runs.active_runs[entry.id] = "chat"
+
+    async def verify(entry_id, github_token, engine, on_event=None, budget_limits=None):
+        return VerificationResult(usage={"tokens": budget_limits["max_tokens"] * 2})
+
+    monkeypatch.setattr(batches, "run_verification", verify)
+    monkeypatch.setattr(batches, "BATCH_CONCURRENCY", 1)
+    monkeypatch.setattr(batches, "BATCH_MAX_TOKENS", batches.RUN_MAX_TOKENS * 2)
+    try:
+        events = collect(engine, entry.user_id)
+    finally:
+        del runs.active_runs[entry.id], runs.runs["chat"]
+
+    skipped = {e["website_entry_id"]: e["reason"] for e in events if e["type"] == "entry_skipped"}
+    assert skipped == {entry.id: "a run is already in progress", others[1]: "the batch's token budget is used up"}
+    assert events[-1]["summary"]["verified"] == 1
@@ -0,0 +1,88 @@
+import asyncio
+
+from fastapi.testclient import TestClient
+import pytest
+
+import browsers
+from browsers import BrowserPool
+
+
+class FakeBrowser:
+    def __init__(self):
+        self.closed = False
+
+    def is_connected(self) -> bool:
+        return not self.closed
+
+    async def close(self) -> None:
+        self.closed = True
+
+
+class FakePlaywright:
+    def __init__(self):
+        self.chromium = self
+        self.launched: list[FakeBrowser] = []
+        self.stopped = False
+
+    async def launch(self) -> FakeBrowser:
+        self.launched.append(FakeBrowser())
+        return self.launched[-1]
+
+    async def start(self) -> "FakePlaywright":
+        return self
+
+    async def stop(self) -> None:
+        self.stopped = True
+
+
+@pytest.fixture
+def playwright(monkeypatch) -> FakePlaywright:
+    fake = FakePlaywright()
+    monkeypatch.setattr(browsers, "async_playwright", lambda: fake)
+    return fake
+
+
+def test_browser_is_shared_and_kept_while_idle(playwright):
+    async def run():
+        pool = BrowserPool(idle_seconds=60)
+        first, second = await pool.acquire(), await pool.acquire()
+        assert first is second
+        await pool.release()
+        await pool.release()
+        assert pool.idle_close is not None and not first.closed
+        assert await pool.acquire() is first
+        await pool.release()
+        await pool.close(force=True)
+        assert first.closed and playwright.stopped and pool.idle_close is None
+    asyncio.run(run())
+
+
+def test_forced_close_does_not_wait_for_runs(playwright):
+    async def run():
+        pool = BrowserPool(idle_seconds=0)
+        browser = await pool.acquire()
+        await pool.close()
+        assert not browser.closed
+        await pool.close(force=True)
+        assert browser.closed
+        # The run that still held it releases afterwards; the next run gets a fresh browser.
+        await pool.release()
+        assert pool.users == 0
+        assert await pool.acquire() is not browser
+    asyncio.run(run())
+
+
+def test_close_without_a_launch_is_a_no_op():
+    asyncio.run(BrowserPool(idle_seconds=0).close(force=True))
+
+
+def test_api_shutdown_closes_the_browser(playwright, monkeypatch):
+    import main
+
+    monkeypatch.setattr(main, "AGENT_PREWARM", False)
+    monkeypatch.setattr(browsers, "browser_pool", BrowserPool(idle_seconds=60))
+    with TestClient(main.api) as client:
+        browser = client.portal.call(browsers.browser_pool.acquire)
+        client.portal.call(browsers.browser_pool.release)
+        assert not browser.closed
+    assert browser.closed and playwright.stopped
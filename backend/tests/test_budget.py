@@ -0,0 +1,35 @@
+from budget import RunBudget
+
+
+def test_charge_refuses_usage_beyond_the_limit():
+    budget = RunBudget(max_tool_calls=2)
+    assert budget.charge("tool_calls") is None
+    assert budget.charge("tool_calls") is None
+    assert "tool calls budget" in budget.charge("tool_calls")
+    assert budget.tool_calls == 2
+    assert budget.exhausted() == ["tool_calls"]
+
+
+def test_charge_refuses_everything_once_out_of_time():
+    budget = RunBudget(max_seconds=10)
+    budget.started -= 11
+    assert "out of time" in budget.charge("page_loads")
+    assert "seconds" in budget.exhausted()
+
+
+def test_nearly_exhausted_looks_at_the_most_used_resource():
+    budget = RunBudget(max_tokens=100, max_page_loads=10)
+    budget.tokens = 10
+    assert not budget.nearly_exhausted()
+    budget.page_loads = 10
+    assert budget.nearly_exhausted()
+
+
+def test_restore_carries_over_an_interrupted_attempt():
+    first = RunBudget(max_tokens=1000)
+    first.charge("tokens", 600)
+    first.charge("tool_calls", 3)
+    resumed = RunBudget(max_tokens=1000)
+    resumed.restore(first.usage())
+    assert resumed.tokens == 600 and resumed.tool_calls == 3
+    assert "tokens budget" in resumed.charge("tokens", 500)
@@ -0,0 +1,66 @@
+import asyncio
+import gzip
+import json
+
+import httpx
+import pytest
+
+from cassettes import Cassette, CassetteStore, CassetteTransport
+
+
+def completion(model: str, prompt: str) -> httpx.Request:
+    return httpx.Request("POST", "https://api.openai.com/v1/chat/completions", json={"model": model, "messages": [prompt]})
+
+
+def test_store_round_trip_and_misses(tmp_path):
+    path = str(tmp_path / "runs.json.gz")
+    recording = CassetteStore(path, "record")
+    recording.tools["github"] = [{"name": "get_file"}]
+    recording.record("1", "tool", "browser", "key-a", {"content": "A"}, 10)
+    recording.record("1", "tool", "browser", "key-b", {"content": "B"}, 10)
+    recording.save()
+
+    replay = CassetteStore(path, "replay")
+    assert replay.tools == {"github": [{"name": "get_file"}]}
+    assert replay.play("1", "tool", "browser", "key-b") == {"content": "B"}
+    # A changed request gets the next unused recording of the same tool, counted as a miss.
+    assert replay.play("1", "tool", "browser", "key-changed") == {"content": "A"}
+    assert replay.misses == 1
+    with pytest.raises(LookupError):
+        replay.play("1", "tool", "browser", "key-a")
+    replay.rewind()
+    assert replay.play("1", "tool", "browser", "key-a") == {"content": "A"}
+    with pytest.raises(LookupError):
+        replay.play("2", "tool", "browser", "key-a")
+
+
+def test_unknown_mode_and_version_are_rejected(tmp_path):
+    with pytest.raises(RuntimeError):
+        CassetteStore(str(tmp_path / "x.json.gz"), "live")
+    path = tmp_path / "x.json.gz"
+    path.write_bytes(gzip.compress(json.dumps({"version": 99, "meta": {}, "tools": {}, "interactions": []}).encode()))
+    with pytest.raises(RuntimeError, match="Unsupported cassette version 99"):
+        CassetteStore(str(path), "replay")
+
+
+def test_llm_exchanges_are_recorded_and_replayed_offline(tmp_path):
+    path = str(tmp_path / "llm.json.gz")
+    sent = []
+
+    def openai(request: httpx.Request) -> httpx.Response:
+        sent.append(request)
+        return httpx.Response(200, json={"choices": [{"message": {"content": "hello"}}]})
+
+    async def exchange(transport: CassetteTransport, prompt: str) -> dict:
+        response = await transport.handle_async_request(completion("gpt-test", prompt))
+        return json.loads(response.content)
+
+    recorder = CassetteTransport(Cassette(CassetteStore(path, "record"), "1"))
+    recorder.async_transport = httpx.MockTransport(openai)
+    assert asyncio.run(exchange(recorder, "hi")) == {"choices": [{"message": {"content": "hello"}}]}
+    recorder.cassette.save()
+
+    player = CassetteTransport(Cassette(CassetteStore(path, "replay"), "1"))
+    assert asyncio.run(exchange(player, "hi")) == {"choices": [{"message": {"content": "hello"}}]}
+    assert len(sent) == 1
+    assert player.cassette.store.misses == 0
@@ -0,0 +1,76 @@
+from sqlmodel import Session, select
+
+from diagnostics import (
+    canonicalize_diagnostic, diagnostic_buckets, diagnostic_fingerprint, is_near_duplicate, record_diagnostic,
+)
+from migrations import backfill_diagnostic_fingerprints
+from models import Diagnostic, DiagnosticBucket
+
+
+def test_canonical_form_keeps_resources_and_status_codes():
+    assert canonicalize_diagnostic("Broken link to https://Example.com/About/?ref=nav on the page") == "broken link example.com/about"
+    assert canonicalize_diagnostic("Image /img/hero.png is 2.5 MB") == "image /img/hero.png n mb"
+    assert canonicalize_diagnostic("404 on /pricing.") == "404 /pricing"
+    assert canonicalize_diagnostic("Page loads in 3200ms") == "loads n ms"
+
+
+def test_distinct_resources_and_statuses_get_distinct_fingerprints():
+    def fingerprint(desc):
+        return diagnostic_fingerprint("error", canonicalize_diagnostic(desc))
+
+    assert fingerprint("Broken link /a") != fingerprint("Broken link /b")
+    assert fingerprint("Broken link https://x.com/a") != fingerprint("Broken link https://x.com/b")
+    assert fingerprint("/api/cart returns 404") != fingerprint("/api/cart returns 500")
+    # Timings and sizes change between runs of the same issue.
+    assert fingerprint("Hero image is 2.5 MB") == fingerprint("Hero image is 3.1 MB")
+
+
+def test_near_duplicates_must_name_the_same_resources():
+    a = canonicalize_diagnostic("Broken link to /pricing in the footer")
+    assert is_near_duplicate(a, canonicalize_diagnostic("Broken link to /pricing in footer"))
+    assert not is_near_duplicate(a, canonicalize_diagnostic("Broken link to /careers in the footer"))
+
+
+def test_similar_descriptions_share_a_bucket():
+    a = diagnostic_buckets("warning", canonicalize_diagnostic("Missing meta description on the pricing page"))
+    b = diagnostic_buckets("warning", canonicalize_diagnostic("Missing meta description on pricing"))
+    assert set(a) & set(b)
+    assert not set(a) & set(diagnostic_buckets("error", canonicalize_diagnostic("Missing meta description on pricing")))
+
+
+def test_record_diagnostic_merges_duplicates_and_keeps_their_details(engine, entry):
+    with Session(engine) as session:
+        first, created = record_diagnostic(session, entry.id, "Missing meta description on the pricing page", "Seen on /pricing.", "warning")
+        assert created
+        same, created = record_diagnostic(session, entry.id, "Missing meta description on pricing", "Also missing on /pricing/annual.", "warning")
+        assert not created and same.id == first.id
+        assert same.occurrence_count == 2
+        assert "Seen on /pricing." in same.full_desc and "Also missing on /pricing/annual." in same.full_desc
+        other, created = record_diagnostic(session, entry.id, "Broken link /b", "Details", "error")
+        assert created
+        _, created = record_diagnostic(session, entry.id, "Broken link /a", "Details", "error")
+        assert created
+
+
+def test_dismissed_diagnostics_are_not_merged_into(engine, entry):
+    with Session(engine) as session:
+        first, _ = record_diagnostic(session, entry.id, "Slow page", "", "warning")
+        first.dismissed = True
+        session.commit()
+        second, created = record_diagnostic(session, entry.id, "Slow page", "", "warning")
+        assert created and second.id != first.id
+
+
+def test_backfill_fingerprints_legacy_diagnostics(engine, entry):
+    with Session(engine) as session:
+        session.add(Diagnostic(website_entry_id=entry.id, short_desc="Missing alt text on hero image", full_desc="Old details", severity="warning"))
+        session.commit()
+    backfill_diagnostic_fingerprints(engine)
+    backfill_diagnostic_fingerprints(engine)
+    with Session(engine) as session:
+        legacy = session.exec(select(Diagnostic)).one()
+        assert legacy.fingerprint and legacy.fingerprint_version > 0
+        assert len(session.exec(select(DiagnosticBucket).where(DiagnosticBucket.diagnostic_id == legacy.id)).all()) > 0
+        merged, created = record_diagnostic(session, entry.id, "Missing alt text on the hero image", "New details", "warning")
+        assert not created and merged.id == legacy.id
+        assert merged.full_desc.startswith("Old details")
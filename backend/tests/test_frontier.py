@@ -0,0 +1,74 @@
+import asyncio
+import gzip
+
+import httpx
+
+import frontier
+from frontier import Frontier, build_frontier, format_frontier, lastmod_key
+
+ROBOTS = """User-agent: *
+Disallow: /private/
+Sitemap: https://example.com/sitemap_index.xml
+"""
+
+INDEX = """<?xml version="1.0" encoding="UTF-8"?>
+<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+  <sitemap><loc>https://example.com/sitemap-old.xml</loc><lastmod>2023-01-01</lastmod></sitemap>
+  <sitemap><loc>/sitemap-new.xml.gz</loc><lastmod>2026-01-01</lastmod></sitemap>
+</sitemapindex>"""
+
+
+def urlset(*entries: tuple[str, str]) -> str:
+    urls = "".join(f"<url><loc>{loc}</loc>" + (f"<lastmod>{lastmod}</lastmod>" if lastmod else "") + "</url>" for loc, lastmod in entries)
+    return f'<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{urls}</urlset>'
+
+
+SITE = {
+    "/robots.txt": ROBOTS.encode(),
+    "/sitemap_index.xml": INDEX.encode(),
+    "/sitemap-old.xml": urlset(("https://example.com/", ""), ("https://example.com/about", "2023-05-01")).encode(),
+    "/sitemap-new.xml.gz": gzip.compress(urlset(
+        ("https://example.com/blog/launch", "2026-03-01T10:00:00+02:00"),
+        ("https://example.com/private/admin", "2026-03-02"),
+        ("https://other.com/elsewhere", "2026-03-03"),
+        ("http://example.com/pricing#plans", "2025-12-01"),
+    ).encode()),
+}
+
+
+def test_lastmod_key_normalizes_to_utc():
+    assert lastmod_key("2026-03-01") == "2026-03-01T00:00:00"
+    assert lastmod_key("2026-03-01T10:00:00+02:00") == "2026-03-01T08:00:00"
+    assert lastmod_key("yesterday") == ""
+
+
+def test_frontier_keeps_the_best_urls_in_bounded_memory():
+    pages = Frontier(limit=2)
+    pages.add("https://example.com/a/b/c", "2026-01-01")
+    pages.add("https://example.com/old", "2020-01-01")
+    pages.add("https://example.com/new", "2026-01-01")
+    assert not pages.admits("https://example.com/older", "2019-01-01")
+    # A duplicate keeps its newest lastmod.
+    pages.add("https://example.com/new", "2025-01-01")
+    assert pages.ranked() == [("https://example.com/new", "2026-01-01"), ("https://example.com/a/b/c", "2026-01-01")]
+
+
+def test_build_frontier_reads_robots_and_nested_sitemaps(monkeypatch):
+    def handle(request: httpx.Request) -> httpx.Response:
+        body = SITE.get(request.url.path)
+        return httpx.Response(200, content=body) if body is not None else httpx.Response(404)
+
+    client = httpx.AsyncClient
+    monkeypatch.setattr(frontier.httpx, "AsyncClient", lambda **kwargs: client(transport=httpx.MockTransport(handle), **kwargs))
+    result = asyncio.run(build_frontier("https://example.com/"))
+
+    assert result.pages == [
+        ("https://example.com/blog/launch", "2026-03-01T08:00:00"),
+        ("http://example.com/pricing", "2025-12-01T00:00:00"),
+        ("https://example.com/about", "2023-05-01T00:00:00"),
+        ("https://example.com/", ""),
+    ]
+    assert (result.sitemaps_read, result.urls_seen, result.disallowed, result.errors) == (3, 5, 1, [])
+    report = format_frontier(result, limit=2, path_prefix="/blog")
+    assert "Top 1 of 1 ranked pages" in report
+    assert "- https://example.com/blog/launch (lastmod 2026-03-01)" in report
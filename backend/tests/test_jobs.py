@@ -0,0 +1,55 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlmodel import Session
+
+import jobs
+from jobs import claim_stale_jobs, create_job, job_budget_limits, run_job
+from models import AgentJob
+
+
+def job(entry, run_id: str, **values) -> AgentJob:
+    return AgentJob(run_id=run_id, kind="verification", website_entry_id=entry.id, user_id=entry.user_id, **values)
+
+
+def status(engine, run_id: str) -> AgentJob:
+    with Session(engine) as session:
+        return session.get(AgentJob, run_id)
+
+
+def test_run_job_records_how_the_run_ended(engine, entry):
+    create_job(engine, job(entry, "ok"))
+    create_job(engine, job(entry, "broken"))
+
+    async def events():
+        yield {"type": "done", "content": "finished"}
+
+    async def failing():
+        yield {"type": "tool_start", "tool": "browser"}
+        raise RuntimeError("entry deleted")
+
+    async def relay(run_id, source):
+        return [event async for event in run_job(engine, run_id, source)]
+
+    assert asyncio.run(relay("ok", events())) == [{"type": "done", "content": "finished"}]
+    with pytest.raises(RuntimeError):
+        asyncio.run(relay("broken", failing()))
+    assert status(engine, "ok").status == "done"
+    assert status(engine, "broken").status == "failed"
+
+
+def test_stale_jobs_are_claimed_once_until_out_of_attempts(engine, entry, monkeypatch):
+    monkeypatch.setattr(jobs, "AGENT_JOB_MAX_ATTEMPTS", 2)
+    stale = datetime.now(timezone.utc) - timedelta(seconds=jobs.AGENT_JOB_STALE_SECONDS + 60)
+    create_job(engine, job(entry, "stale", heartbeat_at=stale, budget_limits_json='{"max_tokens": 1000}'))
+    create_job(engine, job(entry, "exhausted", heartbeat_at=stale, attempts=2))
+    create_job(engine, job(entry, "fresh"))
+
+    claimed = claim_stale_jobs(engine)
+    assert [j.run_id for j in claimed] == ["stale"]
+    assert claimed[0].attempts == 2
+    assert job_budget_limits(claimed[0]) == {"max_tokens": 1000}
+    assert claim_stale_jobs(engine) == []
+    assert status(engine, "exhausted").status == "failed"
+    assert job_budget_limits(status(engine, "fresh")) is None
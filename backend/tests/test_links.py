@@ -0,0 +1,119 @@
+import asyncio
+import logging
+import socket
+import time
+
+import httpx
+import pytest
+
+from artifacts import ArtifactStore
+import links
+from links import LinkChecker, is_public_address, normalize_link
+
+ADDRESSES = {
+    "example.com": ["93.184.216.34"],
+    "intranet.example.com": ["10.0.0.5"],
+    "localhost.example.com": ["127.0.0.1"],
+    "mapped.example.com": ["::ffff:127.0.0.1"],
+    # Refused if any answer is non-public: the client could connect to either.
+    "split.example.com": ["93.184.216.34", "192.168.1.1"],
+}
+
+
+@pytest.fixture
+def resolver(monkeypatch):
+    lookups = []
+
+    async def getaddrinfo(self, host, port, *, family=0, type=0, proto=0, flags=0):
+        lookups.append(host)
+        if host not in ADDRESSES:
+            raise socket.gaierror(socket.EAI_NONAME, "Name or service not known")
+        return [(socket.AF_INET6 if ":" in a else socket.AF_INET, socket.SOCK_STREAM, 6, "", (a, 0)) for a in ADDRESSES[host]]
+
+    monkeypatch.setattr(asyncio.BaseEventLoop, "getaddrinfo", getaddrinfo)
+    return lookups
+
+
+def handler(sent):
+    def handle(request: httpx.Request) -> httpx.Response:
+        sent.append((request.method, request.url.host, request.headers["host"], request.url.path))
+        if request.url.path == "/to-intranet":
+            return httpx.Response(302, headers={"location": "http://intranet.example.com/admin"})
+        if request.url.path == "/head-rejected" and request.method == "HEAD":
+            return httpx.Response(405)
+        return httpx.Response(200)
+    return handle
+
+
+def check(urls: list[str], sent: list, since: float | None = None) -> dict[str, links.LinkResult]:
+    async def run():
+        checker = LinkChecker(since)
+        await checker.client.aclose()
+        checker.client = httpx.AsyncClient(transport=httpx.MockTransport(handler(sent)), follow_redirects=False)
+        try:
+            return await checker.check(urls)
+        finally:
+            await checker.close()
+    return asyncio.run(run())
+
+
+def test_public_addresses():
+    assert is_public_address("93.184.216.34")
+    assert is_public_address("2606:2800:220:1:248:1893:25c8:1946")
+    for address in ("10.0.0.5", "127.0.0.1", "169.254.169.254", "192.168.1.1", "::1", "fe80::1%eth0", "::ffff:127.0.0.1", "::ffff:10.0.0.5", "224.0.0.1"):
+        assert not is_public_address(address), address
+
+
+def test_normalize_link():
+    assert normalize_link(" https://example.com/a#top ") == "https://example.com/a"
+    assert normalize_link("http://example.com/?q=1") == "http://example.com/?q=1"
+    assert normalize_link("mailto:hi@example.com") is None
+    assert normalize_link("javascript:void(0)") is None
+
+
+def test_requests_go_to_the_checked_address(resolver):
+    sent = []
+    results = check(["https://example.com/", "https://example.com/head-rejected"], sent)
+    assert not any(r.broken for r in results.values())
+    assert results["https://example.com/head-rejected"].method == "GET"
+    assert {(host, header) for _, host, header, _ in sent} == {("93.184.216.34", "example.com")}
+    assert resolver == ["example.com"]
+
+
+def test_non_public_hosts_are_refused_per_url(resolver, caplog):
+    sent = []
+    urls = [
+        "http://intranet.example.com/a", "http://intranet.example.com/b", "http://localhost.example.com/",
+        "http://mapped.example.com/", "http://split.example.com/",
+    ]
+    with caplog.at_level(logging.WARNING, logger="links"):
+        results = check(urls, sent)
+    assert sent == []
+    for url in urls:
+        assert results[url].broken and results[url].error.startswith("refused:"), url
+    assert "(::ffff:127.0.0.1)" in results["http://mapped.example.com/"].error
+    refused = [r.getMessage() for r in caplog.records if r.getMessage().startswith("Link refused")]
+    assert len(refused) == len(urls)
+    assert any("url=http://intranet.example.com/b" in m for m in refused)
+
+
+def test_redirect_to_a_private_address_is_refused(resolver, caplog):
+    sent = []
+    with caplog.at_level(logging.WARNING, logger="links"):
+        result = check(["https://example.com/to-intranet"], sent)["https://example.com/to-intranet"]
+    assert result.broken and "intranet.example.com" in result.error
+    assert all(host == "93.184.216.34" for _, host, _, _ in sent)
+    assert any(r.getMessage().startswith("Link refused url=https://example.com/to-intranet") for r in caplog.records)
+
+
+def test_refusals_are_not_shared_through_the_artifact_store(resolver, monkeypatch):
+    store = ArtifactStore(max_bytes=1_000_000, retention_seconds=600)
+    monkeypatch.setattr(links, "artifact_store", store)
+    check(["https://example.com/", "http://intranet.example.com/"], [], since=time.time())
+    assert [key for _, kind, key in store.entries] == ["https://example.com/"]
+
+
+def test_failed_lookups_are_retried(resolver):
+    results = check(["https://unknown.example.com/a", "https://unknown.example.com/b"], [])
+    assert all(r.broken and not r.error.startswith("refused") for r in results.values())
+    assert resolver.count("unknown.example.com") >= 2
@@ -0,0 +1,60 @@
+import pytest
+import requests
+
+import repo
+
+
+def test_trees_and_blobs_are_fetched_once(github):
+    tree = repo.get_tree(github.repo, "main", github.token)
+    assert set(tree.files) == {"index.html", "src/app.css"}
+    assert repo.read_blobs(github.repo, list(tree.files.values()), github.token) == {"index.html": "<h1>Hi</h1>", "src/app.css": "body {}"}
+    fetched = len(github.calls)
+
+    again = repo.get_tree(github.repo, "main", github.token)
+    repo.read_blobs(github.repo, list(again.files.values()), github.token)
+    assert again is tree
+    assert len(github.calls) == fetched
+
+
+def test_cached_repo_is_not_served_to_a_token_without_access(github):
+    repo.get_tree(github.repo, "main", github.token)
+    with pytest.raises(requests.HTTPError):
+        repo.get_tree(github.repo, "main", "other-token")
+
+
+def test_ref_resolution_expires(github, monkeypatch):
+    repo.get_tree(github.repo, "main", github.token)
+    monkeypatch.setattr(repo, "REPO_REF_TTL_SECONDS", 0)
+    github.head = "commit-2"
+    assert repo.resolve_ref(github.repo, "main", github.token) == "commit-2"
+
+
+def test_list_and_search_files(github):
+    tree = repo.get_tree(github.repo, "", github.token)
+    assert [e.path for e in repo.list_files(tree, prefix="src/")] == ["src/app.css"]
+    assert [e.path for e in repo.list_files(tree, pattern="*.html")] == ["index.html"]
+    matches, searched = repo.search_files(github.repo, tree, r"body", github.token)
+    assert matches == ["src/app.css:1: body {}"]
+    assert searched == 2
+
+
+def test_commit_files_writes_only_changed_files(github):
+    sha, changed = repo.commit_files(
+        github.repo, "main", "Update", {"index.html": "<h1>Hi</h1>", "/src/app.css": "body { margin: 0 }", "new.txt": "x"}, ["missing.txt"], github.token,
+    )
+    assert sha == github.head == "commit-2"
+    assert sorted(changed) == ["new.txt", "src/app.css"]
+    assert [path for method, path in github.writes() if path.endswith("/git/blobs")] == ["/repos/octocat/site/git/blobs"] * 2
+    assert repo.resolve_ref(github.repo, "main", github.token) == "commit-2"
+
+
+def test_commit_files_without_changes_writes_nothing(github):
+    sha, changed = repo.commit_files(github.repo, "main", "Noop", {"index.html": "<h1>Hi</h1>"}, ["missing.txt"], github.token)
+    assert (sha, changed) == ("commit-1", [])
+    assert github.writes() == []
+
+
+def test_commit_files_deletes_existing_paths(github):
+    _, changed = repo.commit_files(github.repo, "main", "Remove", {}, ["src/app.css"], github.token)
+    assert changed == ["src/app.css"]
+    assert set(github.tree) == {"index.html"}
@@ -0,0 +1,67 @@
+import asyncio
+
+import runs
+from runs import AgentRun, count_active_runs, get_active_run, start_run
+
+
+def test_run_streams_events_and_resumes_after_an_event_id():
+    async def main():
+        done = []
+
+        async def events():
+            yield {"type": "message", "content": "working"}
+            yield {"type": "done", "content": "finished"}
+
+        run = start_run(101, 1, False, events(), done.append)
+        assert get_active_run(101) is run
+        await run.task
+        assert done == ["finished"]
+        assert get_active_run(101) is None
+        everything = [item async for item in run.stream()]
+        resumed = [item async for item in run.stream(last_event_id=2)]
+        return everything, resumed
+
+    everything, resumed = asyncio.run(main())
+    assert [event["type"] for _, event in everything] == ["run", "message", "done"]
+    assert resumed == everything[2:]
+
+
+def test_a_failing_run_publishes_an_error_and_releases_the_entry():
+    async def main():
+        async def events():
+            yield {"type": "message", "content": "working"}
+            raise RuntimeError("model unavailable")
+
+        run = start_run(102, 1, False, events(), lambda content: None)
+        await run.task
+        return run, [event async for _, event in run.stream()]
+
+    run, events = asyncio.run(main())
+    assert run.finished
+    assert events[-1] == {"type": "error", "message": "model unavailable"}
+    assert get_active_run(102) is None
+
+
+def test_count_active_runs_is_per_user():
+    runs.runs.update({"a": AgentRun(201, 7, False, "a"), "b": AgentRun(202, 7, False, "b"), "c": AgentRun(203, 8, False, "c")})
+    runs.active_runs.update({201: "a", 202: "b", 203: "c"})
+    try:
+        assert count_active_runs(7) == 2
+        assert count_active_runs(8) == 1
+    finally:
+        for entry_id, run_id in ((201, "a"), (202, "b"), (203, "c")):
+            del runs.active_runs[entry_id], runs.runs[run_id]
+
+
+def test_a_batch_counts_as_one_run():
+    runs.runs.update({"batch": AgentRun(None, 9, False, "batch"), "chat": AgentRun(301, 9, False, "chat")})
+    runs.active_batches[9] = "batch"
+    try:
+        # Between entries the batch has no active entry, and it still counts.
+        assert count_active_runs(9) == 1
+        runs.active_runs.update({302: "batch", 303: "batch", 301: "chat"})
+        assert count_active_runs(9) == 2
+    finally:
+        for entry_id in (301, 302, 303):
+            runs.active_runs.pop(entry_id, None)
+        del runs.active_batches[9], runs.runs["batch"], runs.runs["chat"]
@@ -0,0 +1,170 @@
+from datetime import datetime, timedelta, timezone
+import asyncio
+
+import pytest
+from sqlmodel import Session
+
+import scheduler
+from constants import SCHEDULER_MAX_JITTER_SECONDS, SCHEDULER_MAX_SKIP_SECONDS
+from models import VerificationSettings
+from scheduler import (
+    compute_next_run, fetch_content_hash, next_cron_time, page_content, parse_cron_field, run_scheduled_verification,
+    schedule_jitter, should_skip,
+)
+
+NOW = datetime(2026, 3, 2, 8, 30, tzinfo=timezone.utc)  # a Monday
+
+
+def test_parse_cron_field():
+    assert parse_cron_field("*/15", 0, 59) == {0, 15, 30, 45}
+    assert parse_cron_field("1-5", 0, 6) == {1, 2, 3, 4, 5}
+    assert parse_cron_field("1,10-12", 1, 31) == {1, 10, 11, 12}
+    with pytest.raises(ValueError):
+        parse_cron_field("60", 0, 59)
+
+
+@pytest.mark.parametrize("expr, expected", [
+    ("*/15 * * * *", datetime(2026, 3, 2, 8, 45, tzinfo=timezone.utc)),
+    ("0 9 * * *", datetime(2026, 3, 2, 9, 0, tzinfo=timezone.utc)),
+    ("0 6 * * *", datetime(2026, 3, 3, 6, 0, tzinfo=timezone.utc)),
+    ("0 9 * * 0", datetime(2026, 3, 8, 9, 0, tzinfo=timezone.utc)),  # the next Sunday
+    ("0 0 1 * *", datetime(2026, 4, 1, 0, 0, tzinfo=timezone.utc)),
+    # Both day fields restricted: the 15th or a Friday, whichever comes first.
+    ("0 0 15 * 5", datetime(2026, 3, 6, 0, 0, tzinfo=timezone.utc)),
+])
+def test_next_cron_time(expr, expected):
+    assert next_cron_time(expr, NOW) == expected
+
+
+def test_cron_rejects_malformed_and_impossible_expressions():
+    with pytest.raises(ValueError):
+        next_cron_time("0 9 * *", NOW)
+    with pytest.raises(ValueError):
+        next_cron_time("0 0 31 2 *", NOW)
+
+
+def test_jitter_is_stable_per_entry_and_bounded():
+    period = timedelta(hours=1)
+    assert schedule_jitter(7, period) == schedule_jitter(7, period)
+    jitters = {schedule_jitter(entry_id, period) for entry_id in range(50)}
+    assert len(jitters) > 1
+    assert all(timedelta() <= j < timedelta(seconds=min(SCHEDULER_MAX_JITTER_SECONDS, 360)) for j in jitters)
+    assert schedule_jitter(7, timedelta(seconds=5)) == timedelta()
+
+
+def test_compute_next_run():
+    interval = VerificationSettings(website_entry_id=3, schedule_interval_minutes=60)
+    assert NOW + timedelta(hours=1) <= compute_next_run(interval, NOW) < NOW + timedelta(hours=1, minutes=6)
+    cron = VerificationSettings(website_entry_id=3, schedule_cron="0 9 * * *")
+    assert datetime(2026, 3, 2, 9, 0, tzinfo=timezone.utc) <= compute_next_run(cron, NOW)
+    assert compute_next_run(VerificationSettings(website_entry_id=3), NOW) is None
+
+
+def test_page_content_ignores_inline_markup_and_lists_assets():
+    html = b"""<html><head><link rel="stylesheet" href="/app.css"><script nonce="abc">var csrf = "1";</script>
+        <script src="https://cdn.example.net/lib.js"></script></head><body><p>Hello   world</p></body></html>"""
+    text, assets = page_content(html, "https://example.com/pricing")
+    assert text == "Hello world"
+    assert assets == ["https://cdn.example.net/lib.js", "https://example.com/app.css"]
+    same, _ = page_content(html.replace(b'nonce="abc"', b'nonce="xyz"').replace(b'"1"', b'"2"'), "https://example.com/pricing")
+    assert same == text
+
+
+class FakeResponse:
+    def __init__(self, url: str, content: bytes = b"", headers: dict | None = None, status_code: int = 200):
+        self.url, self.content, self.headers, self.status_code = url, content, headers or {}, status_code
+
+    def raise_for_status(self) -> None:
+        if self.status_code >= 400:
+            raise scheduler.requests.HTTPError(self.status_code)
+
+
+@pytest.fixture
+def site(monkeypatch):
+    """A fake site: page HTML by URL and asset ETags by URL, editable by the test."""
+    pages = {
+        "https://example.com": b'<html><head><script src="https://cdn.example.net/widget.js"></script></head><body>Home</body></html>',
+        "https://example.com/pricing": b"<html><body>Plans</body></html>",
+    }
+    etags = {"https://cdn.example.net/widget.js": '"v1"'}
+    monkeypatch.setattr(scheduler.requests, "get", lambda url, **kwargs: FakeResponse(url, pages[url]))
+    monkeypatch.setattr(scheduler.requests, "head", lambda url, **kwargs: FakeResponse(url, headers={"etag": etags[url]}))
+    return pages, etags
+
+
+def test_content_hash_covers_assets_and_other_pages(site):
+    pages, etags = site
+    urls = ["https://example.com/pricing"]
+    baseline = fetch_content_hash("https://example.com", urls)
+    assert fetch_content_hash("https://example.com", urls) == baseline
+    etags["https://cdn.example.net/widget.js"] = '"v2"'
+    after_script_change = fetch_content_hash("https://example.com", urls)
+    assert after_script_change != baseline
+    pages["https://example.com/pricing"] = b"<html><body>New plans</body></html>"
+    assert fetch_content_hash("https://example.com", urls) != after_script_change
+
+
+def test_should_skip():
+    recent = NOW - timedelta(hours=1)
+    assert should_skip("h", "h", recent, NOW)
+    assert should_skip("h", "h", recent.replace(tzinfo=None), NOW)
+    assert not should_skip("h", "other", recent, NOW)
+    assert not should_skip("", "", recent, NOW)
+    assert not should_skip("h", "h", None, NOW)
+    assert not should_skip("h", "h", NOW - timedelta(seconds=SCHEDULER_MAX_SKIP_SECONDS + 1), NOW)
+
+
+@pytest.fixture
+def scheduled(engine, entry, monkeypatch):
+    """Scheduled settings for the entry, with the content check and the verification run faked."""
+    with Session(engine) as session:
+        settings = VerificationSettings(website_entry_id=entry.id, enabled=True, schedule_interval_minutes=60)
+        session.add(settings)
+        session.commit()
+        settings_id = settings.id
+    runs = []
+
+    async def fake_run_verification(entry_id, github_token, engine, *args, **kwargs):
+        runs.append(entry_id)
+
+    monkeypatch.setattr(scheduler, "fetch_content_hash", lambda website_url, page_urls: "hash-1")
+    monkeypatch.setattr(scheduler, "run_verification", fake_run_verification)
+    return settings_id, runs
+
+
+def run_and_reload(settings_id, engine) -> VerificationSettings:
+    asyncio.run(run_scheduled_verification(settings_id, engine))
+    with Session(engine) as session:
+        return session.get(VerificationSettings, settings_id)
+
+
+def test_scheduled_run_skips_an_unchanged_site(engine, scheduled):
+    settings_id, runs = scheduled
+    first = run_and_reload(settings_id, engine)
+    assert len(runs) == 1 and first.last_content_hash == "hash-1" and first.last_verified_at is not None
+    second = run_and_reload(settings_id, engine)
+    assert len(runs) == 1
+    assert second.last_verified_at == first.last_verified_at
+
+
+def test_scheduled_run_is_forced_once_the_last_full_run_is_too_old(engine, scheduled):
+    settings_id, runs = scheduled
+    run_and_reload(settings_id, engine)
+    with Session(engine) as session:
+        settings = session.get(VerificationSettings, settings_id)
+        settings.last_verified_at = datetime.now(timezone.utc) - timedelta(seconds=SCHEDULER_MAX_SKIP_SECONDS + 60)
+        session.commit()
+    run_and_reload(settings_id, engine)
+    assert len(runs) == 2
+
+
+def test_scheduled_run_runs_when_the_check_fails(engine, scheduled, monkeypatch):
+    settings_id, runs = scheduled
+    run_and_reload(settings_id, engine)
+
+    def unreachable(website_url, page_urls):
+        raise scheduler.requests.ConnectionError()
+
+    monkeypatch.setattr(scheduler, "fetch_content_hash", unreachable)
+    run_and_reload(settings_id, engine)
+    assert len(runs) == 2
@@ -0,0 +1,38 @@
+from site_resources import ResourceRecord, cache_lifetime, is_third_party, summarize_resources
+
+
+def record(url, resource_type="script", size=2048, status=200, page="https://example.com/", **headers):
+    return ResourceRecord(page=page, url=url, resource_type=resource_type, status=status, size=size, headers=headers)
+
+
+def test_third_party_hosts():
+    assert not is_third_party("https://example.com/app.js", "example.com")
+    assert not is_third_party("https://cdn.example.com/app.js", "example.com")
+    assert is_third_party("https://notexample.com/app.js", "example.com")
+    assert is_third_party("https://fonts.gstatic.com/a.woff2", "example.com")
+
+
+def test_cache_lifetime():
+    assert cache_lifetime({"cache-control": "public, max-age=600"}) == 600
+    assert cache_lifetime({"cache-control": "max-age=60, s-maxage=3600"}) == 60
+    assert cache_lifetime({"cache-control": "no-cache"}) == 0
+    assert cache_lifetime({"etag": '"abc"'}) is None
+
+
+def test_summary_reports_compression_caching_duplicates_and_errors():
+    records = [
+        record("https://example.com/app.js?v=1", **{"cache-control": "max-age=31536000", "content-encoding": "br"}),
+        record("https://example.com/app.js?v=2", **{"cache-control": "max-age=31536000", "content-encoding": "br"}),
+        record("https://example.com/style.css", "stylesheet", **{"cache-control": "max-age=300"}),
+        record("https://example.com/logo.png", "image", size=512),
+        record("https://cdn.other.net/lib.js", size=4096, **{"cache-control": "max-age=86400", "content-encoding": "gzip"}),
+        record("https://example.com/missing.js", status=404, size=100),
+    ]
+    summary = summarize_resources(records, ["https://example.com/"], "example.com")
+    assert summary.startswith("Analyzed 1 pages, 6 responses, 11 KB transferred")
+    assert "Third-party: 4 KB from 1 hosts (cdn.other.net 4 KB)" in summary
+    assert "Uncompressed text responses (1):\n- https://example.com/style.css (2 KB)" in summary
+    assert "- https://example.com/style.css (max-age=300)" in summary
+    assert "- https://example.com/logo.png (no Cache-Control, ETag or Last-Modified)" in summary
+    assert "- https://example.com/app.js (2 URL variants)" in summary
+    assert "Failed responses (1):\n- 404 https://example.com/missing.js" in summary
@@ -0,0 +1,68 @@
+from datetime import datetime, timedelta, timezone
+
+from sqlmodel import Session, select
+
+from models import SnapshotChunk
+import snapshots
+from snapshots import diff_snapshot, get_snapshot, load_chunks, prune_chunks, save_snapshot, split_sections
+
+PAGE = "\n".join(f"Paragraph {i} about the product and its pricing." for i in range(200))
+
+
+def test_sections_are_content_defined():
+    sections = split_sections(PAGE)
+    assert "\n".join(sections) == PAGE
+    assert len(sections) > 5
+    assert all(len(s) <= snapshots.MAX_SECTION_CHARS + 100 for s in sections)
+    # Inserting a line only changes the sections around it; later boundaries stay where they were.
+    edited = split_sections(PAGE.replace("Paragraph 50 ", "New intro line.\nParagraph 50 "))
+    assert len(set(sections) - set(edited)) <= 2
+    assert sections[-3:] == edited[-3:]
+
+
+def test_chunks_are_stored_once_across_pages(engine, entry):
+    sections = split_sections(PAGE)
+    with Session(engine) as session:
+        save_snapshot(session, entry.id, "https://example.com/", sections, {}, "dom")
+        save_snapshot(session, entry.id, "https://example.com/copy", sections, {}, "dom")
+        stored = session.exec(select(SnapshotChunk.hash)).all()
+        assert len(stored) == len(set(sections))
+        snapshot = get_snapshot(session, entry.id, "https://example.com/copy")
+        hashes = snapshot.chunk_hashes.split("\n")
+        assert [load_chunks(session, hashes)[h] for h in hashes] == sections
+
+
+def test_diff_quotes_only_changed_sections(engine, entry):
+    sections = split_sections(PAGE)
+    with Session(engine) as session:
+        save_snapshot(session, entry.id, "https://example.com/", sections, {"title": "Home"}, "dom")
+        previous = get_snapshot(session, entry.id, "https://example.com/")
+        assert diff_snapshot(session, previous, sections, {"title": "Home"}, "dom").startswith("Unchanged since last run")
+
+        changed = sections[:-1] + ["Brand new closing section."]
+        diff = diff_snapshot(session, previous, changed, {"title": "Welcome"}, "dom2")
+        assert "DOM structure changed." in diff
+        assert "- title: Home -> Welcome" in diff
+        assert f"[{len(sections) - 1} sections unchanged since last run]" in diff
+        assert "[new or changed]\nBrand new closing section." in diff
+        assert sections[0] not in diff
+
+        removed = diff_snapshot(session, previous, sections[1:], {"title": "Home"}, "dom")
+        assert f"[1 sections removed, starting: {sections[0].split(chr(10))[0]!r}]" in removed
+
+
+def test_prune_deletes_only_unreferenced_old_chunks(engine, entry, monkeypatch):
+    monkeypatch.setattr(snapshots, "chunks_pruned_at", 0.0)
+    with Session(engine) as session:
+        save_snapshot(session, entry.id, "https://example.com/", ["kept section"], {}, "dom")
+        save_snapshot(session, entry.id, "https://example.com/old", ["orphaned section"], {}, "dom")
+        save_snapshot(session, entry.id, "https://example.com/old", ["recent orphan"], {}, "dom")
+        for chunk in session.exec(select(SnapshotChunk)).all():
+            if chunk.hash != snapshots.content_hash("recent orphan"):
+                chunk.last_used_at = datetime.now(timezone.utc) - timedelta(days=2)
+        session.commit()
+
+    prune_chunks(engine)
+    with Session(engine) as session:
+        remaining = set(session.exec(select(SnapshotChunk.hash)).all())
+    assert remaining == {snapshots.content_hash("kept section"), snapshots.content_hash("recent orphan")}
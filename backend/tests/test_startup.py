@@ -0,0 +1,7 @@
+from bench.startup import DEFERRED_MODULES, environment, time_import
+
+
+def test_main_defers_the_agent_stack(tmp_path):
+    # The cold-start regression check from bench/startup.py: the agent stack loads with the first run, not with `main`.
+    result = time_import("main", environment(str(tmp_path)))
+    assert result["loaded"] == [], f"main imports {result['loaded']} eagerly; expected none of {DEFERRED_MODULES}"
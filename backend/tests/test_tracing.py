@@ -0,0 +1,118 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, LLMResult
+from sqlmodel import Session, select
+from uuid import uuid4
+
+import repo
+from agent_tracing import AgentTracingHandler
+from artifacts import ArtifactStore
+from models import WebsiteEntry
+from tracing import Tracer, instrument_engine, tracer
+
+
+def test_spans_nest_and_record_errors(spans):
+    with tracer.span("outer", kind="test") as outer:
+        with tracer.span("inner"):
+            pass
+        with pytest.raises(RuntimeError):
+            with tracer.span("failing"):
+                raise RuntimeError("boom")
+    by_name = {span.name: span for span in spans}
+    assert by_name["inner"].parent_id == outer.span_id and by_name["inner"].trace_id == outer.trace_id
+    assert by_name["failing"].status == "error"
+    assert by_name["outer"].parent_id is None and by_name["outer"].attributes == {"kind": "test"}
+    assert [span.name for span in spans] == ["inner", "failing", "outer"]
+
+
+def test_activated_span_parents_spans_across_calls(spans):
+    root = tracer.start_span("agent.run")
+    token = tracer.activate(root)
+    try:
+        with tracer.span("tool.fetch_page"):
+            pass
+    finally:
+        tracer.deactivate(token)
+    tracer.end_span(root)
+    assert spans[0].parent_id == root.span_id
+
+
+def test_db_spans_nest_under_the_current_span(engine, entry, spans):
+    instrument_engine(engine)
+    with tracer.span("agent.run") as root:
+        with Session(engine) as session:
+            session.exec(select(WebsiteEntry)).all()
+    queries = [span for span in spans if span.name == "db.query"]
+    sessions = [span for span in spans if span.name == "db.session"]
+    assert queries and all(span.parent_id == root.span_id for span in queries)
+    assert queries[0].attributes["operation"] == "SELECT"
+    assert len(sessions) == 1 and sessions[0].parent_id == root.span_id
+
+
+def test_render_metrics():
+    local = Tracer()
+    local.exporters = []
+    local.end_span(local.start_span("tool.fetch_page"))
+    local.increment("webster_llm_tokens_total", "input_tokens", 120)
+    metrics = local.render_metrics()
+    assert 'webster_span_duration_ms_count{span="tool.fetch_page"} 1' in metrics
+    assert 'webster_span_duration_ms_bucket{span="tool.fetch_page",le="+Inf"} 1' in metrics
+    assert "# TYPE webster_llm_tokens_total counter" in metrics
+    assert 'webster_llm_tokens_total{kind="input_tokens"} 120' in metrics
+
+
+def test_metrics_endpoint_requires_the_token():
+    import main
+
+    client = TestClient(main.api)
+    assert client.get("/metrics").status_code == 404
+    assert client.get("/metrics", headers={"Authorization": "Bearer wrong"}).status_code == 404
+    response = client.get("/metrics", headers={"Authorization": "Bearer test-metrics-token"})
+    assert response.status_code == 200 and "webster_span_duration_ms" in response.text
+
+
+def test_llm_spans_record_token_usage(spans):
+    root = tracer.start_span("agent.run")
+    handler = AgentTracingHandler(root)
+    run_id = uuid4()
+    handler.on_chat_model_start({}, [], run_id=run_id, metadata={"ls_model_name": "gpt-test"})
+    message = AIMessage("hi", usage_metadata={
+        "input_tokens": 100, "output_tokens": 20, "total_tokens": 120, "input_token_details": {"cache_read": 64},
+    })
+    handler.on_llm_end(LLMResult(generations=[[ChatGeneration(message=message)]]), run_id=run_id)
+    span = next(span for span in spans if span.name == "llm.gpt-test")
+    assert span.parent_id == root.span_id
+    assert span.attributes == {"model": "gpt-test", "input_tokens": 100, "output_tokens": 20, "cached_tokens": 64}
+
+
+def test_artifact_spans_record_cache_outcomes(spans):
+    store = ArtifactStore(max_bytes=1_000_000, retention_seconds=3600)
+    computed = []
+
+    async def compute():
+        computed.append(1)
+        await asyncio.sleep(0.01)
+        return "page"
+
+    async def main():
+        # Two overlapping runs share one computation; a later run reuses the stored result.
+        await asyncio.gather(store.share("example.com", "render", "/", compute, 0), store.share("example.com", "render", "/", compute, 0))
+        await store.share("example.com", "render", "/", compute, 0)
+
+    asyncio.run(main())
+    assert len(computed) == 1
+    outcomes = [span.attributes["cache"] for span in spans if span.name == "artifact.share"]
+    assert sorted(outcomes) == ["hit", "joined", "miss"]
+
+
+def test_repo_spans_record_cache_outcomes(github, spans):
+    tree = repo.get_tree(github.repo, "main", github.token)
+    repo.read_blobs(github.repo, list(tree.files.values()), github.token)
+    repo.get_tree(github.repo, "main", github.token)
+    repo.read_blobs(github.repo, list(tree.files.values()), github.token)
+    assert [span.attributes["cache"] for span in spans if span.name == "repo.tree"] == ["miss", "hit"]
+    blob_spans = [span.attributes for span in spans if span.name == "repo.blobs"]
+    assert [(a["hits"], a["misses"]) for a in blob_spans] == [(0, 2), (2, 0)]
@@ -0,0 +1,55 @@
+import pytest
+
+from verification import collect_changed_files, filter_changes_in_scope, parse_paths_in_scope, path_in_scope
+
+
+@pytest.mark.parametrize("path, pattern, expected", [
+    # "**/" matches zero or more directories.
+    ("src/a.css", "src/**/*.css", True),
+    ("src/ui/a.css", "src/**/*.css", True),
+    ("src/ui/forms/a.css", "src/**/*.css", True),
+    ("src/a.ts", "src/**/*.css", False),
+    ("lib/src/a.css", "src/**/*.css", False),
+    ("a.css", "**/*.css", True),
+    ("styles/a.css", "**/*.css", True),
+    # "*" stays within one segment, but a pattern naming a directory covers what is beneath it.
+    ("src/a.css", "src/*.css", True),
+    ("src/ui/a.css", "src/*.css", False),
+    ("src/ui/a.css", "src/*", True),
+    ("src/ui/a.css", "src/**", True),
+    ("README.md", "*.md", True),
+    ("docs/README.md", "*.md", False),
+    # Plain routes match files whose path contains the route as consecutive segments.
+    ("app/checkout/page.tsx", "/checkout", True),
+    ("pages/checkout.tsx", "/checkout", True),
+    ("pages/checkout/success.tsx", "/checkout/success", True),
+    ("pages/checkouts.tsx", "/checkout", False),
+    ("app/account/page.tsx", "/checkout", False),
+    # Leading and trailing slashes are ignored.
+    ("app/checkout/page.tsx", "/checkout/", True),
+    ("src/ui/a.css", "src/", True),
+    ("src/ui/a.css", "/src/**/*.css/", True),
+    ("anything.txt", "/", True),
+])
+def test_path_in_scope(path, pattern, expected):
+    assert path_in_scope(path, pattern) is expected
+
+
+def test_parse_paths_in_scope():
+    assert parse_paths_in_scope(" /checkout, src/**/*.css\n\n/cart ,") == ["/checkout", "src/**/*.css", "/cart"]
+
+
+def test_collect_changed_files_keeps_the_last_change():
+    commits = [
+        {"added": ["a.css", "b.css"], "modified": [], "removed": []},
+        {"added": [], "modified": ["a.css"], "removed": ["b.css"]},
+    ]
+    assert collect_changed_files(commits) == {"added": [], "modified": ["a.css"], "removed": ["b.css"]}
+
+
+def test_filter_changes_in_scope():
+    changes = {"added": ["src/a.css", "README.md"], "modified": ["app/checkout/page.tsx"], "removed": []}
+    assert filter_changes_in_scope(changes, ["src/**/*.css", "/checkout"]) == {
+        "added": ["src/a.css"], "modified": ["app/checkout/page.tsx"], "removed": [],
+    }
+    assert filter_changes_in_scope(changes, []) == changes
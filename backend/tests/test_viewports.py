@@ -0,0 +1,44 @@
+from viewports import DEVICES, format_viewport_report, layout_findings, viewport_meta_findings
+
+
+def layout(**overrides):
+    return {
+        "scrollWidth": 390, "viewportWidth": 390, "overflowing": [], "targets": [],
+        "smallChars": 0, "totalChars": 1000, "smallText": [],
+    } | overrides
+
+
+def test_viewport_meta():
+    assert viewport_meta_findings("width=device-width, initial-scale=1") == []
+    assert viewport_meta_findings(None)[0][0] == "error"
+    findings = [finding for _, finding, _ in viewport_meta_findings("width=980; user-scalable=no, maximum-scale=1")]
+    assert findings == [
+        "Viewport meta does not set width=device-width (width=980; user-scalable=no, maximum-scale=1)",
+        "Viewport meta disables zooming with user-scalable=no",
+        "Viewport meta limits zoom to maximum-scale=1",
+    ]
+
+
+def test_layout_findings_depend_on_the_device():
+    overflow = layout(scrollWidth=600, overflowing=["div.hero"], targets=["a.close"])
+    assert [severity for severity, _, _ in layout_findings(DEVICES["mobile"], overflow)] == ["error", "warning"]
+    # Desktop pointers are precise: small targets are not reported there.
+    assert [severity for severity, _, _ in layout_findings(DEVICES["desktop"], overflow)] == ["warning"]
+    small = layout(smallChars=500, smallText=["p.legal"])
+    assert layout_findings(DEVICES["mobile"], small) == [("warning", "50% of the text is smaller than 12px", ["p.legal"])]
+    assert layout_findings(DEVICES["desktop"], small)[0][0] == "info"
+
+
+def test_report_has_one_section_per_device():
+    report = format_viewport_report("https://example.com/", {
+        "mobile": [("error", "Page scrolls horizontally", ["div.a", "div.b", "div.c", "div.d"])],
+        "tablet": [],
+        "desktop": "timeout",
+    }, 1200)
+    assert report.splitlines() == [
+        "Responsive checks of https://example.com/ in 3 viewports (1200 ms):",
+        "mobile (390x844):",
+        "- [error] Page scrolls horizontally: div.a; div.b; div.c (+1 more)",
+        "tablet (820x1180): no issues found",
+        "desktop (1440x900): failed to load: timeout",
+    ]
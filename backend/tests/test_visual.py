@@ -0,0 +1,84 @@
+import zlib
+
+import numpy as np
+from sqlmodel import Session, select
+
+from models import VisualSnapshot
+from visual import (
+    Capture, changed_regions, describe_regions, diff_visual_snapshot, get_visual_snapshot, hash_distance, perceptual_hash,
+    save_visual_snapshot,
+)
+
+
+def page(height: int = 400, width: int = 240) -> np.ndarray:
+    pixels = np.full((height, width), 255, dtype=np.uint8)
+    pixels[20:60, 20:220] = 30  # header
+    pixels[100:300:8, 20:200] = 80  # lines of text
+    return pixels
+
+
+def test_identical_and_noisy_screenshots_have_no_regions():
+    old = page()
+    assert changed_regions(old, old.copy()) == []
+    noisy = (old.astype(np.int16) + np.random.default_rng(0).integers(-20, 20, old.shape)).clip(0, 255).astype(np.uint8)
+    assert changed_regions(old, noisy) == []
+
+
+def test_neighbouring_changes_form_one_region_largest_first():
+    old, new = page(), page()
+    new[100:300:8, 20:200] = 255  # the paragraph disappears
+    new[360:372, 200:212] = 0  # a small badge appears
+    regions = changed_regions(old, new)
+    assert len(regions) == 2
+    paragraph, badge = regions
+    assert (paragraph.top, paragraph.left) == (96, 16) and paragraph.bottom >= 296
+    assert paragraph.changed_pixels == 25 * 180
+    assert badge.changed_pixels == 144
+    assert badge.css_box(2.0) == {"x": 384, "y": 704, "width": 64, "height": 64}
+
+
+def test_tiny_changes_are_ignored():
+    old, new = page(), page()
+    new[200:204, 230:234] = 0
+    assert changed_regions(old, new) == []
+
+
+def test_perceptual_hash_distance():
+    gradient = np.tile(np.arange(240, dtype=np.uint8), (400, 1))
+    assert hash_distance(perceptual_hash(gradient), perceptual_hash(gradient.copy())) == 0
+    # Brightness rising left to right against falling: every bit differs.
+    assert hash_distance(perceptual_hash(gradient), perceptual_hash(gradient[:, ::-1].copy())) == 64
+
+
+def test_baseline_is_upserted_and_diffed(engine, entry):
+    url = "https://example.com/"
+    old, new = page(), page()
+    new[20:60, 20:220] = 200
+    with Session(engine) as session:
+        save_visual_snapshot(session, entry.id, url, "default", Capture(old, 2.0))
+        previous = get_visual_snapshot(session, entry.id, url, "default")
+        assert diff_visual_snapshot(previous, Capture(old.copy(), 2.0)) == ([], [])
+
+        capture = Capture(new, 2.0, boxes=[["body", 0, 0, 480, 800], ['header.top "Welcome"', 32, 32, 420, 100]])
+        regions, notes = diff_visual_snapshot(previous, capture)
+        assert len(regions) == 1
+        assert notes[0].startswith("overall perceptual distance")
+        assert describe_regions(capture, regions)[0].endswith(': header.top "Welcome"')
+
+        save_visual_snapshot(session, entry.id, url, "default", capture)
+        assert len(session.exec(select(VisualSnapshot)).all()) == 1
+        session.expire_all()
+        assert get_visual_snapshot(session, entry.id, url, "default").pixels_hash == capture.pixels_hash
+
+
+def test_size_changes_are_reported():
+    old = page()
+    previous = VisualSnapshot(
+        website_entry_id=1, url="https://example.com/", device="default", width=240, height=400, scale=2.0,
+        phash=perceptual_hash(old), pixels_hash="old", data=zlib.compress(old.tobytes()),
+    )
+
+    regions, notes = diff_visual_snapshot(previous, Capture(page(width=200), 2.0))
+    assert regions == [] and notes == ["viewport width changed from 480px to 400px, so the screenshots were not compared"]
+    regions, notes = diff_visual_snapshot(previous, Capture(page(height=600), 2.0))
+    assert regions == [] and notes[0] == "page height changed from 800px to 1200px"
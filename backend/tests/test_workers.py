@@ -0,0 +1,50 @@
+import asyncio
+import os
+
+import pytest
+
+import workers
+
+
+def die_once(payload: dict, events, cancelled) -> None:
+    """Stands in for process_job: the first attempt is killed like an OOM-killed worker."""
+    if not os.path.exists(payload["marker"]):
+        open(payload["marker"], "w").close()
+        os._exit(1)
+    events.put(("event", {"type": "done", "content": "ok"}))
+    events.put(("end", None))
+
+
+def always_die(payload: dict, events, cancelled) -> None:
+    os._exit(1)
+
+
+@pytest.fixture
+def process_executor(monkeypatch):
+    monkeypatch.setattr(workers, "AGENT_WORKER_PROCESSES", 1)
+    monkeypatch.setattr(workers, "EVENT_POLL_SECONDS", 0.1)
+    yield
+    workers.shutdown_workers()
+
+
+def collect(payload: dict) -> list[dict]:
+    async def run():
+        return [event async for event in workers.run_in_process(payload)]
+    return asyncio.run(run())
+
+
+def test_dead_worker_is_replaced_and_the_run_retried(process_executor, monkeypatch, tmp_path):
+    monkeypatch.setattr(workers, "process_job", die_once)
+    payload = {"website_entry_id": 1, "run_id": "run-1", "marker": str(tmp_path / "died")}
+    assert collect(payload) == [{"type": "done", "content": "ok"}]
+    # Later runs get the healthy pool.
+    pool = workers.process_pool
+    assert collect(payload) == [{"type": "done", "content": "ok"}]
+    assert workers.process_pool is pool
+
+
+def test_run_fails_after_its_retry(process_executor, monkeypatch):
+    monkeypatch.setattr(workers, "process_job", always_die)
+    with pytest.raises(RuntimeError, match="Agent worker process failed"):
+        collect({"website_entry_id": 1, "run_id": "run-1"})
+    assert workers.process_pool is None
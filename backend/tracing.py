@@ -0,0 +1,187 @@
+from contextlib import contextmanager
+from contextvars import ContextVar, Token
+from dataclasses import dataclass, field
+from typing import Any, Iterator
+from sqlalchemy import Engine, event
+from sqlmodel import Session
+import logging
+import secrets
+import time
+import weakref
+
+logger = logging.getLogger(__name__)
+
+DURATION_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000, 120000)
+
+
+@dataclass
+class Span:
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: str | None
+    start: float
+    end: float | None = None
+    status: str = "ok"
+    attributes: dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def duration_ms(self) -> float:
+        return ((self.end or time.perf_counter()) - self.start) * 1000
+
+
+class InMemoryExporter:
+    def __init__(self):
+        self.spans: list[Span] = []
+
+    def export(self, span: Span) -> None:
+        self.spans.append(span)
+
+    def clear(self) -> None:
+        self.spans.clear()
+
+
+class LoggingExporter:
+    def __init__(self, skipped: frozenset[str] = frozenset({"db.query"})):
+        # Per-query spans are too many to log; their durations still reach the histograms.
+        self.skipped = skipped
+
+    def export(self, span: Span) -> None:
+        if span.name in self.skipped:
+            return
+        logger.debug(
+            "Span %s trace_id=%s span_id=%s parent_id=%s status=%s duration_ms=%.1f attributes=%s",
+            span.name, span.trace_id, span.span_id, span.parent_id, span.status, span.duration_ms, span.attributes,
+        )
+
+
+class Histogram:
+    def __init__(self, buckets: tuple[float, ...] = DURATION_BUCKETS_MS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+        self.total += value
+        self.count += 1
+
+
+current_span: ContextVar[Span | None] = ContextVar("current_span", default=None)
+
+
+class Tracer:
+    def __init__(self):
+        self.exporters: list = [LoggingExporter()]
+        self.durations: dict[str, Histogram] = {}
+        self.counters: dict[tuple[str, str], float] = {}
+
+    def add_exporter(self, exporter) -> None:
+        self.exporters.append(exporter)
+
+    def remove_exporter(self, exporter) -> None:
+        self.exporters.remove(exporter)
+
+    def start_span(self, name: str, parent: Span | None = None, **attributes) -> Span:
+        parent = parent or current_span.get()
+        return Span(
+            name=name,
+            trace_id=parent.trace_id if parent else secrets.token_hex(16),
+            span_id=secrets.token_hex(8),
+            parent_id=parent.span_id if parent else None,
+            start=time.perf_counter(),
+            attributes=attributes,
+        )
+
+    def end_span(self, span: Span, status: str = "ok") -> None:
+        span.end = time.perf_counter()
+        span.status = status
+        self.durations.setdefault(span.name, Histogram()).observe(span.duration_ms)
+        for exporter in self.exporters:
+            exporter.export(span)
+
+    def activate(self, span: Span) -> Token:
+        """Make `span` the parent of spans started in this context, e.g. across an async generator's yields."""
+        return current_span.set(span)
+
+    def deactivate(self, token: Token) -> None:
+        try:
+            current_span.reset(token)
+        except ValueError:
+            # An async generator finalized from another context (e.g. by the GC) has nothing to restore.
+            pass
+
+    @contextmanager
+    def span(self, name: str, **attributes) -> Iterator[Span]:
+        span = self.start_span(name, **attributes)
+        token = current_span.set(span)
+        status = "ok"
+        try:
+            yield span
+        except BaseException:
+            status = "error"
+            raise
+        finally:
+            current_span.reset(token)
+            self.end_span(span, status)
+
+    def increment(self, name: str, label: str, value: float = 1) -> None:
+        self.counters[(name, label)] = self.counters.get((name, label), 0) + value
+
+    def render_metrics(self) -> str:
+        lines = [
+            "# HELP webster_span_duration_ms Span durations in milliseconds.",
+            "# TYPE webster_span_duration_ms histogram",
+        ]
+        for name, hist in sorted(self.durations.items()):
+            for bound, count in zip(hist.buckets, hist.counts):
+                lines.append(f'webster_span_duration_ms_bucket{{span="{name}",le="{bound}"}} {count}')
+            lines.append(f'webster_span_duration_ms_bucket{{span="{name}",le="+Inf"}} {hist.count}')
+            lines.append(f'webster_span_duration_ms_sum{{span="{name}"}} {hist.total:.3f}')
+            lines.append(f'webster_span_duration_ms_count{{span="{name}"}} {hist.count}')
+        for counter in sorted({name for name, _ in self.counters}):
+            lines.append(f"# TYPE {counter} counter")
+            for (name, label), value in sorted(self.counters.items()):
+                if name == counter:
+                    lines.append(f'{name}{{kind="{label}"}} {value:g}')
+        return "\n".join(lines) + "\n"
+
+
+tracer = Tracer()
+instrumented_engines: weakref.WeakSet[Engine] = weakref.WeakSet()
+
+
+@event.listens_for(Session, "after_transaction_create")
+def after_transaction_create(session, transaction):
+    # One span per session transaction, from its first statement to its commit, rollback or close.
+    if transaction.parent is None and session.bind in instrumented_engines:
+        session.info["session_span"] = tracer.start_span("db.session")
+
+
+@event.listens_for(Session, "after_transaction_end")
+def after_transaction_end(session, transaction):
+    if transaction.parent is None and (span := session.info.pop("session_span", None)):
+        tracer.end_span(span)
+
+
+def instrument_engine(engine: Engine) -> None:
+    instrumented_engines.add(engine)
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_spans", []).append(
+            tracer.start_span("db.query", operation=statement.split(None, 1)[0].upper())
+        )
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        tracer.end_span(conn.info["query_spans"].pop())
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(context):
+        spans = context.connection.info.get("query_spans") if context.connection else None
+        if spans:
+            tracer.end_span(spans.pop(), "error")
@@ -1,25 +1,52 @@
-from langchain_core.messages import AIMessage, HumanMessage
 from sqlmodel import Session, select
-from sqlalchemy import Engine
+from sqlalchemy import Engine, func
+from dataclasses import dataclass, field
+from functools import lru_cache
+from pathlib import PurePosixPath
+from typing import Awaitable, Callable
+import asyncio
+import glob
+import json
+import re
 import requests
 import secrets
+import uuid
 
-from agent import run_agent
-from constants import BACKEND_URL
-from models import Diagnostic, Message, VerificationSettings, WebsiteEntry
+from constants import BACKEND_URL, GITHUB_API_URL, VERIFICATION_CONCURRENCY
+from jobs import create_job, job_budget_limits, run_job, save_answer, set_job
+from models import AgentJob, Diagnostic, Message, VerificationSettings, WebsiteEntry
+from snapshots import list_snapshot_urls
+from tracing import tracer
+from workers import build_payload, stream_agent_run
 
 
 SEVERITY_ORDER = {"info": 0, "warning": 1, "error": 2}
 
 GH_HEADERS = {"Accept": "application/vnd.github+json"}
 
+CHANGE_KINDS = ("added", "modified", "removed")
+MAX_MANIFEST_FILES = 50
+MAX_SNAPSHOT_URLS_IN_PROMPT = 30
+
+# Shared by webhook-triggered and scheduled runs so neither can exhaust the container.
+verification_slots = asyncio.Semaphore(VERIFICATION_CONCURRENCY)
+
+
+@dataclass
+class VerificationResult:
+    conclusion: str = ""
+    # (severity, short_desc) of every diagnostic the run reported, whatever the notification threshold.
+    diagnostics: list[tuple[str, str]] = field(default_factory=list)
+    # Summed over the verification run and the fix runs it started.
+    usage: dict = field(default_factory=dict)
+
 
 def register_github_webhook(repo_name: str, github_token: str) -> tuple[int, str]:
     if not BACKEND_URL:
         raise RuntimeError("BACKEND_URL is not configured")
     webhook_secret = secrets.token_hex(32)
     response = requests.post(
-        f"https://api.github.com/repos/{repo_name}/hooks",
+        f"{GITHUB_API_URL}/repos/{repo_name}/hooks",
         json={
             "name": "web",
             "active": True,
@@ -38,19 +65,170 @@ def register_github_webhook(repo_name: str, github_token: str) -> tuple[int, str
 
 def deregister_github_webhook(repo_name: str, webhook_id: int, github_token: str) -> None:
     requests.delete(
-        f"https://api.github.com/repos/{repo_name}/hooks/{webhook_id}",
+        f"{GITHUB_API_URL}/repos/{repo_name}/hooks/{webhook_id}",
         headers={"Authorization": f"Bearer {github_token}", **GH_HEADERS},
     )
 
 
-async def run_verification(entry_id: int, github_token: str, engine: Engine) -> None:
+def parse_paths_in_scope(paths_in_scope: str) -> list[str]:
+    return [p.strip() for p in paths_in_scope.replace("\n", ",").split(",") if p.strip()]
+
+
+def collect_changed_files(commits: list[dict]) -> dict[str, list[str]]:
+    # Later commits win, so a file added then removed in the same push is reported as removed.
+    latest: dict[str, str] = {}
+    for commit in commits:
+        for kind in CHANGE_KINDS:
+            for path in commit.get(kind, []):
+                latest[path] = kind
+    changes: dict[str, list[str]] = {kind: [] for kind in CHANGE_KINDS}
+    for path, kind in latest.items():
+        changes[kind].append(path)
+    return changes
+
+
+@lru_cache(maxsize=256)
+def glob_regex(pattern: str) -> re.Pattern:
+    # "*" stays within one path segment and "**/" matches zero or more directories, so "src/**/*.css"
+    # matches "src/a.css" as well as "src/ui/a.css".
+    return re.compile(glob.translate(pattern, recursive=True, include_hidden=True, seps="/"))
+
+
+def path_in_scope(path: str, pattern: str) -> bool:
+    pattern = pattern.strip("/")
+    if not pattern:
+        return True
+    if any(c in pattern for c in "*?["):
+        # A pattern naming a directory, e.g. "src/*", also covers every file beneath it.
+        return bool(glob_regex(pattern).match(path) or glob_regex(f"{pattern}/**").match(path))
+    # Plain site paths like "/checkout" match any file whose path contains that route as
+    # consecutive segments, e.g. "app/checkout/page.tsx" or "pages/checkout.tsx".
+    wanted = pattern.split("/")
+    file_path = PurePosixPath(path)
+    segments = [*file_path.parent.parts, file_path.stem]
+    return any(segments[i:i + len(wanted)] == wanted for i in range(len(segments) - len(wanted) + 1))
+
+
+def filter_changes_in_scope(changes: dict[str, list[str]], patterns: list[str]) -> dict[str, list[str]]:
+    if not patterns:
+        return changes
+    return {
+        kind: [path for path in paths if any(path_in_scope(path, p) for p in patterns)]
+        for kind, paths in changes.items()
+    }
+
+
+def format_change_manifest(changes: dict[str, list[str]], patterns: list[str]) -> str:
+    lines = []
+    for kind in CHANGE_KINDS:
+        lines += [f"- {kind}: {path}" for path in changes.get(kind, [])]
+    omitted = len(lines) - MAX_MANIFEST_FILES
+    lines = lines[:MAX_MANIFEST_FILES]
+    if omitted > 0:
+        lines.append(f"- ... and {omitted} more")
+    parts = [
+        "This run was triggered by a push. Only re-check the pages and files affected by these changes "
+        "instead of re-analyzing the whole website:",
+        "\n".join(lines),
+    ]
+    if patterns:
+        parts.append(f"Paths in scope: {', '.join(patterns)}")
+    return "\n\n".join(parts)
+
+
+async def run_verification(
+    entry_id: int, github_token: str, engine: Engine, change_manifest: str = "",
+    on_event: Callable[[dict], Awaitable[None]] | None = None, budget_limits: dict | None = None,
+) -> VerificationResult | None:
+    """
+    Verify an entry once a verification slot is free. `on_event` receives the runs' progress
+    events, and `budget_limits` overrides their RunBudget; the token limit covers the
+    verification and its auto-fix runs together.
+    """
+    with tracer.span("verification.run", website_entry_id=entry_id):
+        with tracer.span("verification.queue_wait"):
+            await verification_slots.acquire()
+        try:
+            return await verify_entry(entry_id, github_token, engine, change_manifest, on_event, budget_limits)
+        finally:
+            verification_slots.release()
+
+
+async def resume_verification(job: AgentJob, github_token: str, engine: Engine) -> None:
+    """Finish a verification whose run was interrupted, resuming from its last checkpoint."""
+    with tracer.span("verification.resume", website_entry_id=job.website_entry_id):
+        async with verification_slots:
+            await complete_verification(
+                job, load_history(engine, job.website_entry_id), github_token, engine, budget_limits=job_budget_limits(job)
+            )
+
+
+def load_history(engine: Engine, entry_id: int) -> list[tuple[str, str]]:
+    with Session(engine) as session:
+        msgs = session.exec(
+            select(Message).where(Message.website_entry_id == entry_id).order_by(Message.id)
+        ).all()
+        return [(m.role, m.content) for m in msgs]
+
+
+async def verify_entry(
+    entry_id: int, github_token: str, engine: Engine, change_manifest: str,
+    on_event: Callable[[dict], Awaitable[None]] | None = None, budget_limits: dict | None = None,
+) -> VerificationResult | None:
+    with Session(engine) as session:
+        entry = session.get(WebsiteEntry, entry_id)
+        if not entry:
+            return None
+        user_id = entry.user_id
+        # Diagnostics with a higher id than this were reported by this run.
+        baseline_diagnostic_id = session.exec(
+            select(func.max(Diagnostic.id)).where(Diagnostic.website_entry_id == entry_id)
+        ).one() or 0
+    message_history = load_history(engine, entry_id)
+
+    trigger_content = "Automated verification: analyze this website for issues."
+    if change_manifest:
+        trigger_content += f"\n\n{change_manifest}"
+    with Session(engine) as session:
+        snapshot_urls = list_snapshot_urls(session, entry_id)
+    if snapshot_urls:
+        trigger_content += (
+            "\n\nPages read in earlier runs (fetch_page reports only what changed since then, in text and appearance): "
+            + ", ".join(snapshot_urls[:MAX_SNAPSHOT_URLS_IN_PROMPT])
+        )
+    with Session(engine) as session:
+        session.add(Message(website_entry_id=entry_id, role="human", content=trigger_content, is_automated=True))
+        session.commit()
+    message_history.append(("human", trigger_content))
+
+    job = AgentJob(
+        run_id=uuid.uuid4().hex,
+        kind="verification",
+        website_entry_id=entry_id,
+        user_id=user_id,
+        is_automated=True,
+        change_manifest=change_manifest,
+        baseline_diagnostic_id=baseline_diagnostic_id,
+        budget_limits_json=json.dumps(budget_limits or {}),
+    )
+    create_job(engine, job)
+    return await complete_verification(job, message_history, github_token, engine, on_event, budget_limits)
+
+
+async def complete_verification(
+    job: AgentJob, message_history: list[tuple[str, str]], github_token: str, engine: Engine,
+    on_event: Callable[[dict], Awaitable[None]] | None = None, budget_limits: dict | None = None,
+) -> VerificationResult | None:
+    entry_id = job.website_entry_id
     with Session(engine) as session:
         entry = session.get(WebsiteEntry, entry_id)
+        if not entry:
+            set_job(engine, job.run_id, status="failed")
+            return None
+        # Entries verified on demand (e.g. in a batch) may never have saved settings.
         settings = session.exec(
             select(VerificationSettings).where(VerificationSettings.website_entry_id == entry_id)
-        ).first()
-        if not entry or not settings:
-            return
+        ).first() or VerificationSettings(website_entry_id=entry_id)
 
         website_url = entry.website_url
         repo_name = entry.repo_name
@@ -61,40 +239,35 @@ async def run_verification(entry_id: int, github_token: str, engine: Engine) ->
         notif_auth_value = settings.webhook_auth_header_value
         webhook_format = settings.webhook_format
 
-        existing_ids = {
-            d.id for d in session.exec(
-                select(Diagnostic).where(Diagnostic.website_entry_id == entry_id, Diagnostic.dismissed == False)
-            ).all()
-        }
-        msgs = session.exec(
-            select(Message).where(Message.website_entry_id == entry_id).order_by(Message.id)
-        ).all()
-        message_history = [
-            AIMessage(m.content) if m.role == "ai" else HumanMessage(m.content) for m in msgs
-        ]
+    result = VerificationResult()
 
-    trigger_content = "Automated verification: analyze this website for issues."
-    with Session(engine) as session:
-        session.add(Message(website_entry_id=entry_id, role="human", content=trigger_content, is_automated=True))
-        session.commit()
-    message_history.append(HumanMessage(trigger_content))
+    async def relay(events):
+        async for event in events:
+            if event["type"] == "done":
+                result.usage = {k: result.usage.get(k, 0) + v for k, v in event.get("usage", {}).items()}
+            elif on_event:
+                await on_event(event)
+            yield event
 
-    ai_response = ""
-    async for event in run_agent(message_history, website_url, repo_name, engine, entry_id, github_token, False):
+    payload = build_payload(message_history, website_url, repo_name, entry_id, github_token, False, job.run_id, budget_limits, is_automated=True)
+    async for event in relay(run_job(engine, job.run_id, stream_agent_run(payload, engine))):
         if event["type"] == "done":
-            ai_response = event["content"]
-    with Session(engine) as session:
-        session.add(Message(website_entry_id=entry_id, role="ai", content=ai_response, is_automated=True))
-        session.commit()
+            result.conclusion = event["content"]
+    save_answer(engine, job, result.conclusion)
 
     with Session(engine) as session:
         all_diags = session.exec(
-            select(Diagnostic).where(Diagnostic.website_entry_id == entry_id, Diagnostic.dismissed == False)
+            select(Diagnostic).where(
+                Diagnostic.website_entry_id == entry_id,
+                Diagnostic.dismissed == False,
+                Diagnostic.id > job.baseline_diagnostic_id,
+            )
         ).all()
+        result.diagnostics = [(d.severity, d.short_desc) for d in all_diags]
         new_diags = [
             (d.short_desc, d.full_desc, d.severity)
             for d in all_diags
-            if d.id not in existing_ids and SEVERITY_ORDER.get(d.severity, 0) >= min_level
+            if SEVERITY_ORDER.get(d.severity, 0) >= min_level
         ]
 
     if new_diags and notif_url:
@@ -115,22 +288,35 @@ async def run_verification(entry_id: int, github_token: str, engine: Engine) ->
 
     if auto_fix and new_diags:
         for short_desc, full_desc, _ in new_diags:
+            fix_limits = dict(budget_limits or {})
+            if "max_tokens" in fix_limits:
+                fix_limits["max_tokens"] -= result.usage.get("tokens", 0)
+                if fix_limits["max_tokens"] <= 0:
+                    break
             fix_content = f"Fix this diagnostic: **{short_desc}**\n\n{full_desc}"
             with Session(engine) as session:
                 msgs = session.exec(
                     select(Message).where(Message.website_entry_id == entry_id).order_by(Message.id)
                 ).all()
-                fix_history = [
-                    AIMessage(m.content) if m.role == "ai" else HumanMessage(m.content) for m in msgs
-                ]
+                fix_history = [(m.role, m.content) for m in msgs]
                 session.add(Message(website_entry_id=entry_id, role="human", content=fix_content, is_automated=True, is_fix_action=True))
                 session.commit()
-            fix_history.append(HumanMessage(fix_content))
+            fix_history.append(("human", fix_content))
 
+            fix_job = AgentJob(
+                run_id=uuid.uuid4().hex,
+                kind="message",
+                website_entry_id=entry_id,
+                user_id=job.user_id,
+                is_fix_action=True,
+                is_automated=True,
+                budget_limits_json=json.dumps(fix_limits),
+            )
+            create_job(engine, fix_job)
             fix_response = ""
-            async for event in run_agent(fix_history, website_url, repo_name, engine, entry_id, github_token, True):
+            payload = build_payload(fix_history, website_url, repo_name, entry_id, github_token, True, fix_job.run_id, fix_limits, is_automated=True)
+            async for event in relay(run_job(engine, fix_job.run_id, stream_agent_run(payload, engine))):
                 if event["type"] == "done":
                     fix_response = event["content"]
-            with Session(engine) as session:
-                session.add(Message(website_entry_id=entry_id, role="ai", content=fix_response, is_automated=True, is_fix_action=True))
-                session.commit()
+            save_answer(engine, fix_job, fix_response)
+    return result
@@ -0,0 +1,156 @@
+from dataclasses import dataclass
+from playwright.async_api import Page
+import re
+
+MAX_EXAMPLES = 3
+# WCAG 2.2 target size (minimum) is 24x24 CSS px; Lighthouse flags text under 12px as illegible on mobile.
+MIN_TAP_TARGET_PX = 24
+MIN_FONT_SIZE_PX = 12
+MAX_ILLEGIBLE_TEXT_SHARE = 0.4
+
+
+@dataclass(frozen=True)
+class Device:
+    name: str
+    width: int
+    height: int
+    scale: float
+    mobile: bool
+    user_agent: str = ""
+
+    def context_options(self) -> dict:
+        options = {
+            "viewport": {"width": self.width, "height": self.height},
+            "device_scale_factor": self.scale,
+            "is_mobile": self.mobile,
+            "has_touch": self.mobile,
+        }
+        if self.user_agent:
+            options["user_agent"] = self.user_agent
+        return options
+
+
+DEVICES = {
+    "mobile": Device(
+        "mobile", 390, 844, 3, True,
+        "Mozilla/5.0 (iPhone; CPU iPhone OS 17_0 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.0 Mobile/15E148 Safari/604.1",
+    ),
+    "tablet": Device(
+        "tablet", 820, 1180, 2, True,
+        "Mozilla/5.0 (iPad; CPU OS 17_0 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.0 Mobile/15E148 Safari/604.1",
+    ),
+    "desktop": Device("desktop", 1440, 900, 1, False),
+}
+
+# Layout measurements for one viewport: horizontal overflow and its culprits, small tap targets
+# and the share of text rendered below the legible size.
+LAYOUT_SCRIPT = """
+({minTarget, minFont}) => {
+    const describe = el => el.tagName.toLowerCase() + (el.id ? '#' + el.id : '') + (el.className && typeof el.className === 'string' && el.className.trim() ? '.' + el.className.trim().split(/\\s+/)[0] : '');
+    const viewportWidth = document.documentElement.clientWidth;
+    const overflowing = [];
+    for (const el of document.body ? document.body.querySelectorAll('*') : []) {
+        if (overflowing.length >= 20) break;
+        const rect = el.getBoundingClientRect();
+        // Only the outermost culprit matters, not every descendant of an overflowing container.
+        if (rect.width && rect.right > viewportWidth + 1 && !(el.parentElement && el.parentElement.getBoundingClientRect().right > viewportWidth + 1)) {
+            overflowing.push(`${describe(el)} (right edge at ${Math.round(rect.right)}px)`);
+        }
+    }
+    const targets = [];
+    for (const el of document.querySelectorAll('a[href], button, input:not([type=hidden]), select, textarea, [role=button], [role=link], [onclick]')) {
+        if (!el.checkVisibility?.()) continue;
+        const rect = el.getBoundingClientRect();
+        if (rect.width && rect.height && (rect.width < minTarget || rect.height < minTarget)) {
+            targets.push(`${describe(el)} "${(el.innerText || el.value || el.getAttribute('aria-label') || '').trim().slice(0, 30)}" ${Math.round(rect.width)}x${Math.round(rect.height)}px`);
+        }
+    }
+    let totalChars = 0, smallChars = 0;
+    const smallText = [];
+    for (const el of document.body ? document.body.querySelectorAll('*') : []) {
+        const own = [...el.childNodes].filter(n => n.nodeType === 3).map(n => n.textContent.trim()).join(' ').trim();
+        if (!own || !el.checkVisibility?.()) continue;
+        const size = parseFloat(getComputedStyle(el).fontSize);
+        totalChars += own.length;
+        if (size < minFont) {
+            smallChars += own.length;
+            if (smallText.length < 10) smallText.push(`${describe(el)} "${own.slice(0, 30)}" ${size}px`);
+        }
+    }
+    return {
+        viewportMeta: document.querySelector('meta[name="viewport"]')?.content ?? null,
+        viewportWidth,
+        scrollWidth: document.documentElement.scrollWidth,
+        overflowing,
+        targets,
+        totalChars,
+        smallChars,
+        smallText,
+    };
+}
+"""
+
+
+def viewport_meta_findings(content: str | None) -> list[tuple[str, str, list[str]]]:
+    if content is None:
+        return [("error", "No viewport meta tag: mobile browsers render the page zoomed out at desktop width", [])]
+    settings = dict(
+        (key.strip().lower(), value.strip().lower())
+        for key, _, value in (part.partition("=") for part in re.split(r"[,;]", content))
+    )
+    findings = []
+    if settings.get("width") != "device-width":
+        findings.append(("warning", f"Viewport meta does not set width=device-width ({content})", []))
+    if settings.get("user-scalable") in ("no", "0"):
+        findings.append(("warning", "Viewport meta disables zooming with user-scalable=no", []))
+    try:
+        if float(settings.get("maximum-scale", "5")) < 2:
+            findings.append(("warning", f"Viewport meta limits zoom to maximum-scale={settings['maximum-scale']}", []))
+    except ValueError:
+        pass
+    return findings
+
+
+def layout_findings(device: Device, layout: dict) -> list[tuple[str, str, list[str]]]:
+    """(severity, finding, examples) for one viewport's layout measurements."""
+    findings = []
+    if layout["scrollWidth"] > layout["viewportWidth"] + 1:
+        findings.append((
+            "error" if device.mobile else "warning",
+            f"Page scrolls horizontally: content is {layout['scrollWidth']}px wide in a {layout['viewportWidth']}px viewport",
+            layout["overflowing"],
+        ))
+    if device.mobile and layout["targets"]:
+        findings.append(("warning", f"Tap targets smaller than {MIN_TAP_TARGET_PX}x{MIN_TAP_TARGET_PX}px", layout["targets"]))
+    share = layout["smallChars"] / layout["totalChars"] if layout["totalChars"] else 0
+    if device.mobile and share > MAX_ILLEGIBLE_TEXT_SHARE:
+        findings.append(("warning", f"{share:.0%} of the text is smaller than {MIN_FONT_SIZE_PX}px", layout["smallText"]))
+    elif layout["smallText"]:
+        findings.append(("info", f"Some text is smaller than {MIN_FONT_SIZE_PX}px ({share:.0%} of the text)", layout["smallText"]))
+    return findings
+
+
+async def check_viewport(page: Page, device: Device) -> list[tuple[str, str, list[str]]]:
+    layout = await page.evaluate(LAYOUT_SCRIPT, {"minTarget": MIN_TAP_TARGET_PX, "minFont": MIN_FONT_SIZE_PX})
+    findings = viewport_meta_findings(layout["viewportMeta"]) if device.mobile else []
+    return findings + layout_findings(device, layout)
+
+
+def format_viewport_report(url: str, results: dict[str, list[tuple[str, str, list[str]]] | str], elapsed_ms: int) -> str:
+    """One section per device; a device whose load failed carries its error message instead of findings."""
+    parts = [f"Responsive checks of {url} in {len(results)} viewports ({elapsed_ms} ms):"]
+    for name, findings in results.items():
+        device = DEVICES[name]
+        header = f"{name} ({device.width}x{device.height})"
+        if isinstance(findings, str):
+            parts.append(f"{header}: failed to load: {findings}")
+            continue
+        if not findings:
+            parts.append(f"{header}: no issues found")
+            continue
+        parts.append(f"{header}:")
+        for severity, finding, examples in findings:
+            shown = "; ".join(examples[:MAX_EXAMPLES])
+            more = f" (+{len(examples) - MAX_EXAMPLES} more)" if len(examples) > MAX_EXAMPLES else ""
+            parts.append(f"- [{severity}] {finding}" + (f": {shown}{more}" if shown else ""))
+    return "\n".join(parts)
@@ -0,0 +1,258 @@
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+import base64
+import hashlib
+import zlib
+
+import numpy as np
+from playwright.async_api import Page
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlmodel import Session, select
+
+from models import VisualSnapshot
+
+# Screenshots are kept as 8-bit grayscale at most STORED_WIDTH pixels wide: a few tens of KB
+# compressed per page and viewport, and still fine enough to locate a changed button or paragraph.
+STORED_WIDTH = 480
+MAX_CAPTURE_HEIGHT_PX = 10000
+TILE_PX = 16
+# Per-pixel differences at or below this are antialiasing and image decoding noise.
+PIXEL_THRESHOLD = 32
+TILE_CHANGED_SHARE = 0.05
+MIN_REGION_PIXELS = 48
+MAX_REGIONS = 5
+HASH_SIZE = 8
+
+# Decodes a PNG screenshot in the browser, downscales it to at most `width` pixels wide and
+# returns its luma as base64 bytes, so the backend needs no image library.
+DECODE_SCRIPT = """
+async ({png, width}) => {
+    const bytes = Uint8Array.from(atob(png), c => c.charCodeAt(0));
+    const bitmap = await createImageBitmap(new Blob([bytes], {type: 'image/png'}));
+    const w = Math.max(1, Math.min(width, bitmap.width));
+    const h = Math.max(1, Math.round(bitmap.height * w / bitmap.width));
+    const canvas = new OffscreenCanvas(w, h);
+    const ctx = canvas.getContext('2d', {willReadFrequently: true});
+    ctx.imageSmoothingQuality = 'high';
+    ctx.drawImage(bitmap, 0, 0, w, h);
+    const rgba = ctx.getImageData(0, 0, w, h).data;
+    const gray = new Uint8Array(w * h);
+    for (let i = 0, j = 0; j < gray.length; i += 4, j++) gray[j] = (rgba[i] * 77 + rgba[i + 1] * 150 + rgba[i + 2] * 29) >> 8;
+    let binary = '';
+    for (let i = 0; i < gray.length; i += 0x8000) binary += String.fromCharCode.apply(null, gray.subarray(i, i + 0x8000));
+    return {width: w, height: h, scale: bitmap.width / w, pixels: btoa(binary)};
+}
+"""
+
+# Element boxes (in page CSS pixels) with a label and the start of their text, recorded with the
+# screenshot so changed regions can be named later without the page.
+BOXES_SCRIPT = """
+() => {
+    const describe = el => el.tagName.toLowerCase() + (el.id ? '#' + el.id : '') + (el.className && typeof el.className === 'string' && el.className.trim() ? '.' + el.className.trim().split(/\\s+/)[0] : '');
+    const textOf = el => {
+        let text = '';
+        const walker = document.createTreeWalker(el, NodeFilter.SHOW_TEXT);
+        while (text.length < 60 && walker.nextNode()) text += walker.currentNode.textContent.trim() + ' ';
+        return text.replace(/\\s+/g, ' ').trim().slice(0, 60);
+    };
+    const boxes = [];
+    for (const el of document.body ? document.body.querySelectorAll('*') : []) {
+        const rect = el.getBoundingClientRect();
+        if (rect.width * rect.height < 64) continue;
+        const text = (el.getAttribute('alt') || el.getAttribute('aria-label') || textOf(el)).slice(0, 60);
+        boxes.push([describe(el) + (text ? ` "${text}"` : ''), rect.left + scrollX, rect.top + scrollY, rect.width, rect.height]);
+        if (boxes.length >= 5000) break;
+    }
+    return boxes;
+}
+"""
+
+
+@dataclass
+class Capture:
+    pixels: np.ndarray  # (height, width) uint8 luma
+    scale: float  # CSS pixels per stored pixel
+    boxes: list[list] = field(default_factory=list)  # [label, x, y, width, height] in CSS pixels
+
+    @property
+    def pixels_hash(self) -> str:
+        return hashlib.sha256(self.pixels.tobytes()).hexdigest()
+
+
+@dataclass
+class Region:
+    # Stored-pixel bounds, scaled to CSS pixels for reporting.
+    top: int
+    left: int
+    bottom: int
+    right: int
+    changed_pixels: int
+
+    def css_box(self, scale: float) -> dict:
+        return {
+            "x": round(self.left * scale),
+            "y": round(self.top * scale),
+            "width": round((self.right - self.left) * scale),
+            "height": round((self.bottom - self.top) * scale),
+        }
+
+    @property
+    def changed_share(self) -> float:
+        return self.changed_pixels / ((self.bottom - self.top) * (self.right - self.left))
+
+
+async def capture_page(page: Page) -> Capture:
+    """Full-page screenshot of the loaded page (capped at MAX_CAPTURE_HEIGHT_PX), stored downscaled in grayscale."""
+    width, height = await page.evaluate("[window.innerWidth, document.documentElement.scrollHeight]")
+    png = await page.screenshot(
+        full_page=True,
+        clip={"x": 0, "y": 0, "width": width, "height": max(1, min(height, MAX_CAPTURE_HEIGHT_PX))},
+        scale="css",
+        animations="disabled",
+        caret="hide",
+    )
+    decoded = await page.evaluate(DECODE_SCRIPT, {"png": base64.b64encode(png).decode("ascii"), "width": STORED_WIDTH})
+    pixels = np.frombuffer(base64.b64decode(decoded["pixels"]), dtype=np.uint8).reshape(decoded["height"], decoded["width"])
+    return Capture(pixels, decoded["scale"], await page.evaluate(BOXES_SCRIPT))
+
+
+def area_resize(pixels: np.ndarray, height: int, width: int) -> np.ndarray:
+    """Downscale by averaging the pixels that fall in each output cell."""
+    rows = np.linspace(0, pixels.shape[0], height + 1).astype(int)
+    cols = np.linspace(0, pixels.shape[1], width + 1).astype(int)
+    sums = np.add.reduceat(np.add.reduceat(pixels.astype(np.float64), rows[:-1], axis=0), cols[:-1], axis=1)
+    return sums / np.outer(np.maximum(np.diff(rows), 1), np.maximum(np.diff(cols), 1))
+
+
+def perceptual_hash(pixels: np.ndarray) -> str:
+    """64-bit difference hash: whether each cell of a 9x8 thumbnail is brighter than its right neighbour."""
+    thumbnail = area_resize(pixels, HASH_SIZE, HASH_SIZE + 1)
+    bits = (thumbnail[:, 1:] > thumbnail[:, :-1]).flatten()
+    return f"{int(''.join('1' if b else '0' for b in bits), 2):0{HASH_SIZE * HASH_SIZE // 4}x}"
+
+
+def hash_distance(a: str, b: str) -> int:
+    return (int(a, 16) ^ int(b, 16)).bit_count()
+
+
+def changed_regions(old: np.ndarray, new: np.ndarray) -> list[Region]:
+    """
+    Compare the overlapping part of two screenshots tile by tile and group neighbouring changed
+    tiles into regions, largest change first. A tile counts as changed when more than
+    TILE_CHANGED_SHARE of its pixels differ by more than PIXEL_THRESHOLD.
+    """
+    height, width = min(old.shape[0], new.shape[0]), min(old.shape[1], new.shape[1])
+    changed = np.abs(old[:height, :width].astype(np.int16) - new[:height, :width].astype(np.int16)) > PIXEL_THRESHOLD
+    rows, cols = -(-height // TILE_PX), -(-width // TILE_PX)
+    padded = np.zeros((rows * TILE_PX, cols * TILE_PX), dtype=bool)
+    padded[:height, :width] = changed
+    counts = padded.reshape(rows, TILE_PX, cols, TILE_PX).sum(axis=(1, 3))
+    hot = counts > TILE_CHANGED_SHARE * TILE_PX * TILE_PX
+
+    regions = []
+    seen = np.zeros_like(hot)
+    # Tiles up to one tile apart belong to the same region, so a changed paragraph is one region, not one per line.
+    for start in zip(*np.nonzero(hot)):
+        if seen[start]:
+            continue
+        seen[start] = True
+        stack, tiles = [start], []
+        while stack:
+            r, c = stack.pop()
+            tiles.append((r, c))
+            for nr in range(max(r - 2, 0), min(r + 3, rows)):
+                for nc in range(max(c - 2, 0), min(c + 3, cols)):
+                    if hot[nr, nc] and not seen[nr, nc]:
+                        seen[nr, nc] = True
+                        stack.append((nr, nc))
+        tile_rows, tile_cols = zip(*tiles)
+        top, left = int(min(tile_rows)) * TILE_PX, int(min(tile_cols)) * TILE_PX
+        bottom, right = min((int(max(tile_rows)) + 1) * TILE_PX, height), min((int(max(tile_cols)) + 1) * TILE_PX, width)
+        changed_pixels = int(changed[top:bottom, left:right].sum())
+        if changed_pixels >= MIN_REGION_PIXELS:
+            regions.append(Region(top, left, bottom, right, changed_pixels))
+    return sorted(regions, key=lambda r: -r.changed_pixels)
+
+
+def get_visual_snapshot(session: Session, website_entry_id: int, url: str, device: str) -> VisualSnapshot | None:
+    return session.exec(
+        select(VisualSnapshot).where(
+            VisualSnapshot.website_entry_id == website_entry_id,
+            VisualSnapshot.url == url,
+            VisualSnapshot.device == device,
+        )
+    ).first()
+
+
+def load_pixels(snapshot: VisualSnapshot) -> np.ndarray:
+    return np.frombuffer(zlib.decompress(snapshot.data), dtype=np.uint8).reshape(snapshot.height, snapshot.width)
+
+
+def save_visual_snapshot(session: Session, website_entry_id: int, url: str, device: str, capture: Capture) -> None:
+    height, width = capture.pixels.shape
+    values = {
+        "width": width,
+        "height": height,
+        "scale": capture.scale,
+        "phash": perceptual_hash(capture.pixels),
+        "pixels_hash": capture.pixels_hash,
+        "data": zlib.compress(capture.pixels.tobytes()),
+        "updated_at": datetime.now(timezone.utc),
+    }
+    # An upsert, so two runs saving the same page's baseline at once don't both insert it.
+    dialect = postgresql if session.get_bind().dialect.name == "postgresql" else sqlite
+    session.exec(
+        dialect.insert(VisualSnapshot)
+        .values(website_entry_id=website_entry_id, url=url, device=device, **values)
+        .on_conflict_do_update(index_elements=["website_entry_id", "url", "device"], set_=values)
+    )
+    session.commit()
+
+
+def diff_visual_snapshot(previous: VisualSnapshot, capture: Capture) -> tuple[list[Region], list[str]]:
+    """
+    Changed regions of a new capture against the previous run's baseline, and page-level notes
+    (size and overall appearance). Both are empty when the page looks the same.
+    """
+    if previous.pixels_hash == capture.pixels_hash:
+        return [], []
+    old, new = load_pixels(previous), capture.pixels
+    notes = []
+    if old.shape[1] != new.shape[1]:
+        return [], [f"viewport width changed from {round(old.shape[1] * previous.scale)}px to {round(new.shape[1] * capture.scale)}px, so the screenshots were not compared"]
+    if abs(old.shape[0] - new.shape[0]) > TILE_PX:
+        notes.append(f"page height changed from {round(old.shape[0] * previous.scale)}px to {round(new.shape[0] * capture.scale)}px")
+    regions = changed_regions(old, new)
+    if regions or notes:
+        # The stored hash covers the whole page; after a height change only the common part is comparable.
+        height = min(old.shape[0], new.shape[0])
+        old_hash = previous.phash if old.shape[0] == height else perceptual_hash(old[:height])
+        distance = hash_distance(old_hash, perceptual_hash(new[:height]))
+        notes.append(f"overall perceptual distance {distance}/{HASH_SIZE * HASH_SIZE}" + (" (layout looks substantially different)" if distance > 10 else ""))
+    return regions, notes
+
+
+def describe_regions(capture: Capture, regions: list[Region]) -> list[str]:
+    """Name each changed region after the smallest element covering its center that is about as large as the region."""
+    boxes = np.array([box[1:] for box in capture.boxes], dtype=np.float64).reshape(-1, 4)
+    left, top, width, height = boxes.T
+    areas = width * height
+    described = []
+    for region in regions[:MAX_REGIONS]:
+        box = region.css_box(capture.scale)
+        cx, cy = box["x"] + box["width"] / 2, box["y"] + box["height"] / 2
+        covering = np.nonzero(
+            (left <= cx) & (cx <= left + width) & (top <= cy) & (cy <= top + height) & (areas >= box["width"] * box["height"] / 4)
+        )[0]
+        element = capture.boxes[covering[np.argmin(areas[covering])]][0] if covering.size else ""
+        described.append(
+            f"y={box['y']}-{box['y'] + box['height']}px x={box['x']}-{box['x'] + box['width']}px "
+            f"({region.changed_share:.0%} of it changed)" + (f": {element}" if element else "")
+        )
+    return described
+
+
+def visual_finding(seen: str, regions: list[Region], notes: list[str], examples: list[str]) -> tuple[str, str, list[str]]:
+    """A (severity, finding, examples) entry, in the shape of the viewport findings, for a page that looks different."""
+    details = notes + ([f"{len(regions)} changed regions"] if regions else [])
+    return "info", f"Looks different from the last run's screenshot ({seen}): " + ", ".join(details), examples
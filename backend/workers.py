@@ -0,0 +1,253 @@
+"""
+Agent execution tier. The API process only admits runs and relays their events; the agent
+itself (browser, LLM loop, tools) runs wherever AGENT_EXECUTOR points:
+
+- inline:  in the API process, as before (the agent stack is imported lazily)
+- process: in a local pool of spawned worker processes, one run per process at a time
+- modal:   in the separate `run_agent_job` Modal function, which scales on its own. Workers write
+           diagnostics, messages and checkpoints straight to DATABASE_URL, so this needs a networked
+           database: a SQLite file on a Modal Volume is last-writer-wins across containers.
+
+Runs are described by a plain payload dict (message history as (role, content) pairs) so the
+API process never needs LangChain to dispatch one.
+"""
+
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from importlib import import_module
+from typing import AsyncIterator
+import asyncio
+import logging
+import multiprocessing
+import queue
+import sys
+
+from admission import agent_slots
+from constants import AGENT_EXECUTOR, AGENT_WORKER_PROCESSES, DATABASE_URL, MODAL_APP_NAME
+from tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+EVENT_POLL_SECONDS = 1.0
+# A run whose worker process died (e.g. OOM-killed) is retried this many times on a fresh pool.
+# Durable runs resume from their last checkpoint instead of starting over.
+PROCESS_RUN_RETRIES = 1
+
+agent_import: asyncio.Task | None = None
+process_pool: ProcessPoolExecutor | None = None
+process_manager = None
+worker_engine = None
+
+
+def load_agent() -> asyncio.Task:
+    """Import the agent module (LangChain, LangGraph, OpenAI and Playwright) once, off the event loop."""
+    global agent_import
+    if agent_import is None or (agent_import.done() and not agent_import.cancelled() and agent_import.exception()):
+        async def import_agent():
+            with tracer.span("agent.import"):
+                return await asyncio.to_thread(import_module, "agent")
+        agent_import = asyncio.create_task(import_agent())
+    return agent_import
+
+
+async def close_browser() -> None:
+    """Close this process's shared browser, if the agent stack was loaded and launched one."""
+    # Looked up rather than imported, so a process that never ran the agent doesn't load Playwright to shut down.
+    if (browsers := sys.modules.get("browsers")) is not None:
+        await browsers.browser_pool.close(force=True)
+
+
+def build_payload(history: list[tuple[str, str]], website_url: str, repo_name: str, website_entry_id: int, github_token: str, is_fix_action: bool, run_id: str | None = None, budget_limits: dict | None = None, is_automated: bool = False) -> dict:
+    return {
+        "run_id": run_id,
+        "history": history,
+        "website_url": website_url,
+        "repo_name": repo_name,
+        "website_entry_id": website_entry_id,
+        "github_token": github_token,
+        "is_fix_action": is_fix_action,
+        "is_automated": is_automated,
+        # RunBudget overrides, e.g. a batch's share of its token budget.
+        "budget_limits": budget_limits or {},
+    }
+
+
+async def execute_payload(payload: dict, engine=None) -> AsyncIterator[dict]:
+    """Run the agent for a payload in the current process. Used by every executor."""
+    global worker_engine
+    if engine is None:
+        if worker_engine is None:
+            from sqlmodel import create_engine
+            worker_engine = create_engine(DATABASE_URL)
+        engine = worker_engine
+    agent = await load_agent()
+    from langchain_core.messages import AIMessage, HumanMessage
+    messages = [AIMessage(content) if role == "ai" else HumanMessage(content) for role, content in payload["history"]]
+    async for event in agent.run_agent(
+        messages,
+        payload["website_url"],
+        payload["repo_name"],
+        engine,
+        payload["website_entry_id"],
+        payload["github_token"],
+        payload["is_fix_action"],
+        payload.get("run_id"),
+        payload.get("budget_limits"),
+        payload.get("is_automated", False),
+    ):
+        yield event
+
+
+def process_job(payload: dict, events, cancelled) -> None:
+    """
+    Entry point inside a pool process: run the agent and forward its events to the API process.
+    The run is cancelled, running its cleanup, when the API process sets `cancelled`.
+    """
+    async def drive() -> None:
+        async for event in execute_payload(payload):
+            events.put(("event", event))
+
+    async def watch(run: asyncio.Task) -> None:
+        while not await asyncio.to_thread(cancelled.wait, EVENT_POLL_SECONDS):
+            pass
+        run.cancel()
+
+    async def main() -> None:
+        run = asyncio.create_task(drive())
+        watcher = asyncio.create_task(watch(run))
+        try:
+            await run
+        finally:
+            watcher.cancel()
+            # Chromium must exit before asyncio.run closes the loop, or it is left running as an orphan.
+            await close_browser()
+
+    try:
+        asyncio.run(main())
+    except asyncio.CancelledError:
+        logger.info("Agent worker job cancelled website_entry_id=%s", payload["website_entry_id"])
+    except Exception as e:
+        logger.exception("Agent worker job failed website_entry_id=%s", payload["website_entry_id"])
+        events.put(("error", str(e)))
+    finally:
+        events.put(("end", None))
+
+
+def warm_process() -> None:
+    import_module("agent")
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    global process_pool, process_manager
+    # Spawned rather than forked: the API process has an event loop and threads that must not be copied.
+    context = multiprocessing.get_context("spawn")
+    if process_manager is None:
+        process_manager = context.Manager()
+    if process_pool is None:
+        process_pool = ProcessPoolExecutor(max_workers=AGENT_WORKER_PROCESSES, mp_context=context)
+    return process_pool
+
+
+def discard_process_pool(pool: ProcessPoolExecutor) -> None:
+    """
+    Drop a pool that a dead worker broke, so the next run spawns a fresh one. Every run on the
+    pool fails with it; the first one to notice replaces it and the others reuse the new pool.
+    """
+    global process_pool
+    if process_pool is pool:
+        process_pool = None
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+async def relay_process_events(future: Future, events) -> AsyncIterator[dict]:
+    while True:
+        try:
+            kind, value = await asyncio.to_thread(events.get, True, EVENT_POLL_SECONDS)
+        except queue.Empty:
+            if future.done() and (error := future.exception()):
+                if isinstance(error, BrokenProcessPool):
+                    raise error
+                raise RuntimeError(f"Agent worker process failed: {error}")
+            continue
+        if kind == "event":
+            yield value
+        elif kind == "error":
+            raise RuntimeError(value)
+        else:
+            return
+
+
+async def run_in_process(payload: dict) -> AsyncIterator[dict]:
+    for attempt in range(PROCESS_RUN_RETRIES + 1):
+        pool = get_process_pool()
+        events = process_manager.Queue()
+        cancelled = process_manager.Event()
+        future = None
+        finished = False
+        try:
+            future = pool.submit(process_job, payload, events, cancelled)
+            async for event in relay_process_events(future, events):
+                yield event
+            finished = True
+            return
+        except BrokenProcessPool as e:
+            finished = True
+            discard_process_pool(pool)
+            if attempt == PROCESS_RUN_RETRIES:
+                raise RuntimeError(f"Agent worker process failed: {e}") from e
+            logger.warning(
+                "Agent worker process died, retrying on a new pool website_entry_id=%s run_id=%s attempt=%s",
+                payload["website_entry_id"], payload.get("run_id"), attempt + 1,
+            )
+        finally:
+            if not finished and future is not None:
+                # Cancelled or failed on this side: stop the worker's run too, so it doesn't keep a browser and the LLM busy.
+                future.cancel()
+                cancelled.set()
+
+
+async def run_on_modal(payload: dict) -> AsyncIterator[dict]:
+    import modal
+    job = modal.Function.from_name(MODAL_APP_NAME, "run_agent_job")
+    async for event in job.remote_gen.aio(payload):
+        yield event
+
+
+async def stream_agent_run(payload: dict, engine) -> AsyncIterator[dict]:
+    """Run the agent on the configured executor and yield its progress events."""
+    if AGENT_EXECUTOR == "inline":
+        async for event in execute_payload(payload, engine):
+            yield event
+        return
+
+    # The global cap on concurrent runs is enforced here, in the API process, so queued
+    # runs still see their position; each worker then runs a single job uncontended.
+    async for position in agent_slots.acquire():
+        yield {"type": "queued", "position": position}
+    try:
+        logger.info("Dispatching agent run website_entry_id=%s executor=%s", payload["website_entry_id"], AGENT_EXECUTOR)
+        remote = run_in_process(payload) if AGENT_EXECUTOR == "process" else run_on_modal(payload)
+        async for event in remote:
+            yield event
+    finally:
+        agent_slots.release()
+
+
+def prewarm_workers() -> None:
+    """Load the agent stack ahead of the first run, wherever runs execute."""
+    if AGENT_EXECUTOR == "inline":
+        load_agent()
+    elif AGENT_EXECUTOR == "process":
+        pool = get_process_pool()
+        for _ in range(AGENT_WORKER_PROCESSES):
+            pool.submit(warm_process)
+
+
+def shutdown_workers() -> None:
+    global process_pool, process_manager
+    if process_pool is not None:
+        process_pool.shutdown(wait=False, cancel_futures=True)
+        process_pool = None
+    if process_manager is not None:
+        process_manager.shutdown()
+        process_manager = None